@@ -0,0 +1,70 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from data import load_data
+from schema import memory_report
+
+# Visible area used for the bounding-box mask (Southern California)
+BBOX = (32.0, 35.0, -121.0, -117.0)
+
+
+def legacy_frame(df):
+    """
+    The frame as app.py used to hold it: object strings for names and per-row
+    'YYYY-MM-DD' dates, 64-bit numbers, no separate date column.
+    """
+    legacy = df.drop(columns="Date").astype({
+        "MMSI": "int64", "LAT": "float64", "LON": "float64", "SOG": "float64", "Hour": "int32",
+        "VesselName": object, "Vessel Type Name": object, "Nearest Port": object,
+    })
+    legacy["BaseDateTime"] = df["BaseDateTime"].dt.strftime("%Y-%m-%d")
+    return legacy
+
+
+def mask_timings(df, date_column, date, port, repeats):
+    """
+    Median milliseconds of the masks the callbacks build.
+    """
+    masks = {
+        "vessel type": lambda: df["Vessel Type Name"] == "Cargo",
+        "port": lambda: df["Nearest Port"] == port,
+        "date": lambda: df[date_column] == date,
+        "bbox": lambda: df["LAT"].between(BBOX[0], BBOX[1]) & df["LON"].between(BBOX[2], BBOX[3]),
+    }
+    timings = {}
+    for name, mask in masks.items():
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            mask()
+            samples.append((time.perf_counter() - start) * 1000)
+        timings[name] = statistics.median(samples)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory and mask speed of the legacy vs compact frame.")
+    parser.add_argument("--date", default="2024-01-01", help="Date to load (YYYY-MM-DD).")
+    parser.add_argument("--repeats", type=int, default=20, help="Timings per mask.")
+    args = parser.parse_args()
+
+    compact = load_data(date_filter=args.date)
+    legacy = legacy_frame(compact)
+    port = compact["Nearest Port"].mode().iloc[0]
+
+    print(f"{len(compact):,} rows")
+    print(memory_report(legacy, compact).round(2).to_string())
+
+    legacy_ms = mask_timings(legacy, "BaseDateTime", args.date, port, args.repeats)
+    compact_ms = mask_timings(compact, "Date", args.date, port, args.repeats)
+    print(f"\n{'mask':<14}{'legacy ms':>12}{'compact ms':>12}")
+    for name in legacy_ms:
+        print(f"{name:<14}{legacy_ms[name]:>12.2f}{compact_ms[name]:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+# Gunicorn config that marks each worker as booted once app.py has been imported
+GUNICORN_CONFIG = """
+import os
+
+def post_worker_init(worker):
+    open(os.path.join({ready_dir!r}, str(os.getpid())), "w").close()
+"""
+
+
+def memory_kb(pid):
+    """
+    Resident (RSS) and proportional (PSS) memory of one process, in kB.
+    PSS splits every shared page between the processes mapping it, so the
+    PSS of all workers adds up to the memory they really use together.
+    """
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss"):
+                values[key] = int(rest.split()[0])
+    return values["Rss"], values["Pss"]
+
+
+def measure(workers, src_dir, port, timeout, preload=False):
+    """
+    Start gunicorn with the given number of workers, wait until every worker
+    has imported the app, and sum the memory of the master and the workers.
+    With preload, the app is imported once in the master and the workers
+    are forked from it.
+
+    Returns:
+        tuple: (total RSS kB, total PSS kB, boot seconds)
+    """
+    ready_dir = tempfile.mkdtemp()
+    config_path = os.path.join(ready_dir, "gunicorn.conf.py")
+    with open(config_path, "w") as f:
+        f.write(GUNICORN_CONFIG.format(ready_dir=ready_dir))
+
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", config_path, "-w", str(workers),
+         "-b", f"127.0.0.1:{port}", "--timeout", str(timeout), "--chdir", src_dir]
+        + (["--preload"] if preload else []) + ["app:server"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while len([f for f in os.listdir(ready_dir) if f.isdigit()]) < workers:
+            if server.poll() is not None or time.perf_counter() - start > timeout:
+                raise RuntimeError(f"gunicorn did not boot {workers} workers")
+            time.sleep(0.2)
+        boot_seconds = time.perf_counter() - start
+
+        # The master counts too: with preload it holds the pages it shares with the workers
+        pids = [server.pid] + [int(f) for f in os.listdir(ready_dir) if f.isdigit()]
+        totals = [memory_kb(pid) for pid in pids]
+        return sum(rss for rss, _ in totals), sum(pss for _, pss in totals), boot_seconds
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(ready_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Total memory of gunicorn workers serving the dashboard.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="Worker counts to measure.")
+    parser.add_argument("--src", default=SRC_DIR, help="Folder holding app.py (e.g. of another checkout).")
+    parser.add_argument("--port", type=int, default=18050, help="Port to bind gunicorn to.")
+    parser.add_argument("--timeout", type=int, default=300, help="Seconds to wait for all workers.")
+    parser.add_argument("--preload", action="store_true", help="Pass --preload to gunicorn.")
+    args = parser.parse_args()
+
+    print(f"{'workers':>8}{'RSS MB':>10}{'PSS MB':>10}{'PSS/worker':>12}{'boot s':>8}")
+    for workers in args.workers:
+        rss, pss, boot_seconds = measure(workers, os.path.abspath(args.src), args.port, args.timeout, args.preload)
+        print(f"{workers:>8}{rss / 1024:>10.0f}{pss / 1024:>10.0f}{pss / 1024 / workers:>12.0f}{boot_seconds:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCH_DIR, '..', 'src')
+sys.path.append(BENCH_DIR)
+sys.path.append(SRC_DIR)
+import pandas as pd
+from dash import Dash
+from synthetic import parse_size, write_split_data
+from calculate_arrivals_departures import calculate_arrivals_departures
+from callbacks import register_callbacks
+from components import create_trend_graph
+from figures import create_map
+from data import load_data
+from filter_index import FilterIndex
+from port_calls import detect_port_calls
+from spatial_index import SpatialGrid
+from summary_cube import SummaryCube
+
+# Days of the synthetic datasets, and the range the callbacks are timed on
+DAYS = ("2023-12-31", "2024-01-01")
+
+# (vessel type, nearest port, start date, end date), as sent by the filter inputs
+FILTER_SETS = [
+    (None, None, DAYS[-1], DAYS[-1]),
+    ("Cargo", None, DAYS[-1], DAYS[-1]),
+    (None, "Port of Los Angeles", DAYS[-1], DAYS[-1]),
+    ("Passenger", "Port of Seattle", DAYS[-1], DAYS[-1]),
+    (None, None, DAYS[0], DAYS[-1]),
+]
+
+# Top-level modules listed in the import-time profile
+IMPORT_PROFILE_SIZE = 12
+
+# Relative slowdown reported as a regression by --compare
+REGRESSION_THRESHOLD = 1.10
+
+
+def time_ms(func, repeats, setup=None):
+    """
+    Call func repeats times (after setup(), when given) and return the
+    wall-clock time of every call in milliseconds.
+    """
+    samples = []
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _result(size, rows, name, samples):
+    return {
+        "size": size,
+        "rows": rows,
+        "name": name,
+        "median_ms": round(statistics.median(samples), 3),
+        "min_ms": round(min(samples), 3),
+        "repeats": len(samples),
+    }
+
+
+def dashboard_callbacks(df):
+    """
+    Register the dashboard callbacks on a bare Dash app, with the port calls
+    and indexes app.py builds but without a result cache, and return the
+    undecorated callbacks by name.
+    """
+    app = Dash(__name__)
+    register_callbacks(
+        app, df, detect_port_calls(df), df.attrs.get("dataset_version"), FilterIndex(df), SummaryCube(df),
+        SpatialGrid(df["LAT"].to_numpy(), df["LON"].to_numpy())
+    )
+    callbacks = {entry["callback"].__wrapped__.__name__: entry["callback"].__wrapped__ for entry in app.callback_map.values()}
+    return callbacks
+
+
+def bench_size(size, data_root, repeats):
+    """
+    Run every benchmark on one dataset size.
+
+    Returns:
+        list: One result dict per benchmark.
+    """
+    rows = parse_size(size)
+    data_dir = os.path.join(data_root, size)
+    split_dir = os.path.join(data_dir, "split-data")
+    store_dir = os.path.join(data_dir, "store")
+    if write_split_data(rows, split_dir, DAYS):
+        shutil.rmtree(store_dir, ignore_errors=True)
+
+    results = []
+    add = lambda name, samples: results.append(_result(size, rows, name, samples))
+
+    # Cold: the split CSVs are converted into the Parquet store first
+    add("load_data.cold", time_ms(lambda: load_data(data_dir=data_dir), 1,
+                                  setup=lambda: shutil.rmtree(store_dir, ignore_errors=True)))
+    add("load_data.csv", time_ms(lambda: load_data(data_dir=data_dir, use_store=False), 1))
+    add("load_data.warm", time_ms(lambda: load_data(data_dir=data_dir), repeats))
+    add("load_data.one_day", time_ms(lambda: load_data(date_filter=DAYS[-1], data_dir=data_dir), repeats))
+
+    df = load_data(data_dir=data_dir)
+    day_df = df[df["Date"] == DAYS[-1]]
+
+    add("calculate_arrivals_departures", time_ms(lambda: calculate_arrivals_departures(df), repeats))
+    add("detect_port_calls", time_ms(lambda: detect_port_calls(df), repeats))
+    add("create_map.all", time_ms(lambda: create_map(df).to_plotly_json(), repeats))
+    add("create_map.cargo", time_ms(lambda: create_map(df[df["Vessel Type Name"] == "Cargo"]).to_plotly_json(), repeats))
+    add("create_map.tracks", time_ms(lambda: create_map(day_df, mode="tracks").to_plotly_json(), repeats))
+    add("create_trend_graph", time_ms(lambda: create_trend_graph(day_df), repeats))
+
+    callbacks = dashboard_callbacks(df)
+
+    # Each filter set as one fresh interaction
+    for name in ("update_map_and_stats", "update_trend_graph"):
+        samples = []
+        for filters in FILTER_SETS:
+            samples += time_ms(lambda: callbacks[name](*filters), repeats)
+        add(f"callback.{name}", samples)
+
+    return results
+
+
+def _import_app(fast_start, importtime=False):
+    """
+    Import app.py in a fresh interpreter, as a server process does before
+    it can listen, with its background refresh off.
+
+    Returns:
+        tuple: (seconds the import took, stderr of the interpreter)
+    """
+    script = (
+        "import sys, time; start = time.perf_counter(); "
+        f"sys.path.insert(0, {os.path.abspath(SRC_DIR)!r}); import app; print(time.perf_counter() - start)"
+    )
+    env = dict(os.environ, FAST_START="1" if fast_start else "0", DATA_REFRESH_INTERVAL="0")
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", script]
+    process = subprocess.run(command, env=env, capture_output=True, text=True, check=True)
+    return float(process.stdout.strip().splitlines()[-1]), process.stderr
+
+
+def _import_profile(stderr, top=IMPORT_PROFILE_SIZE):
+    """
+    The slowest modules imported by app.py itself, from python -X importtime
+    output, plus app.py's own total (which includes loading its data).
+
+    Returns:
+        dict: Cumulative import time in ms by module, slowest first.
+    """
+    # A module's line follows those of the imports it triggered, which are
+    # indented two more spaces
+    modules, pending = {}, {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            pending[name.strip()] = int(cumulative) / 1000
+        elif depth == 0:
+            if name.strip() == "app":
+                modules = dict(pending, app=int(cumulative) / 1000)
+            pending = {}
+    slowest = sorted(modules.items(), key=lambda item: -item[1])[:top]
+    return {name: round(ms, 1) for name, ms in slowest}
+
+
+def bench_startup(repeats):
+    """
+    Time from a fresh interpreter to an imported app.py, i.e. to a server
+    that can listen, with FAST_START off and on. It runs on the repository's
+    own data, whose bundle the first import builds when it is missing.
+
+    Returns:
+        tuple: (results, profile) where profile is the import-time profile
+               of a FAST_START import (see _import_profile).
+    """
+    _import_app(fast_start=False)
+    results = []
+    for fast_start, name in ((False, "startup.import_app"), (True, "startup.import_app.fast_start")):
+        samples = [_import_app(fast_start)[0] * 1000 for _ in range(repeats)]
+        results.append(_result("app", None, name, samples))
+    _, stderr = _import_app(fast_start=True, importtime=True)
+    return results, _import_profile(stderr)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _environment():
+    import dash, numpy, plotly
+    try:
+        import pyarrow
+        pyarrow_version = pyarrow.__version__
+    except ImportError:
+        pyarrow_version = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "pandas": pd.__version__,
+        "numpy": numpy.__version__,
+        "pyarrow": pyarrow_version,
+        "dash": dash.__version__,
+        "plotly": plotly.__version__,
+    }
+
+
+def compare(old_path, new_path, threshold=REGRESSION_THRESHOLD):
+    """
+    Print the median time of every benchmark in two result files side by
+    side.
+
+    Returns:
+        int: Number of benchmarks more than threshold times slower in new.
+    """
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    old_results = {(r["size"], r["name"]): r for r in old["results"]}
+
+    print(f"{old.get('commit')} -> {new.get('commit')}")
+    print(f"{'size':<6}{'benchmark':<36}{'old ms':>12}{'new ms':>12}{'ratio':>8}")
+    regressions = 0
+    for result in new["results"]:
+        before = old_results.get((result["size"], result["name"]))
+        if before is None:
+            continue
+        ratio = result["median_ms"] / before["median_ms"] if before["median_ms"] else float("inf")
+        flag = ""
+        if ratio > threshold:
+            regressions += 1
+            flag = "  slower"
+        print(f"{result['size']:<6}{result['name']:<36}{before['median_ms']:>12.1f}{result['median_ms']:>12.1f}"
+              f"{ratio:>8.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time loading, preprocessing and every dashboard callback.")
+    parser.add_argument("--sizes", nargs="+", default=["100k", "1m"], help="Dataset sizes, e.g. 100k 1m 10m.")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed calls per benchmark.")
+    parser.add_argument("--data-root", default=os.path.join(tempfile.gettempdir(), "vessel-vision-bench"),
+                        help="Folder for the synthetic datasets (kept between runs).")
+    parser.add_argument("--no-startup", action="store_true", help="Skip timing the app's startup.")
+    parser.add_argument("--output", default=None, help="Result file (default benchmarks/results/<commit>.json).")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two result files and exit.")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare) else 0)
+
+    commit = _git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "environment": _environment(),
+        "results": [],
+    }
+    for size in args.sizes:
+        results = bench_size(size, args.data_root, args.repeats)
+        report["results"] += results
+        for result in results:
+            print(f"{size:<6}{result['name']:<36}{result['median_ms']:>12.1f} ms")
+
+    if not args.no_startup:
+        results, profile = bench_startup(args.repeats)
+        report["results"] += results
+        report["import_profile"] = profile
+        for result in results:
+            print(f"{'app':<6}{result['name']:<36}{result['median_ms']:>12.1f} ms")
+        print("Slowest imports (cumulative ms, FAST_START):")
+        for module, ms in profile.items():
+            print(f"      {module:<36}{ms:>12.1f} ms")
+
+    output = args.output or os.path.join(BENCH_DIR, "results", f"{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
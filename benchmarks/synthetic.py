@@ -0,0 +1,163 @@
+import argparse
+import json
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from ports import PORTS, assign_nearest_port
+
+# Columns of the files in data/split-data (see notebooks/preprocessing.ipynb)
+SPLIT_COLUMNS = [
+    "MMSI", "BaseDateTime", "LAT", "LON", "SOG", "VesselName", "VesselType", "Status",
+    "Vessel Type Name", "Nearest Port", "Port Distance km"
+]
+
+# Dataset sizes used by the benchmark suite
+SIZES = {"100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+
+# Average pings per vessel and day, roughly that of the NOAA West Coast data
+PINGS_PER_VESSEL_DAY = 250
+
+PARAMS_NAME = "_params.json"
+
+
+def parse_size(size):
+    """
+    Row count of a size label ('100k', '1m', ...) or a plain number.
+    """
+    size = str(size).lower()
+    if size in SIZES:
+        return SIZES[size]
+    for suffix, factor in (("k", 1_000), ("m", 1_000_000)):
+        if size.endswith(suffix):
+            return int(float(size[:-1]) * factor)
+    return int(size)
+
+
+def synthetic_pings(rows, days, seed=0, first_mmsi=200_000_000):
+    """
+    Generate AIS pings with the split-data schema. Every vessel shuttles
+    between its home port and a second port, spends part of each day
+    anchored (SOG 0, fixed position) and reports at random times, so
+    arrivals, departures and anchored durations all have something to
+    count. Labels come from ports.assign_nearest_port, as in the
+    preprocessing notebook.
+
+    Args:
+        rows (int): Number of pings.
+        days (list): 'YYYY-MM-DD' days the pings are spread over.
+        seed (int, optional): Random seed; the same arguments give the same rows.
+        first_mmsi (int, optional): MMSI of the first vessel.
+
+    Returns:
+        pd.DataFrame: Pings with SPLIT_COLUMNS, sorted by time.
+    """
+    rng = np.random.default_rng(seed)
+    n_vessels = max(10, rows // (PINGS_PER_VESSEL_DAY * len(days)))
+    port_lat = np.array([port["lat"] for port in PORTS])
+    port_lon = np.array([port["lon"] for port in PORTS])
+
+    # Per-vessel attributes
+    home = rng.integers(0, len(PORTS), n_vessels)
+    away = rng.integers(0, len(PORTS), n_vessels)
+    vessel_type = rng.choice(np.r_[60:70, 70:80], n_vessels)
+    period = rng.uniform(6, 36, n_vessels)  # hours per round trip
+    phase = rng.uniform(0, 2 * np.pi, n_vessels)
+    anchored_share = rng.uniform(0.1, 0.6, n_vessels)
+    names = np.array([f"SYNTHETIC {i}" for i in range(n_vessels)], dtype=object)
+
+    # Per-ping vessel and time
+    vessel = rng.integers(0, n_vessels, rows)
+    start = pd.Timestamp(days[0]).value
+    seconds = rng.integers(0, 86_400 * len(days), rows)
+    hours = seconds / 3600
+
+    # Position along the trip; vessels anchor around both ends of it
+    angle = 2 * np.pi * hours / period[vessel] + phase[vessel]
+    progress = 0.5 * (1 - np.cos(angle))
+    anchored = np.abs(np.sin(angle)) < anchored_share[vessel]
+    progress = np.where(anchored, np.round(progress), progress)
+
+    lat = port_lat[home][vessel] + (port_lat[away][vessel] - port_lat[home][vessel]) * progress
+    lon = port_lon[home][vessel] + (port_lon[away][vessel] - port_lon[home][vessel]) * progress
+    lat += np.where(anchored, 0.01, 0.05) * rng.standard_normal(rows)
+    lon += np.where(anchored, 0.01, 0.05) * rng.standard_normal(rows)
+    sog = np.where(anchored, 0.0, np.round(rng.uniform(3, 22, rows), 1))
+    status = np.where(anchored, rng.choice([1, 5], rows), 0)
+
+    df = pd.DataFrame({
+        "MMSI": first_mmsi + vessel,
+        "BaseDateTime": pd.to_datetime(start + seconds * 1_000_000_000).strftime("%Y-%m-%dT%H:%M:%S"),
+        "LAT": lat.round(5),
+        "LON": lon.round(5),
+        "SOG": sog,
+        "VesselName": names[vessel],
+        "VesselType": vessel_type[vessel],
+        "Status": status,
+    })
+    df["Vessel Type Name"] = np.where(df["VesselType"] < 70, "Passenger", "Cargo")
+    df = assign_nearest_port(df)
+    df["Port Distance km"] = df["Port Distance km"].round(3)
+    return df.sort_values("BaseDateTime", kind="stable", ignore_index=True)[SPLIT_COLUMNS]
+
+
+def write_split_data(rows, out_dir, days=("2023-12-31", "2024-01-01"), files=None, seed=0):
+    """
+    Write a synthetic data/split-data folder, one ais_chunk_<i>.csv per
+    block of vessels. Nothing is written when the folder already holds
+    data generated with the same arguments.
+
+    Args:
+        rows (int): Total number of pings.
+        out_dir (str): Folder to write the CSV files to.
+        days (tuple, optional): Days the pings are spread over.
+        files (int, optional): Number of files; about 1M rows each by default.
+        seed (int, optional): Random seed.
+
+    Returns:
+        bool: True if the files were (re)written.
+    """
+    files = files or max(1, -(-rows // 1_000_000))
+    params = {"rows": rows, "days": list(days), "files": files, "seed": seed}
+    params_path = os.path.join(out_dir, PARAMS_NAME)
+    if os.path.exists(params_path):
+        with open(params_path) as f:
+            if json.load(f) == params:
+                return False
+
+    os.makedirs(out_dir, exist_ok=True)
+    for name in os.listdir(out_dir):
+        if name.endswith(".csv"):
+            os.remove(os.path.join(out_dir, name))
+
+    # One block of vessels per file keeps memory at one file's worth of rows
+    rows_per_file = np.diff(np.linspace(0, rows, files + 1).astype(int))
+    first_mmsi = 200_000_000
+    for i, file_rows in enumerate(rows_per_file):
+        df = synthetic_pings(int(file_rows), list(days), seed=seed * 1000 + i, first_mmsi=first_mmsi)
+        first_mmsi = int(df["MMSI"].max()) + 1 if len(df) else first_mmsi
+        df.to_csv(os.path.join(out_dir, f"ais_chunk_{i}.csv"), index=False)
+
+    with open(params_path, "w") as f:
+        json.dump(params, f)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic AIS data with the split-data schema.")
+    parser.add_argument("size", help="Number of rows, e.g. 100k, 1m or 10m.")
+    parser.add_argument("out_dir", help="Folder to write the CSV files to (e.g. data/split-data).")
+    parser.add_argument("--days", nargs="+", default=["2023-12-31", "2024-01-01"], help="Days to cover (YYYY-MM-DD).")
+    parser.add_argument("--files", type=int, default=None, help="Number of CSV files.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+    args = parser.parse_args()
+
+    rows = parse_size(args.size)
+    written = write_split_data(rows, args.out_dir, args.days, args.files, args.seed)
+    print(f"{'Wrote' if written else 'Kept'} {rows:,} rows in {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+
+def anchored_durations(mmsi, times, sog):
+    """
+    Compute, for every anchored ping (SOG == 0), the time until the same
+    vessel's next anchored ping. Works positionally on arrays that are
+    already sorted by MMSI and time, so no per-row keys are built and rows
+    sharing an MMSI and timestamp are kept apart.
+
+    Args:
+        mmsi (np.ndarray): Vessel identifiers, sorted.
+        times (np.ndarray): datetime64 timestamps, sorted within each MMSI.
+        sog (np.ndarray): Speed over ground for each ping.
+
+    Returns:
+        np.ndarray: timedelta64[ns] durations, NaT for moving pings and for
+                    each vessel's last anchored ping.
+    """
+    times = np.asarray(times, dtype="datetime64[ns]")
+    durations = np.full(len(times), np.timedelta64("NaT"), dtype="timedelta64[ns]")
+
+    # Consecutive positions of the anchored subset; a pair is valid when
+    # both pings belong to the same vessel
+    anchored_pos = np.flatnonzero(np.asarray(sog) == 0)
+    current_pos, next_pos = anchored_pos[:-1], anchored_pos[1:]
+    same_vessel = np.asarray(mmsi)[current_pos] == np.asarray(mmsi)[next_pos]
+
+    current_pos, next_pos = current_pos[same_vessel], next_pos[same_vessel]
+    durations[current_pos] = times[next_pos] - times[current_pos]
+
+    return durations
+
+def anchored_episodes(df, max_gap=None):
+    """
+    Collapse runs of consecutive anchored pings into anchoring episodes, one
+    row per stop. The input must be sorted by MMSI and BaseDateTime, as
+    returned by load_data.
+
+    Args:
+        df (pd.DataFrame): Vessel data with 'MMSI', 'BaseDateTime', 'SOG',
+                           'Nearest Port' and 'Vessel Type Name' columns.
+        max_gap (pd.Timedelta, optional): Split an episode when two anchored
+                                          pings are further apart than this.
+
+    Returns:
+        pd.DataFrame: Columns 'MMSI', 'Vessel Type Name', 'Nearest Port' (at
+                      the start of the stop), 'Start', 'End', 'Duration' and
+                      'Pings'.
+    """
+    mmsi = df["MMSI"].to_numpy()
+    times = df["BaseDateTime"].to_numpy(dtype="datetime64[ns]")
+    anchored = df["SOG"].to_numpy() == 0
+
+    # A ping continues the previous episode when both are anchored pings of
+    # the same vessel (and close enough in time, if max_gap is given)
+    continues = np.zeros(len(df), dtype=bool)
+    if len(df) > 1:
+        continues[1:] = anchored[1:] & anchored[:-1] & (mmsi[1:] == mmsi[:-1])
+        if max_gap is not None:
+            continues[1:] &= (times[1:] - times[:-1]) <= pd.Timedelta(max_gap).to_timedelta64()
+
+    starts = np.flatnonzero(anchored & ~continues)
+    # Each episode ends right before the next start or the next moving ping
+    ends_mask = anchored.copy()
+    ends_mask[:-1] &= ~continues[1:]
+    ends = np.flatnonzero(ends_mask)
+
+    return pd.DataFrame({
+        "MMSI": mmsi[starts],
+        "Vessel Type Name": df["Vessel Type Name"].to_numpy()[starts],
+        "Nearest Port": df["Nearest Port"].to_numpy()[starts],
+        "Start": times[starts],
+        "End": times[ends],
+        "Duration": times[ends] - times[starts],
+        "Pings": ends - starts + 1,
+    })
+
+
+def longest_episode(episodes, start=None, end=None, vessel_type=None, port=None):
+    """
+    Longest anchoring episode of a vessel type at a port that overlaps an
+    inclusive range of days. An episode is counted whole, including the
+    part of it outside the range.
+
+    Args:
+        episodes (pd.DataFrame): As returned by anchored_episodes.
+        start (str, optional): First day of the range ('YYYY-MM-DD').
+        end (str, optional): Last day of the range.
+        vessel_type (str, optional): Only count this vessel type.
+        port (str, optional): Only count episodes that started at this port.
+
+    Returns:
+        pd.Timedelta: The longest duration, NaT when no episode matches.
+    """
+    mask = np.ones(len(episodes), dtype=bool)
+    if vessel_type is not None:
+        mask &= (episodes["Vessel Type Name"] == vessel_type).to_numpy()
+    if port is not None:
+        mask &= (episodes["Nearest Port"] == port).to_numpy()
+    if start is not None:
+        mask &= (episodes["End"] >= pd.Timestamp(start)).to_numpy()
+    if end is not None:
+        mask &= (episodes["Start"] < pd.Timestamp(end) + pd.Timedelta(days=1)).to_numpy()
+    return pd.Timedelta(episodes["Duration"].to_numpy()[mask].max()) if mask.any() else pd.NaT
@@ -1,32 +1,38 @@
 import os
-import pandas as pd
 import dash_bootstrap_components as dbc
 from dash import Dash, dcc, html
-from flask import Flask
+from flask import Flask, has_request_context, request
 from flask_caching import Cache  #  Added Flask Caching
 import sys
 
 # Add the current directory to sys.path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from callbacks import register_callbacks
+from components import (create_dwell_table, create_port_table, create_summary_card, create_trend_graph, create_footer,
+                        placeholder_figure)
+from refresh import DataRefresher, DatasetHandle
+from instrumentation import init_app as init_instrumentation
+from result_cache import RESULT_CACHE_DIR, RESULT_CACHE_SIZE, ResultCache
 
-# To make render faster
-
-if "RENDER" in os.environ:
-    from data import load_data
-    from callbacks import register_callbacks
-    from components import create_map, create_port_table, create_summary_card, create_trend_graph, create_footer
-    from calculate_arrivals_departures import calculate_arrivals_departures
-else:
-    from data import load_data
-    from callbacks import register_callbacks
-    from components import create_map, create_port_table, create_summary_card, create_trend_graph, create_footer
-    from calculate_arrivals_departures import calculate_arrivals_departures
+# To make render faster: with FAST_START the server starts listening before
+# any data is read. The dataset, and the pandas-based modules that build it,
+# are loaded in the background, and pages are laid out with placeholder
+# figures and tables that the first callbacks fill.
+# On by default on Render, which fails a deploy whose port does not open in time
+FAST_START = os.environ.get("FAST_START", "1" if "RENDER" in os.environ else "").lower() in ("1", "true", "yes", "on")
 
 server = Flask(__name__)
 
-# Initialize caching (Using simple file-based cache)
-cache = Cache(server, config={'CACHE_TYPE': 'simple', "CACHE_DEFAULT_TIMEOUT": 300})
+# Callback results shared by every worker process: a bounded file cache in
+# RAM-backed /dev/shm (see result_cache.py), fronted by a per-process LRU
+cache = Cache(server, config={
+    'CACHE_TYPE': 'FileSystemCache',
+    'CACHE_DIR': RESULT_CACHE_DIR,
+    'CACHE_THRESHOLD': RESULT_CACHE_SIZE,
+    'CACHE_DEFAULT_TIMEOUT': 0  # entries are keyed by dataset version, so they never go stale
+})
+result_cache = ResultCache(cache)
 
 # Initialize Dash app with Bootstrap theme
 app = Dash(__name__, server=server, external_stylesheets=[dbc.themes.BOOTSTRAP])
@@ -34,131 +40,166 @@ app = Dash(__name__, server=server, external_stylesheets=[dbc.themes.BOOTSTRAP])
 # Set the browser tab title
 app.title = "Vessel Vision Dashboard"
 
-# Caching dataset load (Pre-load once and cache for faster access)
-@cache.cached(timeout=600, key_prefix='cached_df')
-def get_cached_data():
-    """
-    This function loads the dataset with a date filter and caches it for 600 seconds.
-    It allows faster access to the data without reloading from the source each time.
-    """
-    return load_data(date_filter="2024-01-01")
-
-df = get_cached_data()  # Load cached data
-
-# Ensure consistent date format
-df['Hour'] = df['BaseDateTime'].dt.hour
-df['BaseDateTime'] = pd.to_datetime(df['BaseDateTime']).dt.strftime('%Y-%m-%d')
+# Processed frame, port calls and initial figures, memory-mapped from the
+# prebuilt bundle in data/artifacts (or recomputed when it is missing or
+# stale), with the indexes the callbacks read. With FAST_START the handle
+# starts empty and the refresher loads it
+if FAST_START:
+    dataset = DatasetHandle()
+else:
+    from dataset import build_dataset
+    dataset = DatasetHandle(build_dataset())
 
-# Cache Port calculations
-@cache.cached(timeout=600, key_prefix='cached_port_table')
-def get_cached_port_table():
-    """
-    This function computes the port arrival and departure data from the provided dataframe.
-    The result is cached for faster access on subsequent loads.
-    """
-    return calculate_arrivals_departures(df)
+# Rebuilds the dataset in the background when the source data changes and
+# swaps it in; callbacks and new page loads then read the new version
+refresher = DataRefresher(dataset)
 
-port_result_df, car_df, pas_df = get_cached_port_table()
-port_table = create_port_table(port_result_df)
 
-#  Cache trend graph
-@cache.cached(timeout=600, key_prefix='cached_trend_graph')
-def get_cached_trend_graph():
+def serve_layout():
     """
-    This function generates a trend graph from the dataframe and caches it for 600 seconds.
-    It is used to quickly render the trend visualizations.
-    """
-    return create_trend_graph(df)
-
-trend_graph = get_cached_trend_graph()
+    Page layout for the dataset currently served, evaluated on every page
+    load so that a refreshed dataset shows its own days, filters and
+    initial figures.
 
-# Cache map to prevent re-rendering
-@cache.cached(timeout=600, key_prefix='cached_map')
-def get_cached_map():
+    Returns:
+        dbc.Container: The app layout.
     """
-    This function creates and caches the map visualization for faster rendering.
-    The map is based on the data provided in the dataframe.
-    """
-    return create_map(df)
-
-map_section = dbc.Col(
-    dcc.Graph(id="map-output", figure=get_cached_map(), style={'height': '100%', 'margin': '0', 'padding': '0'}),
-    width=7,
-    style={"height": "55vh", "padding": "0", "backgroundColor": "white"}
-)
-
-# Port Table & Trend Graph Section (Fixed height)
-port_section = dbc.Col([ 
-    html.Div(
-        port_table,
-        style={"height": "22vh",}
-    ),
-    html.Div(
-        trend_graph,
-        style={"height": "33vh"}
+    # Dash also evaluates the layout to check it, when it is set and on the first
+    # request of each process whatever its path; only a page load waits for the data.
+    # Dash's check runs before the app's own request hooks, so the loader is
+    # started here too
+    if dataset.ready or (has_request_context() and request.path.endswith("_dash-layout")):
+        refresher.start()
+        data = dataset.current
+    else:
+        data = None
+    vessel_types = data.df['Vessel Type Name'].dropna().unique() if data is not None else []
+    ports = data.df['Nearest Port'].dropna().unique() if data is not None else []
+    dates = data.dates if data is not None else []
+    first_date = data.first_date if data is not None else None
+
+    if FAST_START or data is None:
+        # Filled by the callbacks, which run when the page loads anyway
+        port_table = create_port_table(None)
+        dwell_table = create_dwell_table(None)
+        figures = {"map": placeholder_figure(), "trend": placeholder_figure()}
+    else:
+        # Initial port and dwell tables, counted off the port calls in the bundle,
+        # and trend graph and map, precomputed in it
+        from port_calls import port_call_table, port_dwell_table
+        port_table = create_port_table(port_call_table(data.visits, first_date, first_date))
+        dwell_table = create_dwell_table(port_dwell_table(data.visits, first_date, first_date))
+        figures = data.figures
+
+    trend_graph = create_trend_graph(None, figure=figures.get('trend'))
+
+    map_section = dbc.Col(
+        dcc.Graph(id="map-output", figure=figures.get('map'), style={'height': '100%', 'margin': '0', 'padding': '0'}),
+        width=7,
+        style={"height": "55vh", "padding": "0", "backgroundColor": "white"}
     )
-], width=4, style={
-    "height": "55vh",  
-    "display": "flex", 
-    "flexDirection": "column", 
-    "justifyContent": "flex-start", 
-})
 
-# App layout
-app.layout = dbc.Container([
-    html.Div([
-        html.H1([
-            html.Span("🚢", style={"fontSize": "4rem", "marginRight": "2rem"}),  # Bigger left ship emoji
-            "Vessel Vision",
-            html.Span("🚢", style={"fontSize": "4rem", "marginLeft": "2rem"})   # Bigger right ship emoji
-        ], className="text-center mb-0", style={"display": "flex", "justifyContent": "center", "alignItems": "center"}),
-        html.H5("- AIS Unique Vessel Tracking -", className="text-center text-muted")
-    ], className="my-2"),
-
-    # Summary Metrics Row
-    dbc.Row([
-        dbc.Col(create_summary_card("Total Unique Vessels", "total-unique-vessels", "#007BFF"), width=3),
-        dbc.Col(create_summary_card("Total Moving Vessels", "total-moving-vessels", "#28A745"), width=3),
-        dbc.Col(create_summary_card("Total Anchored Vessels", "total-anchored-vessels", "#6F42C1"), width=3),
-        dbc.Col(create_summary_card("Max Time Anchored (hours)", "max-time-anchored", "#FFC107"), width=3),
-    ], className="justify-content-center my-2"),
-
-    # Filters Section
-    dbc.Row([
-        dbc.Col(dcc.Dropdown(
-            id="vessel-type-filter",
-            options=[{"label": vessel_type, "value": vessel_type} for vessel_type in df['Vessel Type Name'].dropna().unique()],
-            placeholder="Select Vessel Type"
-        ), width=3),
-
-        dbc.Col(dcc.Dropdown(
-            id="nearest-port-filter",
-            options=[{"label": port, "value": port} for port in df['Nearest Port'].dropna().unique()],
-            placeholder="Select Nearest Port"
-        ), width=3),
-
-        dbc.Col(dcc.RadioItems(
-            id="date-filter",
-            options=[{"label": f" The data is from the date(s): {date}", "value": date} for date in df['BaseDateTime'].dropna().unique()],
-            value=df['BaseDateTime'].min(),
-            inline=True
-        ), width=3)
-    ], className="justify-content-center my-2"),
-
-    # Port Data Section with Trend Graph
-    dbc.Row([
-        port_section,
-        map_section
-    ], align="stretch", className="justify-content-center my-2"),
-
-    # Footer
-    create_footer() 
-
-], fluid=True, style={"backgroundColor": "white", "minHeight": "100vh", "display": "flex", "flexDirection": "column", "justifyContent": "space-between"})
+    # Port Table & Trend Graph Section (Fixed height)
+    port_section = dbc.Col([ 
+        html.Div(
+            dbc.Tabs([
+                dbc.Tab(port_table, label="Arrivals & Departures"),
+                dbc.Tab(dwell_table, label="Dwell Time")
+            ]),
+            style={"height": "22vh",}
+        ),
+        html.Div(
+            trend_graph,
+            style={"height": "33vh"}
+        )
+    ], width=4, style={
+        "height": "55vh",  
+        "display": "flex", 
+        "flexDirection": "column", 
+        "justifyContent": "flex-start", 
+    })
+
+    return dbc.Container([
+        html.Div([
+            html.H1([
+                html.Span("🚢", style={"fontSize": "4rem", "marginRight": "2rem"}),  # Bigger left ship emoji
+                "Vessel Vision",
+                html.Span("🚢", style={"fontSize": "4rem", "marginLeft": "2rem"})   # Bigger right ship emoji
+            ], className="text-center mb-0", style={"display": "flex", "justifyContent": "center", "alignItems": "center"}),
+            html.H5("- AIS Unique Vessel Tracking -", className="text-center text-muted")
+        ], className="my-2"),
+
+        # Summary Metrics Row
+        dbc.Row([
+            dbc.Col(create_summary_card("Total Unique Vessels", "total-unique-vessels", "#007BFF"), width=3),
+            dbc.Col(create_summary_card("Total Moving Vessels", "total-moving-vessels", "#28A745"), width=3),
+            dbc.Col(create_summary_card("Total Anchored Vessels", "total-anchored-vessels", "#6F42C1"), width=3),
+            dbc.Col(create_summary_card("Max Time Anchored (hours)", "max-time-anchored", "#FFC107"), width=3),
+        ], className="justify-content-center my-2"),
+
+        # Filters Section
+        dbc.Row([
+            dbc.Col(dcc.Dropdown(
+                id="vessel-type-filter",
+                options=[{"label": vessel_type, "value": vessel_type} for vessel_type in vessel_types],
+                placeholder="Select Vessel Type"
+            ), width=3),
+
+            dbc.Col(dcc.Dropdown(
+                id="nearest-port-filter",
+                options=[{"label": port, "value": port} for port in ports],
+                placeholder="Select Nearest Port"
+            ), width=3),
+
+            dbc.Col(dcc.DatePickerRange(
+                id="date-filter",
+                min_date_allowed=dates[0] if dates else None,
+                max_date_allowed=dates[-1] if dates else None,
+                start_date=first_date,
+                end_date=first_date,
+                display_format="YYYY-MM-DD"
+            ), width=3),
+
+            dbc.Col(dcc.RadioItems(
+                id="map-mode",
+                options=[{"label": "Pings", "value": "points"}, {"label": "Tracks", "value": "tracks"}],
+                value="points",
+                inline=True,
+                inputStyle={"marginRight": "4px", "marginLeft": "12px"}
+            ), width=2, style={"display": "flex", "alignItems": "center"})
+        ], className="justify-content-center my-2"),
+
+        # Port Data Section with Trend Graph
+        dbc.Row([
+            port_section,
+            map_section
+        ], align="stretch", className="justify-content-center my-2"),
+
+        # Footer
+        create_footer() 
+
+    ], fluid=True, style={"backgroundColor": "white", "minHeight": "100vh", "display": "flex", "flexDirection": "column", "justifyContent": "space-between"})
+
+
+# App layout, rebuilt on every page load
+app.layout = serve_layout
 
 # Register callbacks
-register_callbacks(app, df, port_result_df, car_df, pas_df)
+register_callbacks(app, result_cache=result_cache, dataset=dataset)
+
+# /metrics route and Server-Timing headers, only when METRICS_ENABLED is set
+init_instrumentation(app, result_cache)
+
+# Start the refresher in each worker process, including workers forked
+# after this module was imported (gunicorn --preload). With FAST_START the
+# first dataset is loaded by the first request each process serves instead,
+# as a loader thread still running when gunicorn --preload forks its workers
+# would leave them holding locks that are never released
+if not FAST_START:
+    refresher.start()
+server.before_request(refresher.start)
 
 if __name__ == '__main__':
+    refresher.start()
     port = int(os.environ.get("PORT", 10000))
     app.run_server(host="0.0.0.0", port=port)
@@ -0,0 +1,374 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from anchoring import anchored_episodes
+from figures import create_map, create_trend_figure, trend_series
+from data import _default_data_dir, dataset_version, load_data
+from data_store import date_bounds
+from port_calls import detect_port_calls
+from settings import APP_DATES, MAP_POINT_BUDGET, PORT_CALL_PARAMS
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the bundle layout changes, so older bundles are rebuilt
+ARTIFACT_FORMAT = 9
+
+MANIFEST_NAME = "manifest.json"
+FRAME_NAME = "frame.arrow"
+VISITS_NAME = "visits.parquet"
+EPISODES_NAME = "episodes.parquet"
+TREND_NAME = "trend.parquet"
+FIGURES_NAME = "figures.json"
+
+# tmpfs folder the frame is published to, so all worker processes map the
+# same pages in RAM; set SHARED_MEMORY_DIR to an empty string to map the
+# bundle's own file instead
+SHARED_MEMORY_DIR = os.environ.get("SHARED_MEMORY_DIR", "/dev/shm")
+SHARED_PREFIX = "vessel-vision-"
+
+
+class ArtifactBundle:
+    """
+    Everything app.py needs at boot: the processed frame, its port calls
+    and anchoring episodes, and the hourly trend series and figures of the
+    initial view (the frame's last day, see initial_date).
+    """
+
+    def __init__(self, df, visits, episodes, trend, figures, version, path=None):
+        """
+        Args:
+            df (pd.DataFrame): The app's frame, with df.attrs['dataset_version'].
+            visits (pd.DataFrame): Port calls of the whole frame, as
+                                   returned by detect_port_calls.
+            episodes (pd.DataFrame): Anchoring episodes of the whole frame,
+                                     as returned by anchored_episodes.
+            trend (pd.DataFrame): Distinct vessels and pings per hour, as
+                                  returned by trend_series.
+            figures (dict): Initial 'map' and 'trend' figures.
+            version (str): Dataset version the bundle was built from.
+            path (str, optional): Folder the bundle was loaded from.
+        """
+        self.df = df
+        self.visits = visits
+        self.episodes = episodes
+        self.trend = trend
+        self.figures = figures
+        self.version = version
+        self.path = path
+
+
+def artifact_root(data_dir=None):
+    """
+    Folder holding one subfolder per artifact bundle.
+    """
+    return os.path.join(_default_data_dir(data_dir), "artifacts")
+
+
+def _bundle_name(version):
+    return f"{version}-v{ARTIFACT_FORMAT}"
+
+
+def _date_key(date_filter):
+    # Names the days a bundle covers, e.g. '2024-01-01' or '2023-12-31_2024-01-01'
+    bounds = date_bounds(date_filter)
+    if bounds is None:
+        return "all"
+    start, end = bounds
+    return start if start == end else f"{start or 'first'}_{end or 'last'}"
+
+
+def initial_date(df):
+    """
+    Day the dashboard shows first: the last day of the frame.
+
+    Returns:
+        str: 'YYYY-MM-DD', or None for an empty frame.
+    """
+    dates = df['Date'].dropna()
+    return str(dates.max()) if len(dates) else None
+
+
+def build_artifacts(date_filter=APP_DATES, data_dir=None):
+    """
+    Compute a bundle from the source data. Nothing is written to disk.
+
+    Args:
+        date_filter (str or tuple, optional): Date, or inclusive (start, end)
+                                              range of dates, the app loads.
+        data_dir (str, optional): Defaults to the repository's data folder.
+
+    Returns:
+        ArtifactBundle: The freshly computed bundle.
+    """
+    df = load_data(date_filter=date_filter, data_dir=data_dir)
+    initial_df = df[df['Date'] == initial_date(df)] if len(df) else df
+    trend = trend_series(initial_df)
+    figures = {
+        "map": json.loads(create_map(initial_df).to_json()),
+        "trend": json.loads(create_trend_figure(trend).to_json()),
+    }
+    return ArtifactBundle(df, detect_port_calls(df), anchored_episodes(df), trend, figures, df.attrs['dataset_version'])
+
+
+def _frame_table(df):
+    """
+    Convert the frame to an Arrow table whose numeric columns can be read
+    back as NumPy views of the file. Datetime-like columns are stored as
+    their int64 representation (NaT included), and floats keep NaN as a
+    value, because Arrow nulls would force a copy when reading.
+    """
+    arrays, views = [], {}
+    for column in df.columns:
+        values = df[column]
+        if values.dtype.kind in "mM":
+            views[column] = str(values.dtype)
+            arrays.append(pa.array(values.to_numpy().view("int64")))
+        elif values.dtype.kind in "biuf":
+            arrays.append(pa.array(values.to_numpy()))
+        else:
+            arrays.append(pa.array(values, from_pandas=True))
+    return pa.table(arrays, names=list(df.columns), metadata={"views": json.dumps(views)})
+
+
+def _write_frame(df, path):
+    # Uncompressed Arrow IPC, so the file can be memory-mapped as is
+    table = _frame_table(df)
+    with pa.OSFile(path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def _read_frame(path):
+    """
+    Memory-map a frame written by _write_frame. Numeric and datetime-like
+    columns are read-only views of the mapped file, so every process that
+    maps the same file shares their pages instead of holding its own copy;
+    only string and categorical columns are materialised.
+    """
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    views = json.loads(table.schema.metadata.get(b"views", b"{}"))
+
+    columns = {}
+    for name, column in zip(table.column_names, table.columns):
+        if name in views or pa.types.is_integer(column.type) or pa.types.is_floating(column.type):
+            # combine_chunks would copy even a single chunk
+            chunk = column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+            values = chunk.to_numpy(zero_copy_only=True)
+            columns[name] = values.view(views[name]) if name in views else values
+        else:
+            columns[name] = column.to_pandas()
+    return pd.DataFrame(columns, copy=False)
+
+
+def save_artifacts(bundle, date_filter=APP_DATES, data_dir=None):
+    """
+    Write a bundle to data/artifacts/<version>-v<format>/ and remove older
+    bundles built for the same dates, or in an older format. The bundle is written to a temporary
+    folder and renamed into place, so readers never see a partial one and
+    concurrent builders (e.g. several gunicorn workers) do not clash.
+
+    Args:
+        bundle (ArtifactBundle): Bundle to save.
+        date_filter (str or tuple, optional): Dates the bundle was built for.
+        data_dir (str, optional): Defaults to the repository's data folder.
+
+    Returns:
+        str: Path of the bundle folder.
+    """
+    root = artifact_root(data_dir)
+    path = os.path.join(root, _bundle_name(bundle.version))
+    tmp_path = os.path.join(root, f".{_bundle_name(bundle.version)}.{os.getpid()}.tmp")
+    os.makedirs(tmp_path, exist_ok=True)
+
+    _write_frame(bundle.df, os.path.join(tmp_path, FRAME_NAME))
+    bundle.visits.to_parquet(os.path.join(tmp_path, VISITS_NAME), index=False)
+    bundle.episodes.to_parquet(os.path.join(tmp_path, EPISODES_NAME), index=False)
+    bundle.trend.to_parquet(os.path.join(tmp_path, TREND_NAME), index=False)
+    with open(os.path.join(tmp_path, FIGURES_NAME), "w") as f:
+        json.dump(bundle.figures, f)
+
+    manifest = {
+        "format": ARTIFACT_FORMAT,
+        "version": bundle.version,
+        "dates": _date_key(date_filter),
+        "map_point_budget": MAP_POINT_BUDGET,
+        "port_calls": PORT_CALL_PARAMS,
+        "rows": len(bundle.df),
+    }
+    with open(os.path.join(tmp_path, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    # An explicit rebuild replaces the bundle; processes that still map its
+    # frame keep their (unlinked) copy
+    shutil.rmtree(path, ignore_errors=True)
+    try:
+        os.rename(tmp_path, path)
+    except OSError:
+        # Another process saved the same version in the meantime
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+    # Older bundles of the same dates are stale now
+    for name in os.listdir(root):
+        other = os.path.join(root, name)
+        if name.startswith(".") or other == path:
+            continue
+        other_manifest = _read_manifest(other)
+        if other_manifest is None:
+            continue
+        if other_manifest.get("format") != ARTIFACT_FORMAT or other_manifest.get("dates") == _date_key(date_filter):
+            shutil.rmtree(other, ignore_errors=True)
+
+    return path
+
+
+def _shared_frame_path(path, date_filter):
+    """
+    Publish a bundle's frame to SHARED_MEMORY_DIR (once per bundle) and
+    return the path workers should map. The first worker copies the file in
+    and renames it into place; the others find it there. Copies of older
+    versions for the same data folder and dates are removed, which does not
+    affect workers that still map them.
+
+    Returns:
+        str: The shared copy, or the bundle's own frame file when no shared
+             memory folder is available.
+    """
+    frame_path = os.path.join(path, FRAME_NAME)
+    if not SHARED_MEMORY_DIR or not os.path.isdir(SHARED_MEMORY_DIR):
+        return frame_path
+
+    # Named after the artifact folder too, so apps (or benchmarks) reading other
+    # data folders with the same dates never remove each other's copies
+    root = os.path.realpath(os.path.dirname(path))
+    prefix = f"{SHARED_PREFIX}{hashlib.sha1(root.encode()).hexdigest()[:8]}-{_date_key(date_filter)}-"
+    # The modification time tells a rebuilt bundle of the same version apart
+    stamp = os.stat(frame_path).st_mtime_ns
+    shared_path = os.path.join(SHARED_MEMORY_DIR, f"{prefix}{os.path.basename(path)}-{stamp}.arrow")
+    if os.path.exists(shared_path):
+        return shared_path
+
+    tmp_path = f"{shared_path}.{os.getpid()}.tmp"
+    try:
+        shutil.copyfile(frame_path, tmp_path)
+        os.replace(tmp_path, shared_path)
+    except OSError:
+        # e.g. the tmpfs is full; the page cache still shares the bundle file
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return frame_path
+
+    for name in os.listdir(SHARED_MEMORY_DIR):
+        if name.startswith(prefix) and name.endswith(".arrow") and name != os.path.basename(shared_path):
+            os.remove(os.path.join(SHARED_MEMORY_DIR, name))
+    return shared_path
+
+
+def _read_manifest(path):
+    try:
+        with open(os.path.join(path, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_artifacts(date_filter=APP_DATES, data_dir=None):
+    """
+    Memory-map the bundle matching the current source data, if one exists.
+    The frame is mapped from its shared-memory copy (see SHARED_MEMORY_DIR),
+    so its numeric columns are shared by every process that loads it.
+
+    The expected version is computed from the source files' signatures
+    (see data.dataset_version), so a changed or newly ingested source makes
+    the saved bundle stale without any data being read.
+
+    Args:
+        date_filter (str or tuple, optional): Date, or inclusive (start, end)
+                                              range of dates, the app loads.
+        data_dir (str, optional): Defaults to the repository's data folder.
+
+    Returns:
+        ArtifactBundle or None: The bundle, or None when it is missing,
+                                stale or pyarrow is not installed.
+    """
+    if pa is None:
+        return None
+
+    version = dataset_version(date_filter=date_filter, data_dir=data_dir)
+    path = os.path.join(artifact_root(data_dir), _bundle_name(version))
+    manifest = _read_manifest(path)
+    if manifest is None or manifest.get("map_point_budget") != MAP_POINT_BUDGET:
+        return None
+    if manifest.get("port_calls") != PORT_CALL_PARAMS:
+        return None
+
+    df = _read_frame(_shared_frame_path(path, date_filter))
+    df.attrs['dataset_version'] = version
+
+    visits = pd.read_parquet(os.path.join(path, VISITS_NAME))
+    episodes = pd.read_parquet(os.path.join(path, EPISODES_NAME))
+    trend = pd.read_parquet(os.path.join(path, TREND_NAME))
+    with open(os.path.join(path, FIGURES_NAME)) as f:
+        figures = json.load(f)
+
+    return ArtifactBundle(df, visits, episodes, trend, figures, version, path)
+
+
+def get_artifacts(date_filter=APP_DATES, data_dir=None):
+    """
+    Load the current bundle, or recompute and save it when it is missing or
+    stale.
+
+    Args:
+        date_filter (str or tuple, optional): Date, or inclusive (start, end)
+                                              range of dates, the app loads.
+        data_dir (str, optional): Defaults to the repository's data folder.
+
+    Returns:
+        ArtifactBundle: The bundle for the current source data.
+    """
+    bundle = load_artifacts(date_filter, data_dir)
+    if bundle is not None:
+        return bundle
+
+    bundle = build_artifacts(date_filter, data_dir)
+    if pa is None:
+        return bundle
+    try:
+        save_artifacts(bundle, date_filter, data_dir)
+    except OSError:
+        # A read-only deployment still starts, it just recomputes every time
+        return bundle
+
+    # Map the saved copy, so this process shares the frame with the others
+    # instead of keeping the one it just built
+    return load_artifacts(date_filter, data_dir) or bundle
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute the dashboard's startup artifacts.")
+    parser.add_argument("--start", default=APP_DATES[0], help="First day the app loads (YYYY-MM-DD)")
+    parser.add_argument("--end", default=APP_DATES[1], help="Last day the app loads (YYYY-MM-DD)")
+    parser.add_argument("--data-dir", default=None, help="Data folder (defaults to the repository's data folder)")
+    args = parser.parse_args(argv)
+
+    date_filter = (args.start, args.end)
+    bundle = build_artifacts(date_filter, args.data_dir)
+    path = save_artifacts(bundle, date_filter, args.data_dir)
+    logger.info("Saved %d rows to %s", len(bundle.df), path)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    main()
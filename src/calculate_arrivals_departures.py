@@ -1,17 +1,156 @@
+import os
+import sys
+import numpy as np
 import pandas as pd
 
-port_result_df = None
-car_df = None
-pas_df = None
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from instrumentation import first_frame_rows, instrumented
+
+# national flag
+PORT_FLAGS = {
+    "Port of Tacoma": "\U0001F1FA\U0001F1F8", #US
+    "Port of Vancouver": "\U0001F1E8\U0001F1E6", #CA
+    "Port of Long Beach": "\U0001F1FA\U0001F1F8",
+    "Port of Los Angeles": "\U0001F1FA\U0001F1F8",
+    "Port of San Francisco": "\U0001F1FA\U0001F1F8",
+    "Port of Oakland": "\U0001F1FA\U0001F1F8",
+    "Port of Seattle": "\U0001F1FA\U0001F1F8",
+    "Port of Ensenada": "\U0001F1F2\U0001F1FD", #MX
+    "Port of San Diego": "\U0001F1FA\U0001F1F8",
+}
+
+PORT_TABLE_COLUMNS = ["FLAG", "PORT NAME", "ARRIVALS", "DEPARTURES"]
+
+
+def _sort_codes(values):
+    """
+    Integer codes that sort like the given values, with missing values
+    placed last (matching DataFrame.sort_values).
+    """
+    codes, _ = pd.factorize(values, sort=True)
+    codes[codes < 0] = codes.max() + 1
+    return codes
+
+
+def _port_table(departed, arrived):
+    """
+    Build the port table from one departure port and one arrival port per
+    transition, given in the order the transitions occur.
+
+    Ports are listed in the order they are first seen (departure port before
+    arrival port of each transition) before sorting by arrivals, so ties are
+    ordered exactly as in the original row-by-row implementation.
+    """
+    if len(departed) == 0:
+        return pd.DataFrame(columns=PORT_TABLE_COLUMNS)
+
+    interleaved = np.empty(2 * len(departed), dtype=object)
+    interleaved[0::2] = departed
+    interleaved[1::2] = arrived
+    ports = pd.unique(interleaved)
+
+    arrivals = pd.Series(arrived).value_counts(dropna=False).reindex(ports, fill_value=0)
+    departures = pd.Series(departed).value_counts(dropna=False).reindex(ports, fill_value=0)
+
+    result_df = pd.DataFrame({
+        "FLAG": [PORT_FLAGS.get(port, "\U0001F3F3") for port in ports],
+        "PORT NAME": ports,
+        "ARRIVALS": arrivals.to_numpy(),
+        "DEPARTURES": departures.to_numpy(),
+    })
+
+    return result_df.sort_values(by="ARRIVALS", ascending=False)
+
+
+@instrumented("compute_port_tables", rows_in=first_frame_rows, rows_out=None)
+def compute_port_tables(df, type_column="Vessel Type Name"):
+    """
+    Count arrivals and departures per port for all vessels and for every
+    vessel type in a single sort and pass.
+
+    A transition is two consecutive pings (ordered by MMSI, then
+    BaseDateTime) of the same vessel whose 'Nearest Port' differs: the
+    vessel departs the first port and arrives at the second. A missing
+    port never equals another one, as NaN != NaN in the row-by-row
+    version, so two pings without a port are a transition too. Per vessel
+    type, only consecutive pings of that type are compared, exactly as if
+    the frame had been filtered to the type first.
+
+    Args:
+        df (pd.DataFrame): Vessel data with 'MMSI', 'BaseDateTime',
+                           'Nearest Port' and type_column columns.
+        type_column (str, optional): Column to split vessel types on.
+
+    Returns:
+        dict: Maps None to the all-vessel port table and every vessel type
+              name to its own table, each with columns PORT_TABLE_COLUMNS.
+    """
+    if df.empty:
+        return {None: pd.DataFrame(columns=PORT_TABLE_COLUMNS)}
+
+    # Stable sort by MMSI then time, as sort_values does with several keys
+    order = np.lexsort((_sort_codes(df["BaseDateTime"]), _sort_codes(df["MMSI"])))
+
+    mmsi = df["MMSI"].to_numpy()[order]
+    port_codes, port_names = pd.factorize(df["Nearest Port"], use_na_sentinel=False)
+    port_codes = port_codes[order]
+    port_names = np.asarray(port_names, dtype=object)
+    missing = pd.isna(port_names)
+
+    def transitions(mmsi, ports, groups=None):
+        # Positions i where ping i+1 continues ping i's vessel (and group)
+        # but reports a different (or no) nearest port
+        same = mmsi[1:] == mmsi[:-1]
+        if groups is not None:
+            same &= groups[1:] == groups[:-1]
+        differ = (ports[1:] != ports[:-1]) | (missing[ports[1:]] & missing[ports[:-1]])
+        moved = np.flatnonzero(same & differ)
+        return moved, ports[moved], ports[moved + 1]
+
+    _, departed, arrived = transitions(mmsi, port_codes)
+    tables = {None: _port_table(port_names[departed], port_names[arrived])}
+
+    # Regroup the already sorted rows by vessel type; the stable sort keeps
+    # MMSI/time order inside each type, which is what filtering would give
+    type_codes, type_names = pd.factorize(df[type_column])
+    type_codes = type_codes[order]
+    by_type = np.argsort(type_codes, kind="stable")
+
+    moved, departed, arrived = transitions(mmsi[by_type], port_codes[by_type], type_codes[by_type])
+    transition_types = type_codes[by_type][moved]
+
+    for code, type_name in enumerate(type_names):
+        in_type = transition_types == code
+        tables[type_name] = _port_table(port_names[departed[in_type]], port_names[arrived[in_type]])
+
+    return tables
+
+
+def compute_port_stats(df):
+    """
+    Count arrivals and departures per port for every vessel in the frame.
+
+    Args:
+        df (pd.DataFrame): Vessel data, see compute_port_tables.
+
+    Returns:
+        pd.DataFrame: Port table with columns PORT_TABLE_COLUMNS, sorted by
+                      arrivals (descending).
+    """
+    return compute_port_tables(df)[None]
 
 
 # calculate departures and arrivals
+@instrumented("calculate_arrivals_departures", rows_in=first_frame_rows, rows_out=None)
 def calculate_arrivals_departures(df):
     """
     Computes vessel arrivals and departures for each port.
     Also assigns the corresponding national flag emoji to each port.
     Separates data for Cargo and Passenger vessel types.
 
+    The tables are computed from the frame passed in on every call; nothing
+    is kept between calls, so a different frame never gets a stale result.
+
     Returns:
     --------
     Three DataFrames:
@@ -19,77 +158,11 @@ def calculate_arrivals_departures(df):
         - car_df (Only Cargo vessels)
         - pas_df (Only Passenger vessels)
     """
+    tables = compute_port_tables(df)
+    empty_table = pd.DataFrame(columns=PORT_TABLE_COLUMNS)
 
-    # only calculate once and store result
-    global port_result_df, car_df, pas_df
-
-    if port_result_df is not None and car_df is not None and pas_df is not None:
-        return port_result_df, car_df, pas_df 
-    
-    cargo_df = df[df["Vessel Type Name"] == "Cargo"]
-    passenger_df = df[df["Vessel Type Name"] == "Passenger"]
-
-    def compute_port_stats(filtered_df):
-        # national flag
-        port_flags = {
-            "Port of Tacoma": "\U0001F1FA\U0001F1F8", #US
-            "Port of Vancouver": "\U0001F1E8\U0001F1E6", #CA
-            "Port of Long Beach": "\U0001F1FA\U0001F1F8",
-            "Port of Los Angeles": "\U0001F1FA\U0001F1F8",
-            "Port of San Francisco": "\U0001F1FA\U0001F1F8",
-            "Port of Oakland": "\U0001F1FA\U0001F1F8",
-            "Port of Seattle": "\U0001F1FA\U0001F1F8",
-            "Port of Ensenada": "\U0001F1F2\U0001F1FD", #MX
-            "Port of San Diego": "\U0001F1FA\U0001F1F8",
-        }
-
-        # sort by MMSI and BaseDateTime
-        filtered_df = filtered_df.sort_values(by=["MMSI", "BaseDateTime"])
-        port_stats = {}
-        prev_port = None
-        prev_mmsi = None
-
-        for _, row in filtered_df.iterrows():
-            current_port = row["Nearest Port"]
-            mmsi = row["MMSI"]
-
-            if mmsi != prev_mmsi:
-                prev_mmsi = mmsi
-                prev_port = current_port
-                continue
-
-            if current_port != prev_port:
-                # departure from old port +1
-                if prev_port in port_stats:
-                    port_stats[prev_port]["departures"] += 1
-                else:
-                    port_stats[prev_port] = {"arrivals": 0, "departures": 1}
-
-                # arrival in new port +1
-                if current_port in port_stats:
-                    port_stats[current_port]["arrivals"] += 1
-                else:
-                    port_stats[current_port] = {"arrivals": 1, "departures": 0}
-
-            prev_port = current_port
-
-        if not port_stats:
-            return pd.DataFrame(columns=["FLAG", "PORT NAME", "ARRIVALS", "DEPARTURES"])
-        
-        result_df = pd.DataFrame([
-            {
-                "FLAG": port_flags.get(port, "\U0001F3F3"), 
-                "PORT NAME": port,
-                "ARRIVALS": stats["arrivals"],
-                "DEPARTURES": stats["departures"],
-            }
-            for port, stats in port_stats.items()
-        ])
-
-        return result_df.sort_values(by="ARRIVALS", ascending=False)
-
-    port_result_df = compute_port_stats(df)
-    car_df = compute_port_stats(cargo_df)
-    pas_df = compute_port_stats(passenger_df)
+    port_result_df = tables[None]
+    car_df = tables.get("Cargo", empty_table)
+    pas_df = tables.get("Passenger", empty_table)
 
     return port_result_df, car_df, pas_df
@@ -1,14 +1,64 @@
-from dash.dependencies import Input, Output
+from dash import Patch, no_update
+from dash.dependencies import Input, Output, State
+import functools
 import os
 import sys
-import pandas as pd
-import plotly.graph_objects as go
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from components import create_map
-from calculate_arrivals_departures import calculate_arrivals_departures
+from instrumentation import instrumented
+from refresh import DatasetHandle
+from settings import MAP_POINT_BUDGET, PORT_CALL_PARAMS, TREND_HOURLY_MAX_DAYS
 
-def register_callbacks(app, df, port_result_df, car_df, pas_df):
+# The callbacks import the data modules (pandas, plotly) when they first run,
+# which is after the first dataset is loaded, so registering them does not
+# delay a server's start (see FAST_START in app.py)
+
+# Bumped whenever a memoized callback's outputs change, so results cached by
+# older code in the shared result cache (which outlives restarts) are not served
+RESULTS_FORMAT = 5
+
+# Version the memoized results are keyed by besides the dataset: the output
+# format and the settings they are computed with, so results cached with other
+# settings (e.g. a different port radius) are not served either
+RESULTS_VERSION = f"{RESULTS_FORMAT}-{MAP_POINT_BUDGET}-" + "-".join(
+    f"{name}={value}" for name, value in sorted(PORT_CALL_PARAMS.items())
+)
+
+def _date_window(dates, start_date, end_date):
+    """
+    Resolve the date picker's range against the loaded days.
+
+    Args:
+        dates (list): Sorted 'YYYY-MM-DD' days held in the frame.
+        start_date (str): Picked start date (may carry a time part), or None.
+        end_date (str): Picked end date, or None.
+
+    Returns:
+        tuple: (start, end, days) where start and end are 'YYYY-MM-DD'
+               (open ends become the first/last loaded day) and days is the
+               tuple of loaded days inside the range, or None when the range
+               covers every loaded day.
+    """
+    start = str(start_date)[:10] if start_date else (dates[0] if dates else None)
+    end = str(end_date)[:10] if end_date else (dates[-1] if dates else None)
+    days = tuple(day for day in dates if start <= day <= end) if start and end else tuple(dates)
+    return start, end, (None if len(days) == len(dates) else days)
+
+def with_current(handle):
+    """
+    Decorator passing the handle's current dataset as the first argument.
+    It is read once per call, so a refresh never mixes two datasets in one
+    result; memoized results are keyed by it (see Dataset.__repr__).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args):
+            return func(handle.current, *args)
+        return wrapper
+    return decorator
+
+def register_callbacks(app, df=None, visits=None, dataset_version=None, filter_index=None, summary_cube=None,
+                       spatial_grid=None, result_cache=None, dataset=None):
     """
     Register the callbacks for the Dash app to update the map, statistics, 
     and trend graph based on user input.
@@ -16,19 +66,54 @@ def register_callbacks(app, df, port_result_df, car_df, pas_df):
     Args:
         app (dash.Dash): The Dash app instance.
         df (pd.DataFrame): The main dataframe containing vessel data.
-        port_result_df (pd.DataFrame): DataFrame containing port-related results.
-        car_df (pd.DataFrame): DataFrame containing cargo vessel data.
-        pas_df (pd.DataFrame): DataFrame containing passenger vessel data.
+        visits (pd.DataFrame, optional): Port calls in df, answering the
+                                         port and dwell tables for any
+                                         filter set. Detected here when
+                                         not given.
+        dataset_version (str, optional): Version of df used in cache keys.
+        filter_index (FilterIndex, optional): Index over df's filter columns.
+                                              Built here when not given.
+        summary_cube (SummaryCube, optional): Pre-aggregated KPIs for the
+                                              summary cards and the trend
+                                              graph. Built here when not
+                                              given.
+        spatial_grid (SpatialGrid, optional): Grid index over df's LAT/LON
+                                              used for viewport queries.
+                                              Built here when not given.
+        result_cache (ResultCache, optional): Memoizes the map/stats and
+                                              trend results per set of
+                                              inputs. Nothing is memoized
+                                              when not given.
+        dataset (DatasetHandle, optional): Handle the callbacks read their
+                                           data from on every call, so a
+                                           refreshed dataset can be swapped
+                                           in while the app runs. When given,
+                                           df, visits and the indexes
+                                           above are not used.
     
     Returns:
         None: This function does not return anything. It registers callbacks 
               with the Dash app.
     """
+    if dataset is None:
+        # A fixed dataset; missing indexes are built from df
+        from dataset import Dataset
+        dataset = DatasetHandle(Dataset(
+            df, visits, filter_index=filter_index, summary_cube=summary_cube, spatial_grid=spatial_grid,
+            version=dataset_version
+        ))
+
+    # Results per (dataset version, vessel type, port, start date, end date)
+    if result_cache is not None:
+        memoize = result_cache.memoize
+    else:
+        memoize = lambda name, version=None: (lambda func: func)
     
     @app.callback(
         [
             Output("map-output", "figure"), 
             Output("port-table", "data"),
+            Output("dwell-table", "data"),
             Output("total-unique-vessels", "children"),
             Output("total-moving-vessels", "children"),
             Output("total-anchored-vessels", "children"),
@@ -37,64 +122,59 @@ def register_callbacks(app, df, port_result_df, car_df, pas_df):
         [
             Input("vessel-type-filter", "value"),
             Input("nearest-port-filter", "value"),
-            Input("date-filter", "value")
+            Input("date-filter", "start_date"),
+            Input("date-filter", "end_date"),
+            Input("map-mode", "value")
         ]
     )
-    def update_map_and_stats(vessel_type, nearest_port, selected_date):
+    @instrumented("callback.update_map_and_stats", rows_out=None)
+    @with_current(dataset)
+    @memoize("map_and_stats", RESULTS_VERSION)
+    def update_map_and_stats(data, vessel_type, nearest_port, start_date, end_date, map_mode=None):
         """
         Update the map and various statistics based on the selected filters.
         
         Args:
+            data (Dataset): The dataset currently served.
             vessel_type (str): Selected vessel type to filter by.
             nearest_port (str): Selected port to filter by.
-            selected_date (str): Selected date to filter by.
+            start_date (str): First day of the selected date range.
+            end_date (str): Last day of the selected date range.
+            map_mode (str, optional): "points" (default) or "tracks".
         
         Returns:
-            tuple: Contains updated map figure, port table data, and various 
+            tuple: Contains updated map figure (as a dict), port and dwell table data, and various 
                    statistics (total unique vessels, moving vessels, anchored 
                    vessels, and max time anchored).
         """
-        # Start with the full dataframe
-        filtered_df = df.copy()
-
-        # Apply Vessel Type filter
-        if vessel_type:
-            filtered_df = filtered_df[filtered_df["Vessel Type Name"] == vessel_type]
-
-        # Apply Nearest Port filter
-        if nearest_port:
-            filtered_df = filtered_df[filtered_df["Nearest Port"] == nearest_port]
-
-        # Apply Date filter
-        if selected_date:
-            filtered_df = filtered_df[filtered_df["BaseDateTime"] == selected_date]
-
-        # Compute updated metrics
-        total_unique_vessels = filtered_df["MMSI"].nunique()
-        total_moving_vessels = filtered_df[filtered_df["SOG"] > 0]["MMSI"].nunique()
-        total_anchored_vessels = filtered_df[filtered_df["SOG"] == 0]["MMSI"].nunique()
-
-        # Ensure 'Duration Anchored' is in a consistent numeric format (Timedelta or hours as float)
-        if "Duration Anchored" in filtered_df.columns:
-            filtered_df["Duration Anchored"] = pd.to_timedelta(filtered_df["Duration Anchored"], errors='coerce')
-            max_time_anchored = filtered_df["Duration Anchored"].max()
-            max_time_anchored = f"{round(max_time_anchored.total_seconds() / 3600, 2)} hours" if pd.notna(max_time_anchored) else "N/A"
-        else:
-            max_time_anchored = "N/A"  # If column doesn't exist
-        
+        import pandas as pd
+        from anchoring import longest_episode
+        from figures import create_map
+        from port_calls import port_call_table, port_dwell_table
 
-        # Fix: For Port table, compute from port_result_df rather than calculate again
-        if vessel_type == "Cargo":
-            selected_df = car_df
-        elif vessel_type == "Passenger":
-            selected_df = pas_df
-        else:
-            selected_df = port_result_df
+        start, end, days = _date_window(data.dates, start_date, end_date)
+
+        # Vessel Type, Nearest Port and Date filters in one index lookup (read-only result)
+        filtered_df = data.filter_index.take(vessel_type or None, nearest_port or None, days)
+
+        # Vessel count cards come from the pre-aggregated cube, not from the filtered rows;
+        # its per-day vessel sets are unioned, so a range counts every vessel once
+        summary = data.summary_cube.query(vessel_type or None, nearest_port or None, days)
+        total_unique_vessels = summary["unique"]
+        total_moving_vessels = summary["moving"]
+        total_anchored_vessels = summary["anchored"]
 
-        if nearest_port:
-            selected_df = selected_df[selected_df["PORT NAME"] == nearest_port]
+        # Longest contiguous stop at anchor, from the anchoring episodes found once per dataset
+        max_time_anchored = longest_episode(data.episodes, start, end, vessel_type or None, nearest_port or None)
+        max_time_anchored = f"{round(max_time_anchored.total_seconds() / 3600, 2)} hours" if pd.notna(max_time_anchored) else "N/A"
 
-        return create_map(filtered_df), selected_df.to_dict("records"), f"{total_unique_vessels:,}", f"{total_moving_vessels:,}", f"{total_anchored_vessels:,}", max_time_anchored
+        # Port and dwell tables: counted off the port calls detected once per dataset,
+        # without going back to the rows
+        selected_df = port_call_table(data.visits, start, end, vessel_type or None, nearest_port or None)
+        dwell_df = port_dwell_table(data.visits, start, end, vessel_type or None, nearest_port or None)
+
+        # Plain dicts, so memoized results pickle and load quickly
+        return create_map(filtered_df, mode=map_mode or "points").to_plotly_json(), selected_df.to_dict("records"), dwell_df.to_dict("records"), f"{total_unique_vessels:,}", f"{total_moving_vessels:,}", f"{total_anchored_vessels:,}", max_time_anchored
 
 
     @app.callback(
@@ -102,38 +182,43 @@ def register_callbacks(app, df, port_result_df, car_df, pas_df):
         [
             Input("vessel-type-filter", "value"),
             Input("nearest-port-filter", "value"),
-            Input("date-filter", "value")
+            Input("date-filter", "start_date"),
+            Input("date-filter", "end_date")
         ]
     )
-    def update_trend_graph(vessel_type, nearest_port, selected_date):
+    @instrumented("callback.update_trend_graph", rows_out=None)
+    @with_current(dataset)
+    @memoize("trend_graph", RESULTS_VERSION)
+    def update_trend_graph(data, vessel_type, nearest_port, start_date, end_date):
         """
-        Update the trend graph based on selected filters. Dynamically adjusts the 
-        graph height based on the amount of data being visualized.
+        Update the trend graph based on selected filters, on a timestamp axis:
+        hourly for short date ranges and daily for long ones. Dynamically
+        adjusts the graph height based on the amount of data being visualized.
         
         Args:
+            data (Dataset): The dataset currently served.
             vessel_type (str): Selected vessel type to filter by.
             nearest_port (str): Selected port to filter by.
-            selected_date (str): Selected date to filter by.
+            start_date (str): First day of the selected date range.
+            end_date (str): Last day of the selected date range.
         
         Returns:
-            plotly.graph_objects.Figure: The updated figure for the trend graph.
+            dict: The updated figure for the trend graph.
         """
-        filtered_df = df.copy()
-
-        if vessel_type:
-            filtered_df = filtered_df[filtered_df["Vessel Type Name"] == vessel_type]
-
-        if nearest_port:
-            filtered_df = filtered_df[filtered_df["Nearest Port"] == nearest_port]
+        import pandas as pd
+        import plotly.graph_objects as go
 
-        if selected_date:
-            filtered_df = filtered_df[filtered_df["BaseDateTime"] == selected_date]
+        start, end, days = _date_window(data.dates, start_date, end_date)
 
-        df_trend = filtered_df.groupby('Hour').size().reset_index(name='Unique Vessels')
+        # Sliced from the cube's precomputed distinct-vessel counts, whatever the
+        # length of the range: hourly for short ranges, daily for long ones
+        n_days = (pd.Timestamp(end) - pd.Timestamp(start)).days + 1 if start and end else 0
+        freq = 'h' if n_days <= TREND_HOURLY_MAX_DAYS else 'D'
+        df_trend = data.summary_cube.trend(vessel_type or None, nearest_port or None, days, freq=freq)
 
         fig = go.Figure()
         fig.add_trace(go.Scatter(
-            x=df_trend['Hour'],
+            x=df_trend['Timestamp'],
             y=df_trend['Unique Vessels'],
             mode='lines+markers',
             name='Unique Vessels Over Time',
@@ -151,11 +236,69 @@ def register_callbacks(app, df, port_result_df, car_df, pas_df):
 
         fig.update_layout(
             title='Trend of Unique Vessels Over Time',
-            xaxis_title='Hour of the Day',
+            xaxis_title='Time',
             yaxis_title='Number of Vessels',
             template='plotly_white',
             margin=dict(l=20, r=20, t=30, b=20),
             height=graph_height  # Dynamically adjust height
         )
 
-        return fig
+        return fig.to_plotly_json()
+
+
+    @app.callback(
+        Output("map-output", "figure", allow_duplicate=True),
+        Input("map-output", "relayoutData"),
+        [
+            State("vessel-type-filter", "value"),
+            State("nearest-port-filter", "value"),
+            State("date-filter", "start_date"),
+            State("date-filter", "end_date"),
+            State("map-mode", "value")
+        ],
+        prevent_initial_call=True
+    )
+    @instrumented("callback.update_map_viewport", rows_out=None)
+    @with_current(dataset)
+    def update_map_viewport(data, relayout_data, vessel_type, nearest_port, start_date, end_date, map_mode=None):
+        """
+        Redraw only the points inside the visible map area after a pan or
+        zoom, at the level of detail that fits the point budget. The layout
+        (and with it the user's view) is left untouched by sending a partial
+        update of the traces and the annotation.
+        
+        Args:
+            data (Dataset): The dataset currently served.
+            relayout_data (dict): The map's relayoutData (viewport bounds and zoom).
+            vessel_type (str): Selected vessel type to filter by.
+            nearest_port (str): Selected port to filter by.
+            start_date (str): First day of the selected date range.
+            end_date (str): Last day of the selected date range.
+            map_mode (str, optional): "points" (default) or "tracks".
+        
+        Returns:
+            dash.Patch: Partial figure update, or no_update when the event
+                        does not describe a viewport.
+        """
+        import numpy as np
+        from figures import create_map
+        from spatial_index import viewport_bounds
+
+        bounds = viewport_bounds(relayout_data)
+        if bounds is None:
+            return no_update
+
+        # Rows inside the viewport that match the current filters: both indexes
+        # return sorted positions, so the rows are copied once, already filtered
+        visible = data.spatial_grid.query(*bounds)
+        _, _, days = _date_window(data.dates, start_date, end_date)
+        matching = data.filter_index.positions(vessel_type or None, nearest_port or None, days)
+        if matching is not None:
+            visible = np.intersect1d(visible, matching, assume_unique=True)
+        visible_df = data.df.take(visible)
+
+        figure = create_map(visible_df, mode=map_mode or "points").to_plotly_json()
+        patched_figure = Patch()
+        patched_figure["data"] = figure["data"]
+        patched_figure["layout"]["annotations"] = figure["layout"]["annotations"]
+        return patched_figure
@@ -1,21 +1,23 @@
-import plotly.express as px
+import os
 from dash import html, dcc, dash_table
-import plotly.graph_objects as go
 import dash_bootstrap_components as dbc
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 def create_filters(vessel_types, nearest_ports, vessel_names, dates):
     """
     This function will create all the filters: dropdowns for vessel type, nearest port, vessel name,
-    and radio button for date.
+    and a date range picker.
     
     Args:
     vessel_types (list): List of vessel types to be used in the dropdown.
     nearest_ports (list): List of nearest ports to be used in the dropdown.
     vessel_names (list): List of vessel names to be used in the dropdown.
-    dates (list): List of dates for the radio items.
+    dates (list): Sorted 'YYYY-MM-DD' dates that can be picked; the last one is selected.
 
     Returns:
-    html.Div: A Dash Div component containing the filter dropdowns and radio items.
+    html.Div: A Dash Div component containing the filter dropdowns and the date range picker.
     """
     return html.Div([
         dcc.Dropdown(
@@ -33,58 +35,16 @@ def create_filters(vessel_types, nearest_ports, vessel_names, dates):
             options=[{"label": vn, "value": vn} for vn in vessel_names],
             placeholder="Select Vessel Name",
         ),
-        dcc.RadioItems(
+        dcc.DatePickerRange(
             id="date-filter",
-            options=[{"label": dt, "value": dt} for dt in dates],
-            labelStyle={"display": "inline-block"},
+            min_date_allowed=dates[0] if dates else None,
+            max_date_allowed=dates[-1] if dates else None,
+            start_date=dates[-1] if dates else None,
+            end_date=dates[-1] if dates else None,
+            display_format="YYYY-MM-DD",
         ),
     ], style={'display': 'flex', 'gap': '10px'})
 
-def create_map(filtered_df):
-    """
-    This function generates a map with the filtered DataFrame.
-    It also adds summary information (total unique vessels) to the map title and as an annotation.
-    
-    Args:
-    filtered_df (DataFrame): The filtered DataFrame containing vessel data.
-    
-    Returns:
-    plotly.graph_objects.Figure: A Plotly figure object containing the map.
-    """
-    unique_count = filtered_df["MMSI"].nunique()
-    
-    fig = px.scatter_mapbox(
-        filtered_df,
-        lat="LAT",
-        lon="LON",
-        color="Vessel Type Name",
-        hover_data=["MMSI", "VesselName", "SOG"],
-        mapbox_style="open-street-map",
-        zoom=5,
-        size_max=10
-    )
-    
-    fig.add_annotation(
-        text=f"Total Unique Vessels: {unique_count}",
-        xref="paper", yref="paper",
-        x=0.05, y=0.95,  # Position near the top-left of the map
-        showarrow=False,
-        font=dict(size=14, color="black")
-    )
-
-    fig.update_layout(
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=-0.05,
-            xanchor="center",
-            x=0.5
-        ),
-        margin=dict(r=0, t=0, l=0, b=20)
-    )
-    
-    return fig
-
 # Country names dictionary for hover tooltips
 COUNTRY_NAMES = {
     "🇺🇸": "United States",
@@ -103,11 +63,13 @@ def create_port_table(port_result_df):
     Create a Bootstrap Card containing the Port Table with hover tooltips.
     
     Args:
-    port_result_df (DataFrame): The DataFrame containing port-related data.
+    port_result_df (DataFrame): The DataFrame containing port-related data, or
+                                None for an empty table (filled by a callback).
     
     Returns:
     dbc.Card: A Dash Bootstrap card containing a table with port data and hover tooltips.
     """
+    records = port_result_df.to_dict("records") if port_result_df is not None else []
     return dbc.Card(
         dbc.CardBody([
             html.H5("Number of Arrivals & Departures per Port", style={"fontFamily": "Arial, sans-serif"}),
@@ -119,7 +81,7 @@ def create_port_table(port_result_df):
                     {"name": "ARRIVALS", "id": "ARRIVALS"},
                     {"name": "DEPARTURES", "id": "DEPARTURES"},
                 ],
-                data=port_result_df.to_dict("records"),
+                data=records,
                 page_size=3,
 
                 # Add hover tooltips for FLAG column
@@ -127,7 +89,7 @@ def create_port_table(port_result_df):
                 tooltip_data=[
                     {
                         "FLAG": {"value": COUNTRY_NAMES.get(row["FLAG"], "Unknown Country"), "type": "markdown"}
-                    } for row in port_result_df.to_dict("records")
+                    } for row in records
                 ],
                 tooltip_delay=0,
                 tooltip_duration=None,
@@ -162,6 +124,51 @@ def create_port_table(port_result_df):
         ])
     )
 
+def create_dwell_table(dwell_df):
+    """
+    Create a Bootstrap Card containing the Dwell Time Table: port calls per
+    port with their median time in port and at anchor.
+
+    Args:
+    dwell_df (DataFrame): Dwell statistics per port, as returned by port_dwell_table,
+                          or None for an empty table (filled by a callback).
+
+    Returns:
+    dbc.Card: A Dash Bootstrap card containing a table with dwell statistics.
+    """
+    return dbc.Card(
+        dbc.CardBody([
+            html.H5("Port Calls & Median Dwell Time per Port", style={"fontFamily": "Arial, sans-serif"}),
+            dash_table.DataTable(
+                id="dwell-table",
+                columns=[
+                    {"name": "PORT NAME", "id": "PORT NAME"},
+                    {"name": "VISITS", "id": "VISITS"},
+                    {"name": "DWELL (h)", "id": "MEDIAN DWELL (h)"},
+                    {"name": "ANCHORED (h)", "id": "MEDIAN ANCHORED (h)"},
+                    {"name": "VISITS / HOUR", "id": "VISITS / HOUR"},
+                ],
+                data=dwell_df.to_dict("records") if dwell_df is not None else [],
+                page_size=3,
+                style_table={"overflowX": "auto", "margin": "auto", "border": "none", "fontFamily": "Arial, sans-serif"},
+                style_header={"fontWeight": "bold", "border": "none", "fontFamily": "Arial, sans-serif"},
+                style_cell={
+                    "textAlign": "center",
+                    "border": "none",
+                    "fontFamily": "Arial, sans-serif",
+                    "padding": "1px",
+                    "margin": "0px",
+                    "lineHeight": "1"
+                },
+                style_data={
+                    "border": "none",
+                    "height": "10px",
+                    "lineHeight": "1"
+                }
+            )
+        ])
+    )
+
 # Function to create Bootstrap-styled summary cards
 def create_summary_card(title, value, color):
     """
@@ -183,42 +190,52 @@ def create_summary_card(title, value, color):
         style={"textAlign": "center", "margin": "10px", "backgroundColor": color, "color": "white"}
     )
 
+def placeholder_figure(message="Loading..."):
+    """
+    An empty figure showing a message, built as a plain dict so that a page
+    can be laid out before any data is loaded or plotted. The callbacks
+    replace it with the real figure when the page loads.
+
+    Args:
+    message (str, optional): Text shown in the middle of the figure.
+
+    Returns:
+    dict: A Plotly figure.
+    """
+    hidden_axis = {"visible": False}
+    return {
+        "data": [],
+        "layout": {
+            "xaxis": hidden_axis,
+            "yaxis": hidden_axis,
+            "annotations": [{"text": message, "showarrow": False, "xref": "paper", "yref": "paper", "x": 0.5, "y": 0.5,
+                             "font": {"size": 14, "color": "grey", "family": "Arial, sans-serif"}}],
+            "template": {"layout": {"plot_bgcolor": "white", "paper_bgcolor": "white"}},
+            "margin": {"l": 20, "r": 20, "t": 30, "b": 20},
+        },
+    }
+
 # Function to create trend graph
-def create_trend_graph(df):
+def create_trend_graph(df, figure=None):
     """
-    This function generates a trend graph of unique vessels over time (hour of the day).
+    This function generates a trend graph of unique vessels over time.
     
     Args:
-    df (DataFrame): The DataFrame containing the vessel data with an 'Hour' column.
+    df (DataFrame): The DataFrame containing the vessel data with a 'BaseDateTime' column.
+    figure (Figure or dict, optional): A precomputed trend figure (see artifacts.py);
+                                       df is not read when it is given.
     
     Returns:
     dcc.Graph: A Dash component displaying the trend graph.
     """
-    df_trend = df.groupby('Hour').size().reset_index(name='Unique Vessels')
-
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=df_trend['Hour'],
-        y=df_trend['Unique Vessels'],
-        mode='lines+markers',
-        name='Unique Vessels Over Time',
-        line=dict(color='blue')
-    ))
-
-    fig.update_layout(
-        title='',
-        xaxis_title='Hour of the Day',
-        yaxis_title='Number of Vessels',
-        template='plotly_white',
-        margin=dict(l=50, r=20, t=30, b=20),
-        font=dict(family="Arial, sans-serif"),  
-        plot_bgcolor='white', 
-        autosize=True
-    )
+    if figure is None:
+        # Imported here, so that laying out a page needs neither pandas nor plotly
+        from figures import create_trend_figure, trend_series
+        figure = create_trend_figure(trend_series(df))
 
     return dcc.Graph(
         id="trend-graph",
-        figure=fig,
+        figure=figure,
         config={"responsive": True},
         style={"height": "100%", "width": "100%", "border": "none"}
     )
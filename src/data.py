@@ -1,77 +1,296 @@
+import hashlib
+import json
 import os
+import sys
+from functools import partial
 import pandas as pd
 import numpy as np
 
-def load_data(date_filter=None):
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from anchoring import anchored_durations
+from data_store import (CATEGORICAL_COLUMNS, STORE_COLUMNS, date_bounds, file_signature, read_store,
+                        store_available, store_signature, sync_store)
+from instrumentation import instrumented
+from parallel import bounded_map
+from schema import SCHEMA_VERSION, apply_schema, date_codes
+
+# Default number of rows parsed at a time on the streaming path
+DEFAULT_CHUNKSIZE = 500_000
+
+def _default_data_dir(data_dir=None):
+    """
+    Resolve the data folder, defaulting to the repository's data folder.
+    """
+    if data_dir is not None:
+        return data_dir
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+
+def _split_file_signatures(split_file_dir):
+    """
+    Size and modification time of every split CSV file, by file name.
+    """
+    return {
+        f: file_signature(os.path.join(split_file_dir, f))
+        for f in sorted(os.listdir(split_file_dir)) if f.endswith('.csv')
+    }
+
+def _source_signatures(data_dir, use_store):
+    """
+    Signatures of every source a load reads: the split CSV files, plus the
+    days appended by ingest.py when reading through the store. Once
+    sync_store has run this equals store_signature, so it can be computed
+    without touching the store.
+    """
+    split_file_dir = os.path.join(data_dir, 'split-data')
+    sources = _split_file_signatures(split_file_dir) if os.path.isdir(split_file_dir) else {}
+    if use_store and store_available():
+        return {"sources": sources, "ingested": store_signature(os.path.join(data_dir, 'store'))["ingested"]}
+    return sources
+
+def _dataset_version(sources, predicates):
+    """
+    Identify a loaded dataset by its source signatures, the predicates it
+    was loaded with and the schema version. Reloading unchanged sources with
+    the same filters gives the same version.
+    """
+    payload = json.dumps(
+        {"sources": sources, "predicates": predicates, "schema": SCHEMA_VERSION}, sort_keys=True, default=str
+    )
+    return hashlib.sha1(payload.encode()).hexdigest()[:12]
+
+def dataset_version(date_filter=None, data_dir=None, use_store=True, bbox=None, vessel_type=None, port=None):
+    """
+    The 'dataset_version' load_data would give a dataset loaded with the same
+    arguments, computed from file signatures only, so that results derived
+    from a dataset can be checked for staleness without loading it.
+
+    Args:
+        date_filter, data_dir, use_store, bbox, vessel_type, port: As for
+            load_data.
+
+    Returns:
+        str: The dataset version.
+    """
+    predicates = {"date_filter": date_filter, "bbox": bbox, "vessel_type": vessel_type, "port": port}
+    return _dataset_version(_source_signatures(_default_data_dir(data_dir), use_store), predicates)
+
+def _as_list(value):
+    """
+    Wrap a single filter value in a list; lists and tuples pass through.
+    """
+    return list(value) if isinstance(value, (list, tuple, set)) else [value]
+
+def _row_mask(df, date_filter=None, bbox=None, vessel_type=None, port=None):
+    """
+    Build a boolean mask of the rows that satisfy every given predicate.
+
+    Args:
+        df (pd.DataFrame): Rows with a parsed 'BaseDateTime' column.
+        date_filter (str or tuple, optional): Keep rows from this date
+                                              ('YYYY-MM-DD'), or from an
+                                              inclusive (start, end) range.
+        bbox (tuple, optional): (lat_min, lat_max, lon_min, lon_max), inclusive.
+        vessel_type (str or list, optional): Keep these 'Vessel Type Name' values.
+        port (str or list, optional): Keep these 'Nearest Port' values.
+
+    Returns:
+        np.ndarray: Boolean mask aligned with df.
+    """
+    mask = np.ones(len(df), dtype=bool)
+
+    bounds = date_bounds(date_filter)
+    if bounds is not None:
+        days = df['BaseDateTime'].dt.normalize()
+        start, end = bounds
+        if start is not None:
+            mask &= (days >= pd.Timestamp(start)).to_numpy()
+        if end is not None:
+            mask &= (days <= pd.Timestamp(end)).to_numpy()
+
+    if bbox is not None:
+        lat_min, lat_max, lon_min, lon_max = bbox
+        mask &= df['LAT'].between(lat_min, lat_max).to_numpy()
+        mask &= df['LON'].between(lon_min, lon_max).to_numpy()
+
+    if vessel_type:
+        mask &= df['Vessel Type Name'].isin(_as_list(vessel_type)).to_numpy()
+
+    if port:
+        mask &= df['Nearest Port'].isin(_as_list(port)).to_numpy()
+
+    return mask
+
+def iter_split_chunks(csv_path, chunksize=DEFAULT_CHUNKSIZE, date_filter=None, bbox=None,
+                      vessel_type=None, port=None):
+    """
+    Stream one split CSV file in chunks and yield only the rows that pass the
+    predicates, so at most one raw chunk is held in memory at a time.
+
+    Args:
+        csv_path (str): Path of the split CSV file.
+        chunksize (int, optional): Number of rows parsed per chunk.
+        date_filter, bbox, vessel_type, port: Predicates, see _row_mask.
+
+    Yields:
+        pd.DataFrame: The surviving rows of each chunk (possibly empty).
+    """
+    reader = pd.read_csv(csv_path, usecols=lambda col: col in STORE_COLUMNS, chunksize=chunksize)
+    with reader:
+        for chunk in reader:
+            # Ensure the 'BaseDateTime' is in datetime format
+            chunk['BaseDateTime'] = pd.to_datetime(chunk['BaseDateTime'], errors='coerce')
+            yield chunk[_row_mask(chunk, date_filter, bbox, vessel_type, port)]
+
+def iter_data_chunks(data_dir=None, chunksize=DEFAULT_CHUNKSIZE, date_filter=None, bbox=None,
+                     vessel_type=None, port=None):
+    """
+    Stream every split CSV file in chunks, yielding only the surviving rows.
+    Peak memory follows the chunk size rather than the size of the dataset,
+    which makes this the path to use for long date windows.
+
+    Args:
+        data_dir (str, optional): Folder holding 'split-data'. Defaults to
+                                  the repository's data folder.
+        chunksize (int, optional): Number of rows parsed per chunk.
+        date_filter, bbox, vessel_type, port: Predicates, see _row_mask.
+
+    Yields:
+        pd.DataFrame: Filtered rows, one frame per non-empty chunk.
+    """
+    split_file_dir = os.path.join(_default_data_dir(data_dir), 'split-data')
+    for csv_file in sorted(f for f in os.listdir(split_file_dir) if f.endswith('.csv')):
+        for chunk in iter_split_chunks(os.path.join(split_file_dir, csv_file), chunksize,
+                                       date_filter, bbox, vessel_type, port):
+            if not chunk.empty:
+                yield chunk
+
+def _read_split_file(csv_path, chunksize=None, **predicates):
+    """
+    Parse one split CSV file, coerce its dtypes and apply the predicates.
+    This is the unit of work handed to each ingest worker.
+
+    Args:
+        csv_path (str): Path of the split CSV file.
+        chunksize (int, optional): Stream the file in chunks of this many
+                                   rows instead of parsing it in one go.
+        **predicates: date_filter, bbox, vessel_type and port, see _row_mask.
+
+    Returns:
+        pd.DataFrame: The surviving rows of the file.
+    """
+    if chunksize:
+        return pd.concat(iter_split_chunks(csv_path, chunksize, **predicates), ignore_index=True)
+
+    df = pd.read_csv(csv_path, usecols=lambda col: col in STORE_COLUMNS)
+
+    # Ensure the 'BaseDateTime' is in datetime format
+    df['BaseDateTime'] = pd.to_datetime(df['BaseDateTime'], errors='coerce')
+
+    return df[_row_mask(df, **predicates)]
+
+@instrumented("load_data")
+def load_data(date_filter=None, data_dir=None, use_store=True, store_partitions=(),
+              workers=None, executor="thread", max_in_flight=None,
+              bbox=None, vessel_type=None, port=None, chunksize=None):
     """
     Load and preprocess vessel data from multiple CSV files, performing 
     a vectorized calculation of the duration that vessels are anchored. 
+
+    The split CSV files are mirrored into a date-partitioned Parquet store
+    (data/store) the first time they are seen, and every later load reads
+    from that store instead of parsing the CSV files again. CSV parsing
+    (store builds and the CSV fallback) runs on a bounded worker pool, one
+    file per task.
+
+    All predicates (date, bounding box, vessel type, port) are applied while
+    reading, before rows are combined; anchored durations are then computed
+    over the surviving rows.
     
     Args:
-        date_filter (str, optional): If provided, filters the data to only 
-                                      include rows from this specific date 
-                                      (format 'YYYY-MM-DD').
+        date_filter (str or tuple, optional): If provided, filters the data
+                                              to only include rows from this
+                                              specific date (format
+                                              'YYYY-MM-DD'), or from an
+                                              inclusive (start, end) range of
+                                              dates; either end may be None.
+        data_dir (str, optional): Folder holding 'split-data' and 'store'.
+                                  Defaults to the repository's data folder.
+        use_store (bool, optional): Read through the Parquet store when
+                                    pyarrow is installed. Defaults to True.
+        store_partitions (tuple, optional): Extra store partition keys
+                                            ('Nearest Port' and/or
+                                            'Vessel Type Name').
+        workers (int, optional): Number of ingest workers. Defaults to the
+                                 number of CPUs; 1 parses files serially.
+        executor (str, optional): 'thread' or 'process' worker pool.
+        max_in_flight (int, optional): Maximum number of files being parsed
+                                       or waiting to be combined at once.
+        bbox (tuple, optional): (lat_min, lat_max, lon_min, lon_max) box
+                                to keep, inclusive.
+        vessel_type (str or list, optional): Vessel type name(s) to keep.
+        port (str or list, optional): Nearest port name(s) to keep.
+        chunksize (int, optional): On the CSV path, stream each file in
+                                   chunks of this many rows so memory
+                                   tracks the filtered output.
     
     Returns:
         pd.DataFrame: A DataFrame containing vessel data with calculated 
-                      anchored durations and additional date-time features.
+                      anchored durations and additional date-time features
+                      ('Hour', 'Date'), with the dtypes of schema.SCHEMA.
+                      df.attrs['dataset_version'] identifies the source
+                      files and filters it was loaded from.
     """
     
-    # Define the root directory and the split-file folder path
-    root_dir = os.path.dirname(os.path.abspath(__file__))
-    split_file_dir = os.path.join(root_dir, '..', 'data', 'split-data')
-    
-    # List all CSV files in the split-file folder
-    csv_files = [f for f in os.listdir(split_file_dir) if f.endswith('.csv')]
-    
-    # Read all CSV files and combine them into one DataFrame
-    combined_df = pd.concat(
-        [pd.read_csv(os.path.join(split_file_dir, csv_file)) for csv_file in csv_files],
-        ignore_index=True
-    )
-    
-    # Ensure the 'BaseDateTime' is in datetime format
-    combined_df['BaseDateTime'] = pd.to_datetime(combined_df['BaseDateTime'], errors='coerce')
-    
-    # Filter data by specific date if the date_filter is provided
-    if date_filter:
-        combined_df = combined_df[combined_df['BaseDateTime'].dt.date == pd.to_datetime(date_filter).date()]
+    # Define the split-file and store folder paths
+    data_dir = _default_data_dir(data_dir)
+    split_file_dir = os.path.join(data_dir, 'split-data')
+    store_dir = os.path.join(data_dir, 'store')
+    pool_options = {"workers": workers, "executor": executor, "max_in_flight": max_in_flight}
+    predicates = {"date_filter": date_filter, "bbox": bbox, "vessel_type": vessel_type, "port": port}
+
+    if use_store and store_available():
+        # Rebuild only the partitions whose source CSV changed, then read
+        # just the requested partitions and rows
+        sync_store(split_file_dir, store_dir, partition_cols=store_partitions, **pool_options)
+        combined_df = read_store(store_dir, columns=STORE_COLUMNS, **predicates)
+    else:
+        # List all CSV files in the split-file folder
+        csv_paths = [
+            os.path.join(split_file_dir, f) for f in os.listdir(split_file_dir) if f.endswith('.csv')
+        ]
+        
+        # Each worker returns only its file's surviving rows, so the frames
+        # held for the final concat are already filtered
+        combined_df = pd.concat(
+            bounded_map(partial(_read_split_file, chunksize=chunksize, **predicates), csv_paths, **pool_options),
+            ignore_index=True,
+            copy=False
+        )
+
+        for col in CATEGORICAL_COLUMNS:
+            combined_df[col] = combined_df[col].astype('category')
     
     # ----------- Vectorized Duration Anchored Calculation ----------------
     
     # Sort by MMSI and time
     combined_df = combined_df.sort_values(by=['MMSI', 'BaseDateTime']).reset_index(drop=True)
     
-    # Initialize Duration Anchored column
-    combined_df['Duration Anchored'] = pd.NA
-    
-    # Extract only anchored vessels (SOG == 0)
-    anchored_df = combined_df[combined_df['SOG'] == 0].copy()
-    
-    if not anchored_df.empty:
-        # Sort anchored data by MMSI and time
-        anchored_df = anchored_df.sort_values(by=['MMSI', 'BaseDateTime'])
-        
-        # Calculate time to next anchored observation for same vessel
-        # This replicates the original loop behavior but in a vectorized way
-        anchored_df['next_time'] = anchored_df.groupby('MMSI')['BaseDateTime'].shift(-1)
-        anchored_df['Duration Anchored'] = anchored_df['next_time'] - anchored_df['BaseDateTime']
-        
-        # Create a mapping to update the original dataframe
-        # We need to create a unique identifier combining MMSI and timestamp
-        anchored_df['mmsi_time_key'] = anchored_df['MMSI'].astype(str) + '_' + anchored_df['BaseDateTime'].astype(str)
-        combined_df['mmsi_time_key'] = combined_df['MMSI'].astype(str) + '_' + combined_df['BaseDateTime'].astype(str)
-        
-        # Create a dictionary mapping of keys to Duration Anchored values
-        duration_dict = anchored_df.set_index('mmsi_time_key')['Duration Anchored'].to_dict()
-        
-        # Update only the relevant rows in the original dataframe
-        combined_df['Duration Anchored'] = combined_df['mmsi_time_key'].map(duration_dict)
-        
-        # Remove the temporary key column
-        combined_df = combined_df.drop(columns=['mmsi_time_key'])
+    # Time until each anchored ping's next anchored ping of the same vessel,
+    # computed positionally on the sorted arrays (see anchoring.py)
+    combined_df['Duration Anchored'] = anchored_durations(
+        combined_df['MMSI'].to_numpy(),
+        combined_df['BaseDateTime'].to_numpy(),
+        combined_df['SOG'].to_numpy()
+    )
     
-    # Extract hour for trend analysis
+    # Extract hour for trend analysis and the day for the date filter
     combined_df['Hour'] = combined_df['BaseDateTime'].dt.hour
+    combined_df['Date'] = date_codes(combined_df['BaseDateTime'])
+
+    # Compact dtypes (categoricals, int32/float32, int8 hour), see schema.py
+    combined_df = apply_schema(combined_df)
+
+    # Lets caches tell datasets apart (the bundle and the result cache, see Dataset.version)
+    combined_df.attrs['dataset_version'] = _dataset_version(_source_signatures(data_dir, use_store), predicates)
     
     return combined_df
@@ -0,0 +1,382 @@
+import json
+import os
+import shutil
+import sys
+from functools import partial
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:
+    pa = None
+    ds = None
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from parallel import bounded_map
+
+# Columns the dashboard actually reads; everything else in the split CSVs is dropped
+STORE_COLUMNS = [
+    "MMSI", "BaseDateTime", "LAT", "LON", "SOG",
+    "VesselName", "Vessel Type Name", "Nearest Port"
+]
+
+# Low-cardinality string columns that are returned as pandas categoricals
+CATEGORICAL_COLUMNS = ["VesselName", "Nearest Port", "Vessel Type Name"]
+
+# Extra hive partition keys that may be layered under the date partition
+PARTITION_CHOICES = ("Nearest Port", "Vessel Type Name")
+
+MANIFEST_NAME = "_manifest.json"
+
+
+def store_available():
+    """
+    Check whether the columnar store can be used in this environment.
+
+    Returns:
+        bool: True if pyarrow is installed, False otherwise.
+    """
+    return pa is not None
+
+
+def _store_schema():
+    """
+    Build the Arrow schema every partition file is written with, so that
+    chunks with all-null columns still line up with the others.
+    """
+    return pa.schema([
+        ("MMSI", pa.int64()),
+        ("BaseDateTime", pa.timestamp("ns")),
+        ("LAT", pa.float64()),
+        ("LON", pa.float64()),
+        ("SOG", pa.float64()),
+        ("VesselName", pa.string()),
+        ("Vessel Type Name", pa.string()),
+        ("Nearest Port", pa.string()),
+        ("date", pa.string()),
+    ])
+
+
+def _partitioning(partition_cols):
+    """
+    Hive partitioning on the date plus any optional port / vessel type keys.
+    """
+    fields = [("date", pa.string())] + [(col, pa.string()) for col in partition_cols]
+    return ds.partitioning(pa.schema(fields), flavor="hive")
+
+
+def file_signature(path):
+    """
+    Cheap change detector for a source CSV (size and modification time).
+    """
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _read_manifest(store_dir):
+    # 'sources' mirrors data/split-data; 'ingested' holds days appended by ingest.py
+    manifest_path = os.path.join(store_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return {"partition_cols": [], "sources": {}, "ingested": {}}
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    manifest.setdefault("ingested", {})
+    return manifest
+
+
+def _write_manifest(store_dir, manifest):
+    # Write to a temporary file first so a crash never leaves a half-written manifest
+    manifest_path = os.path.join(store_dir, MANIFEST_NAME)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def _remove_source_files(store_dir, stem):
+    """
+    Delete every partition file that was written from the given source CSV.
+    """
+    prefix = f"{stem}-"
+    for dir_path, _, file_names in os.walk(store_dir):
+        for file_name in file_names:
+            if file_name.startswith(prefix) and file_name.endswith(".parquet"):
+                os.remove(os.path.join(dir_path, file_name))
+
+
+def _write_partitions(df, store_dir, partition_cols, stem):
+    """
+    Write vessel rows into the store's date partitions. Every file written
+    is named after stem, so one source's partitions can be replaced without
+    touching the others.
+    """
+    df = df.copy()
+    for col in STORE_COLUMNS:
+        if col not in df.columns:
+            df[col] = pd.NA
+
+    df["BaseDateTime"] = pd.to_datetime(df["BaseDateTime"], errors="coerce")
+    df["date"] = df["BaseDateTime"].dt.strftime("%Y-%m-%d")
+
+    table = pa.Table.from_pandas(df[STORE_COLUMNS + ["date"]], schema=_store_schema(), preserve_index=False)
+    ds.write_dataset(
+        table,
+        store_dir,
+        format="parquet",
+        partitioning=_partitioning(partition_cols),
+        basename_template=f"{stem}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore"
+    )
+
+
+def _build_source(csv_path, store_dir, partition_cols):
+    """
+    Convert one split CSV into date-partitioned Parquet files.
+    """
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    df = pd.read_csv(csv_path, usecols=lambda col: col in STORE_COLUMNS)
+    _write_partitions(df, store_dir, partition_cols, stem)
+
+
+def sync_store(split_file_dir, store_dir, partition_cols=(), workers=None, executor="thread", max_in_flight=None):
+    """
+    Bring the columnar store in line with the split CSV files. Only sources
+    that are new or whose size/modification time changed are rebuilt, and the
+    partitions of deleted sources are removed.
+
+    Args:
+        split_file_dir (str): Folder containing the split CSV files.
+        store_dir (str): Root folder of the Parquet store.
+        partition_cols (tuple, optional): Extra partition keys to nest under
+                                          the date partition, taken from
+                                          PARTITION_CHOICES.
+        workers (int, optional): Number of sources converted in parallel.
+        executor (str, optional): 'thread' or 'process' worker pool.
+        max_in_flight (int, optional): Maximum number of queued conversions.
+
+    Returns:
+        list: Names of the source CSV files that were (re)built.
+    """
+    partition_cols = list(partition_cols)
+    unknown = [col for col in partition_cols if col not in PARTITION_CHOICES]
+    if unknown:
+        raise ValueError(f"Unsupported partition column(s): {unknown}")
+
+    manifest = _read_manifest(store_dir)
+
+    # A different partition layout invalidates every file in the store, but
+    # ingested days only exist in the store and must not be thrown away
+    if manifest["partition_cols"] != partition_cols and os.path.exists(store_dir):
+        if manifest["ingested"]:
+            raise ValueError(
+                f"The store holds ingested days partitioned by {manifest['partition_cols']}; "
+                f"it cannot be repartitioned by {partition_cols}"
+            )
+        shutil.rmtree(store_dir)
+        manifest = {"partition_cols": partition_cols, "sources": {}, "ingested": {}}
+    os.makedirs(store_dir, exist_ok=True)
+
+    # A store fed only by daily ingestion has no split folder
+    csv_files = sorted(f for f in os.listdir(split_file_dir) if f.endswith(".csv")) if os.path.isdir(split_file_dir) else []
+    signatures = {f: file_signature(os.path.join(split_file_dir, f)) for f in csv_files}
+
+    # Drop partitions whose source CSV no longer exists
+    for csv_file in list(manifest["sources"]):
+        if csv_file not in signatures:
+            _remove_source_files(store_dir, os.path.splitext(csv_file)[0])
+            del manifest["sources"][csv_file]
+
+    rebuilt = [f for f, signature in signatures.items() if manifest["sources"].get(f) != signature]
+    for csv_file in rebuilt:
+        _remove_source_files(store_dir, os.path.splitext(csv_file)[0])
+
+    # Every source writes its own uniquely named files, so they can be
+    # converted concurrently
+    build = partial(_build_source, store_dir=store_dir, partition_cols=partition_cols)
+    csv_paths = [os.path.join(split_file_dir, f) for f in rebuilt]
+    for _ in bounded_map(build, csv_paths, workers=workers, executor=executor, max_in_flight=max_in_flight):
+        pass
+
+    for csv_file in rebuilt:
+        manifest["sources"][csv_file] = signatures[csv_file]
+
+    if rebuilt or not os.path.exists(os.path.join(store_dir, MANIFEST_NAME)):
+        _write_manifest(store_dir, manifest)
+
+    return rebuilt
+
+
+def append_source(df, store_dir, name, signature):
+    """
+    Add (or replace) one ingested source's rows as new store partitions.
+    Split CSV sources are left untouched, and sync_store never removes
+    ingested sources.
+
+    Args:
+        df (pd.DataFrame): Rows to store, with STORE_COLUMNS.
+        store_dir (str): Root folder of the Parquet store.
+        name (str): Source file name, used to name the partition files.
+        signature (dict): Change detector of the source (size, mtime_ns).
+
+    Returns:
+        bool: False when the source was already ingested unchanged.
+    """
+    manifest = _read_manifest(store_dir)
+    if manifest["ingested"].get(name) == signature:
+        return False
+
+    stem = os.path.splitext(name)[0]
+    if name in manifest["sources"] or any(os.path.splitext(f)[0] == stem for f in manifest["sources"]):
+        raise ValueError(f"'{name}' clashes with a split CSV source of the store")
+
+    os.makedirs(store_dir, exist_ok=True)
+    _remove_source_files(store_dir, stem)
+    _write_partitions(df, store_dir, manifest["partition_cols"], stem)
+
+    manifest["ingested"][name] = signature
+    _write_manifest(store_dir, manifest)
+    return True
+
+
+def store_dates(store_dir):
+    """
+    Days held in the store, read from its date partition folders.
+
+    Returns:
+        list: Sorted 'YYYY-MM-DD' strings.
+    """
+    if not os.path.isdir(store_dir):
+        return []
+    return sorted(
+        name[len("date="):] for name in os.listdir(store_dir)
+        if name.startswith("date=") and os.path.isdir(os.path.join(store_dir, name))
+    )
+
+
+def partition_signature(store_dir, date):
+    """
+    Change detector for one day of the store: the size and modification
+    time of every file under its date partition. Rewriting any source that
+    has rows on that day changes it; other days are unaffected.
+
+    Returns:
+        dict: Maps each file's path (relative to the partition) to its
+              signature; empty when the day holds no files.
+    """
+    folder = os.path.join(store_dir, f"date={date}")
+    signature = {}
+    for dir_path, _, file_names in os.walk(folder):
+        for file_name in file_names:
+            if file_name.endswith(".parquet"):
+                path = os.path.join(dir_path, file_name)
+                signature[os.path.relpath(path, folder)] = file_signature(path)
+    return signature
+
+
+def date_bounds(date_filter):
+    """
+    Normalise a date filter into inclusive (start, end) 'YYYY-MM-DD' bounds.
+
+    Args:
+        date_filter (str or tuple): One day, or a (start, end) pair whose
+                                    ends may be None (unbounded).
+
+    Returns:
+        tuple or None: (start, end), either of which may be None; None when
+                       nothing is filtered.
+    """
+    if date_filter is None or date_filter == "":
+        return None
+    if isinstance(date_filter, (list, tuple)):
+        start, end = date_filter
+    else:
+        start = end = date_filter
+    start = pd.Timestamp(start).strftime("%Y-%m-%d") if start else None
+    end = pd.Timestamp(end).strftime("%Y-%m-%d") if end else None
+    if start is None and end is None:
+        return None
+    return start, end
+
+
+def store_signature(store_dir):
+    """
+    Signatures of every source in the store (split CSVs and ingested days),
+    used to version datasets loaded from it.
+
+    Returns:
+        dict: The manifest's 'sources' and 'ingested' entries.
+    """
+    manifest = _read_manifest(store_dir)
+    return {"sources": manifest["sources"], "ingested": manifest["ingested"]}
+
+
+def _values(value):
+    return list(value) if isinstance(value, (list, tuple, set)) else [value]
+
+
+def read_store(store_dir, date_filter=None, columns=None, bbox=None, vessel_type=None, port=None):
+    """
+    Read vessel data from the columnar store. The date filter is pushed down
+    to partition pruning, so only the matching days' files are opened; the
+    other predicates are evaluated batch by batch while scanning, so only
+    surviving rows are ever materialised.
+
+    Args:
+        store_dir (str): Root folder of the Parquet store.
+        date_filter (str or tuple, optional): Only read rows from this date
+                                              (format 'YYYY-MM-DD'), or from
+                                              an inclusive (start, end)
+                                              range of dates.
+        columns (list, optional): Columns to load. Defaults to STORE_COLUMNS.
+        bbox (tuple, optional): (lat_min, lat_max, lon_min, lon_max) box
+                                to keep, inclusive.
+        vessel_type (str or list, optional): Vessel type name(s) to keep.
+        port (str or list, optional): Nearest port name(s) to keep.
+
+    Returns:
+        pd.DataFrame: The requested rows, with CATEGORICAL_COLUMNS as
+                      categorical dtypes.
+    """
+    manifest = _read_manifest(store_dir)
+    columns = list(columns) if columns is not None else list(STORE_COLUMNS)
+
+    dataset = ds.dataset(
+        store_dir,
+        format="parquet",
+        partitioning=_partitioning(manifest["partition_cols"])
+    )
+
+    conditions = []
+    bounds = date_bounds(date_filter)
+    if bounds is not None:
+        start, end = bounds
+        if start == end:
+            conditions.append(ds.field("date") == start)
+        else:
+            # 'YYYY-MM-DD' strings compare like dates, so ranges prune partitions too
+            if start is not None:
+                conditions.append(ds.field("date") >= start)
+            if end is not None:
+                conditions.append(ds.field("date") <= end)
+    if bbox is not None:
+        lat_min, lat_max, lon_min, lon_max = bbox
+        conditions.append((ds.field("LAT") >= lat_min) & (ds.field("LAT") <= lat_max))
+        conditions.append((ds.field("LON") >= lon_min) & (ds.field("LON") <= lon_max))
+    if vessel_type:
+        conditions.append(ds.field("Vessel Type Name").isin(_values(vessel_type)))
+    if port:
+        conditions.append(ds.field("Nearest Port").isin(_values(port)))
+
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+
+    table = dataset.to_table(columns=columns, filter=expression)
+    df = table.to_pandas()
+
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+
+    return df
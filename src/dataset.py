@@ -0,0 +1,79 @@
+import os
+import sys
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from anchoring import anchored_episodes
+from artifacts import get_artifacts, initial_date
+from filter_index import FilterIndex
+from instrumentation import instrumented
+from port_calls import detect_port_calls
+from settings import APP_DATES
+from spatial_index import SpatialGrid
+from summary_cube import SummaryCube
+
+
+class Dataset:
+    """
+    One version of everything the callbacks read: the processed frame, its
+    indexes, port calls and anchoring episodes, plus the initial figures of
+    the page. A dataset is never modified once built; a refresh builds a
+    new one.
+    """
+
+    def __init__(self, df, visits=None, episodes=None, filter_index=None, summary_cube=None, spatial_grid=None,
+                 figures=None, version=None):
+        """
+        Args:
+            df (pd.DataFrame): The processed frame.
+            visits (pd.DataFrame, optional): Port calls, as returned by
+                                             detect_port_calls. Detected in
+                                             df when not given.
+            episodes (pd.DataFrame, optional): Anchoring episodes, as
+                                               returned by anchored_episodes.
+                                               Found in df when not given.
+            filter_index (FilterIndex, optional): Built from df when not given.
+            summary_cube (SummaryCube, optional): Built from df when not given.
+            spatial_grid (SpatialGrid, optional): Built from df when not given.
+            figures (dict, optional): Initial 'map' and 'trend' figures.
+            version (str, optional): Defaults to df.attrs['dataset_version'].
+        """
+        self.df = df
+        self.version = version if version is not None else df.attrs.get("dataset_version")
+        self.visits = visits if visits is not None else detect_port_calls(df)
+        self.episodes = episodes if episodes is not None else anchored_episodes(df)
+        self.filter_index = filter_index if filter_index is not None else FilterIndex(df)
+        self.summary_cube = summary_cube if summary_cube is not None else SummaryCube(df)
+        if spatial_grid is None:
+            spatial_grid = SpatialGrid(df["LAT"].to_numpy(), df["LON"].to_numpy())
+        self.spatial_grid = spatial_grid
+        self.figures = figures or {}
+
+        # Days that can be picked, in order, and the one shown first (the latest)
+        if isinstance(df["Date"].dtype, pd.CategoricalDtype):
+            self.dates = sorted(str(day) for day in df["Date"].cat.categories)
+        else:
+            self.dates = sorted(str(day) for day in df["Date"].dropna().unique())
+        self.first_date = initial_date(df)
+
+    def __repr__(self):
+        # Memoized callback results are keyed by the repr of their arguments
+        return f"Dataset(version={self.version!r})"
+
+
+@instrumented("dataset.build", rows_out=None)
+def build_dataset(date_filter=APP_DATES, data_dir=None):
+    """
+    Load (or rebuild) the artifact bundle of the current source data and
+    build the indexes over the frame.
+
+    Args:
+        date_filter (str or tuple, optional): Date, or inclusive (start, end)
+                                              range of dates, to load.
+        data_dir (str, optional): Defaults to the repository's data folder.
+
+    Returns:
+        Dataset: The dataset of the current source data.
+    """
+    bundle = get_artifacts(date_filter=date_filter, data_dir=data_dir)
+    return Dataset(bundle.df, bundle.visits, bundle.episodes, figures=bundle.figures, version=bundle.version)
@@ -0,0 +1,309 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.colors import qualitative
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from instrumentation import first_frame_rows, instrumented
+from settings import MAP_POINT_BUDGET
+from tracks import TRACK_TOLERANCE_KM, build_tracks, track_importance
+
+# What the map draws: pings as markers, or each vessel's simplified track as a line
+MAP_MODES = ("points", "tracks")
+
+# Largest track tolerance tried before only the longest tracks are drawn
+MAX_TRACK_TOLERANCE_KM = 50.0
+
+# Fixed colors so a vessel type keeps its color whichever subset of rows is drawn
+VESSEL_TYPE_COLORS = {
+    "Cargo": qualitative.Plotly[0],
+    "Passenger": qualitative.Plotly[1],
+}
+
+def _bin_points(filtered_df, point_budget, cell_size=0.01):
+    """
+    Aggregate pings into a lat/lon grid per vessel type, doubling the cell
+    size until the number of occupied cells fits the point budget, or until
+    one cell covers every ping (one marker per vessel type, which is more
+    than a budget smaller than the number of types). Pings without a
+    position are left out.
+
+    Args:
+    filtered_df (DataFrame): The vessel data to aggregate.
+    point_budget (int): Maximum number of markers.
+    cell_size (float): Starting cell size in degrees.
+
+    Returns:
+    DataFrame: One row per occupied cell and vessel type, with the mean
+    position ('LAT', 'LON'), 'Pings' and distinct 'Vessels'.
+    """
+    located = np.isfinite(filtered_df["LAT"].to_numpy()) & np.isfinite(filtered_df["LON"].to_numpy())
+    if not located.all():
+        filtered_df = filtered_df[located]
+    if filtered_df.empty:
+        return pd.DataFrame(columns=["LAT", "LON", "Pings", "Vessels", "Vessel Type Name"])
+
+    lat = filtered_df["LAT"].to_numpy()
+    lon = filtered_df["LON"].to_numpy()
+    type_codes, type_names = pd.factorize(filtered_df["Vessel Type Name"], use_na_sentinel=False)
+
+    while True:
+        lat_bin = np.floor(lat / cell_size).astype(np.int64)
+        lon_bin = np.floor(lon / cell_size).astype(np.int64)
+        lat_span = lat_bin.max() - lat_bin.min() + 1
+        lon_span = lon_bin.max() - lon_bin.min() + 1
+        cells = (lat_bin - lat_bin.min()) * lon_span + (lon_bin - lon_bin.min())
+        keys = cells * len(type_names) + type_codes
+        if len(np.unique(keys)) <= point_budget or (lat_span == 1 and lon_span == 1):
+            break
+        cell_size *= 2
+
+    binned = filtered_df[["MMSI", "LAT", "LON"]].assign(cell=keys).groupby("cell").agg(
+        LAT=("LAT", "mean"),
+        LON=("LON", "mean"),
+        Pings=("MMSI", "size"),
+        Vessels=("MMSI", "nunique"),
+    )
+    binned["Vessel Type Name"] = np.asarray(type_names, dtype=object)[binned.index.to_numpy() % len(type_names)]
+    return binned.reset_index(drop=True)
+
+def _display_frame(df):
+    """
+    Round the float32 position and speed columns of the rows being plotted,
+    which the plain JSON encoder would otherwise write with float64 noise
+    digits (33.74123001098633 instead of 33.74123).
+    """
+    digits = {"LAT": 5, "LON": 5, "SOG": 1}
+    return df.assign(**{col: df[col].astype("float64").round(n) for col, n in digits.items() if col in df})
+
+def _fit_tracks(filtered_df, point_budget):
+    """
+    Simplified tracks of the pings that fit the point budget (one vertex is
+    spent per track on the line break), at the finest Douglas-Peucker
+    tolerance that fits, from TRACK_TOLERANCE_KM up to
+    MAX_TRACK_TOLERANCE_KM. When the tracks still do not fit, only the ones
+    with the most pings are kept.
+
+    Returns:
+    tuple: (TrackSet, note) where note describes the reduction, if any.
+    """
+    tracks = build_tracks(filtered_df)
+    # A single ping draws no line
+    tracks = tracks.subset(np.repeat(tracks.lengths() > 1, tracks.lengths()))
+
+    # From coarse to fine, stop at the first tolerance whose tracks exceed the
+    # budget: its importances hold every coarser level, so the exact tolerance
+    # that fits is read off them without simplifying again
+    tolerance = MAX_TRACK_TOLERANCE_KM
+    while True:
+        importance = track_importance(tracks, tolerance)
+        kept = int((importance > tolerance).sum())
+        if kept + len(tracks) > point_budget or tolerance <= TRACK_TOLERANCE_KM:
+            break
+        tolerance = max(tolerance / 4, TRACK_TOLERANCE_KM)
+
+    if kept + len(tracks) > point_budget and tolerance < MAX_TRACK_TOLERANCE_KM:
+        # A coarser tolerance fit: raise this one so that only the most important
+        # interior points fill the room left by the track ends and breaks
+        room = point_budget - len(tracks) - int(np.isinf(importance).sum())
+        interior = importance[np.isfinite(importance) & (importance > tolerance)]
+        # The (room + 1)-th largest importance: only the room points above it are kept
+        tolerance = float(np.partition(interior, len(interior) - room - 1)[len(interior) - room - 1])
+
+    note = f"<br>Tracks simplified to {tolerance:.2g} km" if tolerance > TRACK_TOLERANCE_KM else ""
+    simplified = tracks.subset(importance > tolerance)
+
+    if simplified.n_points + len(simplified) > point_budget:
+        # Longest tracks first, as many as fit
+        order = np.argsort(-tracks.lengths(), kind="stable")
+        cost = (simplified.lengths() + 1)[order]
+        kept_tracks = np.zeros(len(tracks), dtype=bool)
+        kept_tracks[order[np.cumsum(cost) <= point_budget]] = True
+        simplified = simplified.subset(kept_tracks[simplified.track_ids()])
+        note += f"<br>Showing the {int(kept_tracks.sum()):,} longest of {len(tracks):,} tracks"
+    return simplified, note
+
+def _track_figure(tracks):
+    """
+    One line trace per vessel type, the tracks separated by gaps, so the
+    figure has a handful of traces however many vessels are drawn.
+    """
+    ids = tracks.track_ids()
+    # Each track's points followed by one NaN, which breaks the line
+    slots = np.arange(tracks.n_points) + ids
+    size = tracks.n_points + len(tracks)
+    lat, lon = np.full(size, np.nan), np.full(size, np.nan)
+    # Breaks are never hovered, so their MMSI can stay 0 and the column stay integer
+    mmsi = np.zeros(size, dtype=np.int64)
+    lat[slots] = tracks.lat.astype(np.float64).round(5)
+    lon[slots] = tracks.lon.astype(np.float64).round(5)
+    mmsi[slots] = tracks.mmsi[ids]
+    point_type = np.repeat(pd.Series(tracks.vessel_type, dtype=object).fillna("Unknown").to_numpy(), tracks.lengths() + 1)
+
+    fig = go.Figure()
+    for vessel_type in pd.unique(point_type):
+        selected = point_type == vessel_type
+        fig.add_trace(go.Scattermapbox(
+            lat=lat[selected],
+            lon=lon[selected],
+            customdata=mmsi[selected],
+            mode="lines",
+            name=vessel_type,
+            line=dict(width=2, color=VESSEL_TYPE_COLORS.get(vessel_type)),
+            hovertemplate="MMSI %{customdata:d}<extra>%{fullData.name}</extra>"
+        ))
+
+    center = dict(lat=float(np.nanmean(lat)), lon=float(np.nanmean(lon))) if tracks.n_points else None
+    fig.update_layout(mapbox=dict(style="open-street-map", zoom=5, center=center))
+    return fig
+
+@instrumented("create_map", rows_in=first_frame_rows)
+def create_map(filtered_df, point_budget=None, mode="points"):
+    """
+    This function generates a map with the filtered DataFrame.
+    It also adds summary information (total unique vessels) to the map title and as an annotation.
+
+    To keep the figure payload bounded, the level of detail depends on the
+    point budget: every ping is drawn when they fit, otherwise each vessel's
+    latest position, otherwise pings aggregated on a lat/lon grid (marker
+    size shows the number of pings per cell).
+
+    In "tracks" mode each vessel's pings are drawn as lines instead, cut at
+    time gaps and simplified with Douglas-Peucker (see tracks.py), so the
+    budget holds the vertices of every vessel's route.
+    
+    Args:
+    filtered_df (DataFrame): The filtered DataFrame containing vessel data.
+    point_budget (int, optional): Maximum number of markers, defaults to MAP_POINT_BUDGET.
+    mode (str, optional): One of MAP_MODES, "points" by default.
+    
+    Returns:
+    plotly.graph_objects.Figure: A Plotly figure object containing the map.
+    """
+    # Imported here: plotly.express takes longer to import than the rest of the
+    # app's own modules, and no map is drawn until the first callback
+    import plotly.express as px
+
+    point_budget = point_budget or MAP_POINT_BUDGET
+    unique_count = filtered_df["MMSI"].nunique()
+    detail_note = ""
+
+    if mode == "tracks":
+        tracks, detail_note = _fit_tracks(filtered_df, point_budget)
+        fig = _track_figure(tracks)
+    elif len(filtered_df) <= point_budget:
+        fig = px.scatter_mapbox(
+            _display_frame(filtered_df),
+            lat="LAT",
+            lon="LON",
+            color="Vessel Type Name",
+            color_discrete_map=VESSEL_TYPE_COLORS,
+            hover_data=["MMSI", "VesselName", "SOG"],
+            mapbox_style="open-street-map",
+            zoom=5,
+            size_max=10
+        )
+    elif unique_count <= point_budget:
+        # Rows are sorted by MMSI and time, so the last row is the latest ping
+        fig = px.scatter_mapbox(
+            _display_frame(filtered_df.drop_duplicates("MMSI", keep="last")),
+            lat="LAT",
+            lon="LON",
+            color="Vessel Type Name",
+            color_discrete_map=VESSEL_TYPE_COLORS,
+            hover_data=["MMSI", "VesselName", "SOG"],
+            mapbox_style="open-street-map",
+            zoom=5,
+            size_max=10
+        )
+        detail_note = "<br>Showing latest position per vessel"
+    else:
+        fig = px.scatter_mapbox(
+            _display_frame(_bin_points(filtered_df, point_budget)),
+            lat="LAT",
+            lon="LON",
+            color="Vessel Type Name",
+            color_discrete_map=VESSEL_TYPE_COLORS,
+            size="Pings",
+            hover_data=["Pings", "Vessels"],
+            mapbox_style="open-street-map",
+            zoom=5,
+            size_max=15
+        )
+        detail_note = "<br>Showing pings aggregated by area"
+    
+    fig.add_annotation(
+        text=f"Total Unique Vessels: {unique_count}{detail_note}",
+        xref="paper", yref="paper",
+        x=0.05, y=0.95,  # Position near the top-left of the map
+        showarrow=False,
+        font=dict(size=14, color="black")
+    )
+
+    fig.update_layout(
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=-0.05,
+            xanchor="center",
+            x=0.5
+        ),
+        margin=dict(r=0, t=0, l=0, b=20),
+        uirevision="vessel-map"  # keep the user's pan/zoom when the figure is replaced
+    )
+    
+    return fig
+
+# Pings per time bucket behind the trend graph
+def trend_series(df, freq='h'):
+    """
+    Count distinct vessels and pings per time bucket (hourly by default) on
+    a true timestamp axis, so several days line up one after another. The
+    dashboard reads these series off SummaryCube.trend; this is for frames
+    that have no cube.
+
+    Args:
+    df (DataFrame): The DataFrame containing the vessel data with 'BaseDateTime' and 'MMSI' columns.
+    freq (str, optional): Bucket size, e.g. 'h' or 'D'.
+
+    Returns:
+    DataFrame: 'Timestamp' (start of the bucket), 'Unique Vessels' and 'Pings' columns.
+    """
+    buckets = df['BaseDateTime'].dt.floor(freq).rename('Timestamp')
+    grouped = df.groupby(buckets)['MMSI']
+    return pd.DataFrame({'Unique Vessels': grouped.nunique(), 'Pings': grouped.size()}).reset_index()
+
+# Function to create the trend figure
+def create_trend_figure(df_trend):
+    """
+    This function builds the trend figure from a timestamped series.
+
+    Args:
+    df_trend (DataFrame): Output of trend_series or SummaryCube.trend.
+
+    Returns:
+    plotly.graph_objects.Figure: The trend figure.
+    """
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=df_trend['Timestamp'],
+        y=df_trend['Unique Vessels'],
+        mode='lines+markers',
+        name='Unique Vessels Over Time',
+        line=dict(color='blue')
+    ))
+
+    fig.update_layout(
+        title='',
+        xaxis_title='Time',
+        yaxis_title='Number of Vessels',
+        template='plotly_white',
+        margin=dict(l=50, r=20, t=30, b=20),
+        font=dict(family="Arial, sans-serif"),  
+        plot_bgcolor='white', 
+        autosize=True
+    )
+
+    return fig
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+# Columns the dashboard filters on, in the order they are given to FilterIndex.positions
+FILTER_KEYS = ("Vessel Type Name", "Nearest Port", "Date")
+
+
+class FilterIndex:
+    """
+    Row-position index over the dashboard's filter columns, built once at
+    startup so that a filter change becomes a lookup plus a `take` instead of
+    a full copy and one boolean scan per filter.
+
+    Rows are grouped by every (vessel type, port, date) combination: the
+    index keeps one permutation of the row positions, sorted by group, and
+    the boundaries of each group inside it. A query gathers the slices of
+    the matching groups.
+    """
+
+    def __init__(self, df, keys=FILTER_KEYS):
+        """
+        Args:
+            df (pd.DataFrame): The dataframe to index. It is kept by reference
+                               and must not be modified afterwards.
+            keys (tuple, optional): Columns to index, defaults to FILTER_KEYS.
+        """
+        self.df = df
+        self.keys = tuple(keys)
+
+        codes = []
+        self._lookup = []
+        for key in self.keys:
+            key_codes, uniques = pd.factorize(df[key], use_na_sentinel=False)
+            codes.append(key_codes)
+            self._lookup.append({value: code for code, value in enumerate(uniques) if pd.notna(value)})
+
+        self._shape = tuple(int(c.max()) + 1 if len(c) else 1 for c in codes)
+        group_ids = np.ravel_multi_index(codes, self._shape) if len(df) else np.zeros(0, dtype=np.intp)
+
+        # Stable sort keeps the original row order inside each group
+        self._order = np.argsort(group_ids, kind="stable")
+        counts = np.bincount(group_ids, minlength=int(np.prod(self._shape)))
+        self._offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def _codes(self, axis, value):
+        # None means "no filter on this key"; a tuple or list matches any of its values
+        if value is None:
+            return np.arange(self._shape[axis])
+        values = value if isinstance(value, (list, tuple)) else [value]
+        codes = [self._lookup[axis].get(v) for v in values]
+        return np.array([code for code in codes if code is not None], dtype=np.intp)
+
+    def positions(self, *values):
+        """
+        Row positions matching the given key values, in original row order.
+
+        Args:
+            *values: One value per key (vessel type, port, date by default),
+                     or a tuple of values to match any of them (e.g. the
+                     days of a date range); None or a missing trailing
+                     value leaves that key unfiltered.
+
+        Returns:
+            np.ndarray or None: Sorted row positions, or None when no key is
+                                filtered (every row matches).
+        """
+        values = list(values) + [None] * (len(self.keys) - len(values))
+        if all(value is None for value in values):
+            return None
+
+        grids = np.meshgrid(*[self._codes(axis, value) for axis, value in enumerate(values)], indexing="ij")
+        group_ids = np.ravel_multi_index([grid.ravel() for grid in grids], self._shape)
+
+        slices = [
+            self._order[self._offsets[group]:self._offsets[group + 1]]
+            for group in group_ids
+            if self._offsets[group + 1] > self._offsets[group]
+        ]
+
+        if not slices:
+            return np.array([], dtype=np.intp)
+        if len(slices) == 1:
+            return slices[0]
+        return np.sort(np.concatenate(slices))
+
+    def take(self, *values):
+        """
+        Rows matching the given key values.
+
+        Args:
+            *values: See positions().
+
+        Returns:
+            pd.DataFrame: The matching rows. When nothing is filtered this is
+                          the indexed dataframe itself, so callers must treat
+                          the result as read-only.
+        """
+        positions = self.positions(*values)
+        return self.df if positions is None else self.df.take(positions)
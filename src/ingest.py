@@ -0,0 +1,124 @@
+import argparse
+import logging
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from data import DEFAULT_CHUNKSIZE, _default_data_dir
+from data_store import STORE_COLUMNS, append_source, file_signature, store_available
+from ports import assign_nearest_port
+
+logger = logging.getLogger(__name__)
+
+# Columns read from a raw NOAA daily file
+RAW_COLUMNS = ["MMSI", "BaseDateTime", "LAT", "LON", "SOG", "VesselName", "VesselType"]
+
+# (lat_min, lat_max, lon_min, lon_max) of the West Coast, from Mexico to Alaska
+WEST_COAST_BBOX = (20, 60, -140, -110)
+
+
+def label_vessel_types(vessel_type):
+    """
+    Map AIS vessel type codes to the dashboard's vessel type names.
+
+    Args:
+        vessel_type (pd.Series): Numeric AIS 'VesselType' codes.
+
+    Returns:
+        np.ndarray: 'Passenger' for codes 60-69, 'Cargo' for 70-79 and None
+                    for everything else.
+    """
+    code = pd.to_numeric(vessel_type, errors="coerce").to_numpy()
+    return np.select(
+        [(code >= 60) & (code <= 69), (code >= 70) & (code <= 79)],
+        ["Passenger", "Cargo"],
+        default=None
+    ).astype(object)
+
+
+def prepare_chunk(chunk, bbox=WEST_COAST_BBOX):
+    """
+    Apply the preprocessing steps to one chunk of a raw daily file: keep the
+    West Coast, label and keep Passenger/Cargo vessels, and assign the
+    nearest port.
+
+    Args:
+        chunk (pd.DataFrame): Raw rows with RAW_COLUMNS.
+        bbox (tuple, optional): (lat_min, lat_max, lon_min, lon_max) to keep.
+
+    Returns:
+        pd.DataFrame: The surviving rows with STORE_COLUMNS.
+    """
+    lat_min, lat_max, lon_min, lon_max = bbox
+    chunk = chunk[chunk["LAT"].between(lat_min, lat_max) & chunk["LON"].between(lon_min, lon_max)]
+
+    chunk = chunk.assign(**{"Vessel Type Name": label_vessel_types(chunk["VesselType"])})
+    chunk = chunk[chunk["Vessel Type Name"].notna()]
+
+    chunk = assign_nearest_port(chunk)
+    return chunk[STORE_COLUMNS]
+
+
+def ingest_day(raw_path, data_dir=None, chunksize=DEFAULT_CHUNKSIZE, bbox=WEST_COAST_BBOX):
+    """
+    Append one raw NOAA daily file to the columnar store. Existing days are
+    not reread, so adding a day costs one day of work. Ingesting an
+    unchanged file again is a no-op; a changed file replaces its previous
+    partitions.
+
+    Anchored durations are derived by load_data when the day is read back,
+    so they are not stored.
+
+    Args:
+        raw_path (str): Path to the daily CSV (or the zip NOAA ships it in).
+        data_dir (str, optional): Defaults to the repository's data folder.
+        chunksize (int, optional): Rows parsed at a time from the raw file.
+        bbox (tuple, optional): (lat_min, lat_max, lon_min, lon_max) to keep.
+
+    Returns:
+        list: The days ('YYYY-MM-DD') that were added or replaced, empty if
+              the file had already been ingested.
+    """
+    if not store_available():
+        raise RuntimeError("Daily ingestion writes to the columnar store and needs pyarrow")
+
+    data_dir = _default_data_dir(data_dir)
+    store_dir = os.path.join(data_dir, "store")
+
+    # 'AIS_2024_01_02.zip' is stored under the name of the CSV inside it
+    name = os.path.splitext(os.path.basename(raw_path))[0] + ".csv"
+
+    reader = pd.read_csv(
+        raw_path,
+        usecols=lambda col: col in RAW_COLUMNS,
+        parse_dates=["BaseDateTime"],
+        chunksize=chunksize
+    )
+    day_df = pd.concat([prepare_chunk(chunk, bbox) for chunk in reader], ignore_index=True)
+
+    if not append_source(day_df, store_dir, name, file_signature(raw_path)):
+        return []
+
+    return sorted(day_df["BaseDateTime"].dropna().dt.strftime("%Y-%m-%d").unique())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Append raw NOAA AIS daily files to the vessel data store.")
+    parser.add_argument("paths", nargs="+", help="Daily AIS files (.csv or .zip) to ingest")
+    parser.add_argument("--data-dir", default=None, help="Data folder (defaults to the repository's data folder)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Rows parsed at a time")
+    args = parser.parse_args(argv)
+
+    for path in args.paths:
+        dates = ingest_day(path, data_dir=args.data_dir, chunksize=args.chunksize)
+        if dates:
+            logger.info("Ingested %s: %s", os.path.basename(path), ", ".join(dates))
+        else:
+            logger.info("Skipped %s: already ingested", os.path.basename(path))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    main()
@@ -0,0 +1,350 @@
+import functools
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+
+# Instrumentation is off unless METRICS_ENABLED is set; when off, instrumented()
+# returns the functions unchanged and init_app adds no route or hook
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "").lower() in ("1", "true", "yes", "on")
+
+# Folder where every worker process publishes its metrics, so /metrics reports
+# the whole server whichever worker answers; an empty string keeps them per process
+METRICS_DIR = os.environ.get(
+    "METRICS_DIR",
+    os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "vessel-vision-metrics")
+)
+
+# Seconds between two writes of a process's metrics to METRICS_DIR
+FLUSH_INTERVAL = 1.0
+
+PREFIX = "vessel_vision_"
+
+# Histogram bucket upper bounds per metric (+Inf is implied)
+BUCKETS = {
+    "stage_seconds": (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+    "stage_rows_in": (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000),
+    "stage_rows_out": (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000),
+    "response_bytes": (1_000, 10_000, 100_000, 1_000_000, 10_000_000),
+}
+
+HELP = {
+    "stage_seconds": "Wall time of an instrumented stage.",
+    "stage_rows_in": "Rows an instrumented stage was given.",
+    "stage_rows_out": "Rows (or plotted points) an instrumented stage returned.",
+    "response_bytes": "Payload bytes of a callback response.",
+    "cache_requests_total": "Cache lookups by result.",
+    "cache_hit_ratio": "Share of cache lookups answered without computing.",
+}
+
+
+class MetricsRegistry:
+    """
+    Histograms of one process, keyed by (metric, stage), plus callables
+    reporting cache counters. The state is plain lists and numbers, so
+    it can be written as JSON and merged with other processes' state.
+    """
+
+    def __init__(self):
+        self._histograms = {}
+        self._caches = {}
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+
+    def observe(self, metric, stage, value):
+        """
+        Record one observation of a histogram metric.
+
+        Args:
+            metric (str): One of BUCKETS.
+            stage (str): Label of the stage (or callback) observed.
+            value (float): Observed value.
+        """
+        bounds = BUCKETS[metric]
+        with self._lock:
+            histogram = self._histograms.get((metric, stage))
+            if histogram is None:
+                histogram = self._histograms[(metric, stage)] = {"buckets": [0] * (len(bounds) + 1), "sum": 0.0, "count": 0}
+            # Cumulative buckets are built when rendering; here each value lands in one
+            index = next((i for i, bound in enumerate(bounds) if value <= bound), len(bounds))
+            histogram["buckets"][index] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def register_cache(self, name, stats):
+        """
+        Report a cache's counters in the metrics.
+
+        Args:
+            name (str): Cache label.
+            stats (callable): Returns a dict with 'hits', 'shared_hits' and
+                              'misses' counters, e.g. ResultCache.stats.
+        """
+        self._caches[name] = stats
+
+    def snapshot(self):
+        """
+        The process's metrics as a JSON-serialisable dict.
+        """
+        with self._lock:
+            histograms = [
+                {"metric": metric, "stage": stage, "buckets": list(h["buckets"]), "sum": h["sum"], "count": h["count"]}
+                for (metric, stage), h in self._histograms.items()
+            ]
+        caches = {}
+        for name, stats in self._caches.items():
+            counts = stats()
+            caches[name] = {key: counts.get(key, 0) for key in ("hits", "shared_hits", "misses")}
+        return {"histograms": histograms, "caches": caches}
+
+    def flush(self, directory=None, force=False):
+        """
+        Publish the snapshot to directory/<pid>.json, at most once per
+        FLUSH_INTERVAL unless forced.
+        """
+        directory = METRICS_DIR if directory is None else directory
+        now = time.monotonic()
+        if not directory or (not force and now - self._last_flush < FLUSH_INTERVAL):
+            return
+        self._last_flush = now
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+
+# Metrics of this process
+registry = MetricsRegistry()
+
+
+def merge_snapshots(snapshots):
+    """
+    Add up the histograms and cache counters of several processes.
+
+    Returns:
+        dict: A snapshot with the same layout as MetricsRegistry.snapshot.
+    """
+    histograms, caches = {}, {}
+    for snapshot in snapshots:
+        for h in snapshot.get("histograms", []):
+            merged = histograms.setdefault((h["metric"], h["stage"]), {
+                "metric": h["metric"], "stage": h["stage"], "buckets": [0] * len(h["buckets"]), "sum": 0.0, "count": 0
+            })
+            merged["buckets"] = [a + b for a, b in zip(merged["buckets"], h["buckets"])]
+            merged["sum"] += h["sum"]
+            merged["count"] += h["count"]
+        for name, counts in snapshot.get("caches", {}).items():
+            merged = caches.setdefault(name, {"hits": 0, "shared_hits": 0, "misses": 0})
+            for key in merged:
+                merged[key] += counts.get(key, 0)
+    return {"histograms": list(histograms.values()), "caches": caches}
+
+
+def _pid_alive(pid):
+    # Signal 0 only checks that the process exists
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True  # exists, but belongs to someone else (or cannot be checked)
+    return True
+
+
+def collect(directory=None):
+    """
+    Metrics of the whole server: every process's published snapshot, with
+    this process's current one in place of its own file. Files of processes
+    that are no longer running (dead workers, earlier runs of the server)
+    are removed rather than merged, so the counts start over with the server.
+    """
+    directory = METRICS_DIR if directory is None else directory
+    if not directory:
+        return registry.snapshot()
+
+    registry.flush(directory, force=True)
+    snapshots = []
+    for path in glob.glob(os.path.join(directory, "*.json*")):
+        pid = os.path.basename(path).split(".")[0]
+        if pid.isdigit() and int(pid) != os.getpid() and not _pid_alive(int(pid)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # another worker removed it first
+            continue
+        if not path.endswith(".json"):
+            continue  # a worker's file being rewritten
+        try:
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue  # a worker is rewriting its file
+    return merge_snapshots(snapshots)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render(snapshot):
+    """
+    Format a snapshot in the Prometheus text exposition format.
+
+    Returns:
+        str: The /metrics response body.
+    """
+    lines = []
+    histograms = sorted(snapshot["histograms"], key=lambda h: (h["metric"], h["stage"]))
+    for metric in BUCKETS:
+        rows = [h for h in histograms if h["metric"] == metric]
+        if not rows:
+            continue
+        name = PREFIX + metric
+        lines += [f"# HELP {name} {HELP[metric]}", f"# TYPE {name} histogram"]
+        for h in rows:
+            stage = _label(h["stage"])
+            cumulative = 0
+            for bound, count in zip(list(BUCKETS[metric]) + ["+Inf"], h["buckets"]):
+                cumulative += count
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {h["sum"]}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {h["count"]}')
+
+    if snapshot["caches"]:
+        name = PREFIX + "cache_requests_total"
+        lines += [f"# HELP {name} {HELP['cache_requests_total']}", f"# TYPE {name} counter"]
+        for cache, counts in sorted(snapshot["caches"].items()):
+            for key, result in (("hits", "hit"), ("shared_hits", "shared_hit"), ("misses", "miss")):
+                lines.append(f'{name}{{cache="{_label(cache)}",result="{result}"}} {counts[key]}')
+        name = PREFIX + "cache_hit_ratio"
+        lines += [f"# HELP {name} {HELP['cache_hit_ratio']}", f"# TYPE {name} gauge"]
+        for cache, counts in sorted(snapshot["caches"].items()):
+            total = sum(counts.values())
+            ratio = (counts["hits"] + counts["shared_hits"]) / total if total else 0.0
+            lines.append(f'{name}{{cache="{_label(cache)}"}} {ratio}')
+
+    return "\n".join(lines) + "\n"
+
+
+def _row_count(value):
+    # Rows of a DataFrame, or points plotted by a figure
+    if hasattr(value, "shape") and hasattr(value, "columns"):
+        return len(value)
+    data = getattr(value, "data", None)
+    if isinstance(data, tuple):
+        return sum(len(trace.lat) if getattr(trace, "lat", None) is not None else 0 for trace in data)
+    return None
+
+
+def _request_timings():
+    # Per-request stage timings behind the Server-Timing header, if inside a request
+    from flask import g, has_request_context
+    if not has_request_context():
+        return None
+    if "stage_timings" not in g:
+        g.stage_timings = []
+    return g.stage_timings
+
+
+def instrumented(stage, rows_in=None, rows_out=_row_count):
+    """
+    Decorator recording a function's wall time, and optionally the rows it
+    was given and returned, under a stage label. When METRICS_ENABLED is
+    off the function is returned as is, so the hot path pays nothing.
+
+    Args:
+        stage (str): Stage label, e.g. 'load_data'.
+        rows_in (callable, optional): Maps (args, kwargs) to the number of
+                                      input rows; not recorded when omitted.
+        rows_out (callable, optional): Maps the result to the number of
+                                       output rows (None to skip). Counts
+                                       DataFrame rows and figure points by
+                                       default.
+    """
+    def decorator(func):
+        if not METRICS_ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+
+            registry.observe("stage_seconds", stage, elapsed)
+            if rows_in is not None:
+                count = rows_in(args, kwargs)
+                if count is not None:
+                    registry.observe("stage_rows_in", stage, count)
+            if rows_out is not None:
+                count = rows_out(result)
+                if count is not None:
+                    registry.observe("stage_rows_out", stage, count)
+
+            timings = _request_timings()
+            if timings is not None:
+                timings.append((stage, elapsed))
+            registry.flush()
+            return result
+        return wrapper
+    return decorator
+
+
+def first_frame_rows(args, kwargs):
+    """
+    rows_in for functions whose first argument is the input DataFrame.
+    """
+    return _row_count(args[0]) if args else None
+
+
+def init_app(app, result_cache=None):
+    """
+    Add the /metrics route and the per-request hooks to a Dash app's
+    Flask server. Does nothing unless METRICS_ENABLED is on.
+
+    Every callback response gets a Server-Timing header listing the
+    instrumented stages that ran for it (shown per request in the
+    browser's developer tools), and its payload size is recorded.
+
+    Args:
+        app (dash.Dash): The app, with its callbacks registered.
+        result_cache (ResultCache, optional): Reported as the 'results' cache.
+    """
+    if not METRICS_ENABLED:
+        return
+
+    from flask import Response, g, request
+
+    server = app.server
+    if result_cache is not None:
+        registry.register_cache("results", result_cache.stats)
+
+    # Dash posts the callback's output id; label responses with the function name
+    callback_names = {output: entry["callback"].__name__ for output, entry in app.callback_map.items()}
+
+    @server.route("/metrics")
+    def metrics():
+        return Response(render(collect()), mimetype="text/plain; version=0.0.4")
+
+    @server.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+
+    @server.after_request
+    def add_timings(response):
+        timings = list(g.get("stage_timings", []))
+        if "request_start" in g:
+            timings.append(("total", time.perf_counter() - g.request_start))
+        if timings:
+            response.headers["Server-Timing"] = ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings)
+
+        if request.path.endswith("/_dash-update-component") and response.content_length is not None:
+            body = request.get_json(silent=True) or {}
+            stage = callback_names.get(body.get("output"), body.get("output", "unknown"))
+            registry.observe("response_bytes", f"callback.{stage}", response.content_length)
+            registry.flush()
+        return response
@@ -0,0 +1,55 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+EXECUTORS = {
+    "thread": ThreadPoolExecutor,
+    "process": ProcessPoolExecutor,
+}
+
+
+def bounded_map(func, items, workers=None, executor="thread", max_in_flight=None):
+    """
+    Apply a function to every item on a worker pool, never keeping more than
+    max_in_flight submitted tasks around at once. Results are yielded in the
+    same order as the items.
+
+    Args:
+        func (callable): Function to apply. Must be picklable (defined at
+                         module level) when executor is 'process'.
+        items (iterable): Inputs, one task per item.
+        workers (int, optional): Pool size. Defaults to the number of CPUs,
+                                 capped at the number of items. A value of 1
+                                 runs everything in the calling thread.
+        executor (str, optional): 'thread' or 'process'. Defaults to 'thread'.
+        max_in_flight (int, optional): Maximum number of submitted but not yet
+                                       consumed tasks. Defaults to 2 * workers.
+
+    Yields:
+        The result of func(item) for each item.
+    """
+    if executor not in EXECUTORS:
+        raise ValueError(f"Unknown executor '{executor}', expected one of {sorted(EXECUTORS)}")
+
+    items = list(items)
+    if workers is None:
+        workers = min(len(items), os.cpu_count() or 1)
+
+    # Nothing to gain from a pool, run in the calling thread
+    if workers <= 1 or len(items) <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    max_in_flight = max(max_in_flight or 2 * workers, 1)
+
+    with EXECUTORS[executor](max_workers=workers) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(func, item))
+            # Wait for the oldest task before submitting more, which bounds
+            # the number of parsed frames held in memory at any time
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,201 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from calculate_arrivals_departures import PORT_FLAGS, PORT_TABLE_COLUMNS
+from instrumentation import first_frame_rows, instrumented
+from ports import port_distance_km
+from settings import PORT_CALL_MAX_GAP_MINUTES, PORT_CALL_MAX_SOG, PORT_RADIUS_KM
+
+VISIT_COLUMNS = [
+    "MMSI", "Vessel Type Name", "Port", "Arrival", "Departure", "Dwell", "Anchored", "Pings", "Arrived", "Departed"
+]
+
+DWELL_TABLE_COLUMNS = ["PORT NAME", "VISITS", "MEDIAN DWELL (h)", "MEDIAN ANCHORED (h)", "VISITS / HOUR"]
+
+
+@instrumented("detect_port_calls", rows_in=first_frame_rows)
+def detect_port_calls(df, radius_km=None, max_sog=None, max_gap_minutes=None):
+    """
+    Find port calls (visits) in one pass over the MMSI/BaseDateTime-sorted
+    frame returned by load_data. A visit is a run of consecutive pings of
+    one vessel inside the same port's area (within radius_km of it), with
+    no gap longer than max_gap_minutes, during which the vessel slowed to
+    max_sog or below. Runs where it only passed through are not visits,
+    and a vessel drifting across labels mid-ocean never is in a port area,
+    unlike with label transitions (see compute_port_tables).
+
+    Args:
+        df (pd.DataFrame): Vessel data with 'MMSI', 'BaseDateTime', 'LAT',
+                           'LON', 'SOG', 'Nearest Port' and 'Vessel Type Name'
+                           columns ('Port Distance km' is used when present).
+        radius_km (float, optional): Defaults to PORT_RADIUS_KM.
+        max_sog (float, optional): Defaults to PORT_CALL_MAX_SOG.
+        max_gap_minutes (float, optional): Defaults to PORT_CALL_MAX_GAP_MINUTES.
+
+    Returns:
+        pd.DataFrame: One row per visit with VISIT_COLUMNS: 'Arrival' and
+                      'Departure' are its first and last ping in the port
+                      area, 'Dwell' the time between them, 'Anchored' the
+                      time spent at SOG 0, and 'Arrived'/'Departed' whether
+                      the vessel was seen outside the area before/after it
+                      (False when the visit is cut by the edge of the data,
+                      or by a gap after which it is still in the port area).
+    """
+    radius_km = PORT_RADIUS_KM if radius_km is None else radius_km
+    max_sog = PORT_CALL_MAX_SOG if max_sog is None else max_sog
+    max_gap_minutes = PORT_CALL_MAX_GAP_MINUTES if max_gap_minutes is None else max_gap_minutes
+
+    mmsi = df["MMSI"].to_numpy()
+    times = df["BaseDateTime"].to_numpy(dtype="datetime64[ns]")
+    sog = df["SOG"].to_numpy()
+    port_codes, port_names = pd.factorize(df["Nearest Port"])
+    if "Port Distance km" in df:
+        distance = df["Port Distance km"].to_numpy()
+    else:
+        distance = port_distance_km(df["LAT"].to_numpy(), df["LON"].to_numpy(), df["Nearest Port"].to_numpy())
+
+    # Positions of the pings inside a port area; a ping continues the previous
+    # one's run when both are inside the same vessel's same port area, close in time
+    in_area = (distance <= radius_km) & (port_codes >= 0)
+    inside = np.flatnonzero(in_area)
+    starts = np.ones(len(inside), dtype=bool)
+    if len(inside) > 1:
+        gap = np.timedelta64(int(max_gap_minutes * 60 * 1e9), "ns")
+        previous, current = inside[:-1], inside[1:]
+        starts[1:] = ~(
+            (current - previous == 1)
+            & (mmsi[current] == mmsi[previous])
+            & (port_codes[current] == port_codes[previous])
+            & (times[current] - times[previous] <= gap)
+        )
+    bounds = np.flatnonzero(starts)
+    if not len(bounds):
+        return pd.DataFrame(columns=VISIT_COLUMNS)
+    first, last = inside[bounds], inside[np.r_[bounds[1:], len(inside)] - 1]
+
+    # Time from each ping to the next one of its run, counted as anchored at SOG 0
+    step = np.zeros(len(inside), dtype="timedelta64[ns]")
+    continues = ~starts[1:]
+    step[:-1][continues] = times[inside[1:][continues]] - times[inside[:-1][continues]]
+    anchored = np.where(sog[inside] == 0, step, np.timedelta64(0, "ns"))
+    anchored = np.add.reduceat(anchored.view(np.int64), bounds).view("timedelta64[ns]")
+
+    slowed = np.maximum.reduceat((sog[inside] <= max_sog).astype(np.int8), bounds) > 0
+
+    # Seen outside the area right before/after: the same vessel's neighbouring ping
+    # is outside any port area or in another port's. A neighbour in the same port's
+    # area means the stay was only split by a gap in the pings, not left
+    before, after = np.maximum(first - 1, 0), np.minimum(last + 1, len(mmsi) - 1)
+    arrived = (
+        (first > 0) & (mmsi[before] == mmsi[first])
+        & ~(in_area[before] & (port_codes[before] == port_codes[first]))
+    )
+    departed = (
+        (last < len(mmsi) - 1) & (mmsi[after] == mmsi[last])
+        & ~(in_area[after] & (port_codes[after] == port_codes[last]))
+    )
+
+    visits = pd.DataFrame({
+        "MMSI": mmsi[first],
+        "Vessel Type Name": df["Vessel Type Name"].to_numpy()[first],
+        "Port": np.asarray(port_names, dtype=object)[port_codes[first]],
+        "Arrival": times[first],
+        "Departure": times[last],
+        "Dwell": times[last] - times[first],
+        "Anchored": anchored,
+        "Pings": np.diff(np.r_[bounds, len(inside)]),
+        "Arrived": arrived,
+        "Departed": departed,
+    })
+    return visits[slowed].reset_index(drop=True)
+
+
+def _select(visits, start=None, end=None, vessel_type=None, port=None, column="Arrival"):
+    # Visits of a vessel type and port whose column's day lies in [start, end]
+    mask = np.ones(len(visits), dtype=bool)
+    if vessel_type is not None:
+        mask &= (visits["Vessel Type Name"] == vessel_type).to_numpy()
+    if port is not None:
+        mask &= (visits["Port"] == port).to_numpy()
+    if start is not None:
+        mask &= (visits[column] >= pd.Timestamp(start)).to_numpy()
+    if end is not None:
+        mask &= (visits[column] < pd.Timestamp(end) + pd.Timedelta(days=1)).to_numpy()
+    return visits[mask]
+
+
+def port_call_table(visits, start=None, end=None, vessel_type=None, port=None):
+    """
+    Arrivals and departures per port from a visits table: an arrival is a
+    visit that starts inside the window after the vessel was seen outside
+    the port area, a departure one that ends inside it before the vessel
+    is seen outside again.
+
+    Args:
+        visits (pd.DataFrame): As returned by detect_port_calls.
+        start (str, optional): First day of the window ('YYYY-MM-DD').
+        end (str, optional): Last day of the window.
+        vessel_type (str, optional): Only count this vessel type.
+        port (str, optional): Only return this port's row.
+
+    Returns:
+        pd.DataFrame: Port table with columns PORT_TABLE_COLUMNS, sorted by
+                      arrivals (descending), then port name.
+    """
+    arrived = _select(visits, start, end, vessel_type, port, "Arrival")
+    departed = _select(visits, start, end, vessel_type, port, "Departure")
+    arrivals = arrived.loc[arrived["Arrived"].to_numpy(dtype=bool), "Port"].value_counts()
+    departures = departed.loc[departed["Departed"].to_numpy(dtype=bool), "Port"].value_counts()
+
+    ports = arrivals.index.union(departures.index)
+    table = pd.DataFrame({
+        "FLAG": [PORT_FLAGS.get(name, "\U0001F3F3") for name in ports],
+        "PORT NAME": ports.to_numpy(dtype=object),
+        "ARRIVALS": arrivals.reindex(ports, fill_value=0).to_numpy(dtype=np.int64),
+        "DEPARTURES": departures.reindex(ports, fill_value=0).to_numpy(dtype=np.int64),
+    }, columns=PORT_TABLE_COLUMNS)
+    return table.sort_values(["ARRIVALS", "PORT NAME"], ascending=[False, True], ignore_index=True)
+
+
+def port_dwell_table(visits, start=None, end=None, vessel_type=None, port=None):
+    """
+    Per-port dwell statistics of the visits that arrived inside the window.
+    Medians use complete visits only (seen arriving and departing), as a
+    visit cut by the edge of the data has an unknown length.
+
+    Args:
+        visits (pd.DataFrame): As returned by detect_port_calls.
+        start (str, optional): First day of the window ('YYYY-MM-DD').
+        end (str, optional): Last day of the window.
+        vessel_type (str, optional): Only count this vessel type.
+        port (str, optional): Only return this port's row.
+
+    Returns:
+        pd.DataFrame: Columns DWELL_TABLE_COLUMNS, one row per port, sorted
+                      by number of visits (descending). Visits per hour are
+                      over the window, or over the visits' own time span when
+                      the window is open.
+    """
+    selected = _select(visits, start, end, vessel_type, port, "Arrival")
+    if selected.empty:
+        return pd.DataFrame(columns=DWELL_TABLE_COLUMNS)
+
+    first = pd.Timestamp(start) if start is not None else selected["Arrival"].min().normalize()
+    last = pd.Timestamp(end) if end is not None else selected["Arrival"].max().normalize()
+    hours = ((last - first).days + 1) * 24
+
+    complete = selected[selected["Arrived"].to_numpy(dtype=bool) & selected["Departed"].to_numpy(dtype=bool)]
+    medians = complete.groupby("Port")[["Dwell", "Anchored"]].median()
+    counts = selected["Port"].value_counts()
+
+    table = pd.DataFrame({
+        "PORT NAME": counts.index.to_numpy(dtype=object),
+        "VISITS": counts.to_numpy(dtype=np.int64),
+        "MEDIAN DWELL (h)": (medians["Dwell"].reindex(counts.index).dt.total_seconds() / 3600).round(2).to_numpy(),
+        "MEDIAN ANCHORED (h)": (medians["Anchored"].reindex(counts.index).dt.total_seconds() / 3600).round(2).to_numpy(),
+        "VISITS / HOUR": (counts / hours).round(2).to_numpy(),
+    }, columns=DWELL_TABLE_COLUMNS)
+    return table.sort_values(["VISITS", "PORT NAME"], ascending=[False, True], ignore_index=True)
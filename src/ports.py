@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+
+# Port coordinates (latitude, longitude) used to label every AIS ping
+PORTS = [
+    {"port": "Port of Los Angeles", "lat": 33.74, "lon": -118.26},
+    {"port": "Port of Seattle", "lat": 47.60, "lon": -122.33},
+    {"port": "Port of San Francisco", "lat": 37.78, "lon": -122.42},
+    {"port": "Port of Vancouver", "lat": 49.28, "lon": -123.12},
+    {"port": "Port of Manzanillo", "lat": 19.05, "lon": -104.33},  # Mexico
+    {"port": "Port of Ensenada", "lat": 31.86, "lon": -116.60},  # Mexico
+    {"port": "Port of Mazatlán", "lat": 23.25, "lon": -106.41},  # Mexico
+    {"port": "Port of Lázaro Cárdenas", "lat": 18.12, "lon": -102.18},  # Mexico
+    {"port": "Port of Acapulco", "lat": 16.86, "lon": -99.88},  # Mexico
+    {"port": "Port of Long Beach", "lat": 33.75, "lon": -118.20},  # U.S.
+    {"port": "Port of Oakland", "lat": 37.80, "lon": -122.27},  # U.S.
+    {"port": "Port of San Diego", "lat": 32.72, "lon": -117.17},  # U.S.
+    {"port": "Port of Tacoma", "lat": 47.26, "lon": -122.43},  # U.S.
+]
+
+# Earth's radius in kilometers
+EARTH_RADIUS_KM = 6371.0
+
+# Bytes of one (rows x ports) float64 distance matrix block; the rows per
+# block follow from it and the number of ports (about 80k rows for PORTS),
+# so each block and its temporaries stay cache-sized
+DISTANCE_BLOCK_BYTES = 8 * 1024 * 1024
+
+
+def default_chunk_size(ports=PORTS):
+    """
+    Rows per distance matrix block for the given ports.
+
+    Args:
+        ports (list, optional): Port dicts with 'port', 'lat' and 'lon'.
+
+    Returns:
+        int: Rows whose distances to every port fill DISTANCE_BLOCK_BYTES.
+    """
+    return max(1, DISTANCE_BLOCK_BYTES // (8 * max(len(ports), 1)))
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in kilometers, vectorized with NumPy broadcasting.
+
+    Args:
+        lat1, lon1 (array-like): First point(s) in degrees.
+        lat2, lon2 (array-like): Second point(s) in degrees.
+
+    Returns:
+        np.ndarray: Distances in kilometers, broadcast over the inputs.
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def nearest_port(lat, lon, ports=PORTS, chunk_size=None):
+    """
+    Find the nearest port of every point and its distance.
+
+    Distances to all ports are computed as one (rows x ports) matrix per
+    block of chunk_size rows, so memory stays bounded for any input size.
+    Ties go to the port listed first, as in the original per-row loop.
+
+    Args:
+        lat (array-like): Latitudes in degrees.
+        lon (array-like): Longitudes in degrees.
+        ports (list, optional): Port dicts with 'port', 'lat' and 'lon'.
+        chunk_size (int, optional): Rows per distance matrix block, defaults
+                                    to default_chunk_size(ports).
+
+    Returns:
+        tuple: (np.ndarray of port names, np.ndarray of distances in km).
+               Points with missing coordinates get None and NaN.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    chunk_size = chunk_size or default_chunk_size(ports)
+
+    port_names = np.array([port["port"] for port in ports] + [None], dtype=object)
+    port_lat = np.array([port["lat"] for port in ports])
+    port_lon = np.array([port["lon"] for port in ports])
+
+    port_index = np.full(len(lat), len(ports), dtype=np.intp)
+    distance = np.full(len(lat), np.nan)
+
+    for start in range(0, len(lat), chunk_size):
+        stop = start + chunk_size
+        distances = haversine_km(lat[start:stop, None], lon[start:stop, None], port_lat[None, :], port_lon[None, :])
+        valid = ~np.isnan(distances).any(axis=1)
+        closest = np.argmin(np.where(np.isnan(distances), np.inf, distances), axis=1)
+
+        port_index[start:stop] = np.where(valid, closest, len(ports))
+        distance[start:stop] = np.where(valid, distances[np.arange(len(closest)), closest], np.nan)
+
+    return port_names[port_index], distance
+
+
+def assign_nearest_port(df, ports=PORTS, chunk_size=None):
+    """
+    Label every row with its nearest port and the distance to it.
+
+    Args:
+        df (pd.DataFrame): Vessel data with 'LAT' and 'LON' columns.
+        ports (list, optional): Port dicts with 'port', 'lat' and 'lon'.
+        chunk_size (int, optional): Rows per distance matrix block, defaults
+                                    to default_chunk_size(ports).
+
+    Returns:
+        pd.DataFrame: A copy of df with 'Nearest Port' and 'Port Distance km'
+                      columns.
+    """
+    names, distance = nearest_port(df["LAT"].to_numpy(), df["LON"].to_numpy(), ports, chunk_size)
+    return df.assign(**{"Nearest Port": names, "Port Distance km": distance})
+
+
+def within_port_radius(df, radius_km):
+    """
+    Mask the rows that are inside radius_km of their nearest port, so that
+    a port visit can be defined by distance rather than by label alone.
+
+    Args:
+        df (pd.DataFrame): Data labelled by assign_nearest_port.
+        radius_km (float): Radius around each port in kilometers.
+
+    Returns:
+        pd.Series: Boolean mask aligned with df.
+    """
+    return df["Port Distance km"] <= radius_km
+
+
+def port_distance_km(lat, lon, port_names, ports=PORTS):
+    """
+    Distance of every point to the port it is labelled with, for frames
+    that carry 'Nearest Port' but not 'Port Distance km' (the store keeps
+    only the label). One distance per row, instead of one per port.
+
+    Args:
+        lat (array-like): Latitudes in degrees.
+        lon (array-like): Longitudes in degrees.
+        port_names (array-like): Port label of every point.
+        ports (list, optional): Port dicts with 'port', 'lat' and 'lon'.
+
+    Returns:
+        np.ndarray: Distances in kilometers, NaN for unknown or missing ports.
+    """
+    codes, names = pd.factorize(pd.Series(port_names, dtype=object))
+    coordinates = {port["port"]: (port["lat"], port["lon"]) for port in ports}
+    port_lat = np.array([coordinates.get(name, (np.nan, np.nan))[0] for name in names] + [np.nan])
+    port_lon = np.array([coordinates.get(name, (np.nan, np.nan))[1] for name in names] + [np.nan])
+    # Missing labels (code -1) pick the trailing NaN
+    return haversine_km(lat, lon, port_lat[codes], port_lon[codes])
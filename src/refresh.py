@@ -0,0 +1,227 @@
+import contextlib
+import logging
+import os
+import subprocess
+import sys
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from settings import APP_DATES
+
+# The data modules (pandas, pyarrow and everything built on them) are imported
+# by the refresher's thread when it first loads a dataset, not with this
+# module, so that a server can start listening before they are loaded (see
+# FAST_START in app.py)
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two checks of the source data for changes; 0 turns the
+# background refresh off
+REFRESH_INTERVAL = float(os.environ.get("DATA_REFRESH_INTERVAL", 60))
+
+REFRESH_LOCK_NAME = ".refresh.lock"
+
+# Niceness of the process rebuilding the bundle, so that on a busy machine
+# the CPU goes to serving requests first
+REFRESH_NICENESS = int(os.environ.get("DATA_REFRESH_NICENESS", 10))
+
+# Seconds to wait before trying again when the first dataset fails to load
+LOAD_RETRY_INTERVAL = 10
+
+ARTIFACTS_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "artifacts.py")
+
+
+class DatasetHandle:
+    """
+    Points to the dataset currently served. Callbacks read handle.current
+    once per call and use that dataset throughout, so a swap never mixes
+    two versions in one response, and requests still running on the old
+    dataset finish on it while new ones already see the new one.
+
+    A handle can start empty and get its first dataset later (see
+    DataRefresher); until then, reading current waits for it.
+    """
+
+    def __init__(self, dataset=None):
+        self._current = dataset
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        if dataset is not None:
+            self._ready.set()
+        # Number of swaps so far
+        self.generation = 0
+
+    @property
+    def ready(self):
+        """
+        Whether a dataset has been set.
+        """
+        return self._ready.is_set()
+
+    @property
+    def current(self):
+        if not self._ready.is_set():
+            self._ready.wait()
+        return self._current
+
+    def swap(self, dataset):
+        """
+        Make dataset the current one.
+
+        Returns:
+            Dataset: The dataset it replaces (None for the first one).
+        """
+        with self._lock:
+            previous, self._current = self._current, dataset
+            self.generation += 1
+        self._ready.set()
+        return previous
+
+
+@contextlib.contextmanager
+def _refresh_lock(data_dir):
+    # Only one process rebuilds a bundle at a time; the others then load the saved one
+    if fcntl is None:
+        yield
+        return
+    from artifacts import artifact_root
+    root = artifact_root(data_dir)
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, REFRESH_LOCK_NAME), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _build_bundle(date_filter, data_dir):
+    """
+    Build and save the bundle of the current source data in a child
+    process running artifacts.py at a lower priority, so the heavy
+    pandas work neither holds this process's GIL nor takes the CPU from
+    requests.
+    """
+    from data_store import date_bounds
+
+    command = [sys.executable, ARTIFACTS_SCRIPT]
+    start, end = date_bounds(date_filter) or (None, None)
+    if start:
+        command += ["--start", start]
+    if end:
+        command += ["--end", end]
+    if data_dir is not None:
+        command += ["--data-dir", data_dir]
+    lower_priority = (lambda: os.nice(REFRESH_NICENESS)) if hasattr(os, "nice") else None
+    subprocess.run(command, check=True, preexec_fn=lower_priority)
+
+
+class DataRefresher:
+    """
+    Background thread that watches the source data and swaps a rebuilt
+    dataset into a handle when it changes. The check compares the dataset
+    version computed from file signatures (see data.dataset_version) with
+    the current one, so an unchanged folder costs a directory listing.
+
+    The new bundle is built by a child process; this process then only maps
+    it and builds the indexes, so requests keep being served at about their
+    usual latency during a refresh.
+
+    The thread is per process: start() is safe to call on every request and
+    starts it once in each (e.g. forked gunicorn) worker. It also loads the
+    first dataset of a handle created empty, so that a server can start
+    listening before any data is read (see FAST_START in app.py).
+    """
+
+    def __init__(self, handle, date_filter=APP_DATES, data_dir=None, interval=REFRESH_INTERVAL):
+        """
+        Args:
+            handle (DatasetHandle): Handle to keep up to date.
+            date_filter (str or tuple, optional): Dates the app loads.
+            data_dir (str, optional): Defaults to the repository's data folder.
+            interval (float, optional): Seconds between two checks; 0 disables it.
+        """
+        self.handle = handle
+        self.date_filter = date_filter
+        self.data_dir = data_dir
+        self.interval = interval
+        self._pid = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """
+        Rebuild and swap in the dataset if the source data changed.
+
+        Returns:
+            bool: True if a new dataset was swapped in.
+        """
+        from artifacts import load_artifacts
+        from data import dataset_version
+        from dataset import build_dataset
+
+        version = dataset_version(date_filter=self.date_filter, data_dir=self.data_dir)
+        if version == self.handle.current.version:
+            return False
+        with _refresh_lock(self.data_dir):
+            # Another worker may have saved the new bundle already
+            if load_artifacts(self.date_filter, self.data_dir) is None:
+                _build_bundle(self.date_filter, self.data_dir)
+            dataset = build_dataset(self.date_filter, self.data_dir)
+        self.handle.swap(dataset)
+        logger.info("Dataset refreshed to version %s (%d rows)", dataset.version, len(dataset.df))
+        return True
+
+    def load(self):
+        """
+        Build and swap in the first dataset of an empty handle, retrying
+        until it succeeds or the refresher is stopped.
+        """
+        from dataset import build_dataset
+
+        while not self.handle.ready:
+            try:
+                dataset = build_dataset(self.date_filter, self.data_dir)
+            except Exception:
+                logger.exception("Loading the dataset failed, retrying in %s s", LOAD_RETRY_INTERVAL)
+                if self._stop.wait(LOAD_RETRY_INTERVAL):
+                    return
+                continue
+            self.handle.swap(dataset)
+            logger.info("Dataset loaded, version %s (%d rows)", dataset.version, len(dataset.df))
+
+    def _run(self):
+        self.load()
+        if self.interval <= 0:
+            return
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception:
+                # Keep serving the current dataset and try again at the next check
+                logger.exception("Refreshing the dataset failed")
+
+    def start(self):
+        """
+        Start watching in this process, unless already started or disabled.
+        A handle without a dataset gets its first one loaded by the same
+        thread, even when watching is disabled.
+        """
+        if (self.interval <= 0 and self.handle.ready) or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="dataset-refresher", daemon=True).start()
+
+    def stop(self):
+        """
+        Stop watching after the current check.
+        """
+        self._stop.set()
@@ -0,0 +1,125 @@
+import functools
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Folder of the shared result cache: tmpfs when available, so every worker
+# reads and writes RAM
+RESULT_CACHE_DIR = os.environ.get(
+    "RESULT_CACHE_DIR",
+    os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "vessel-vision-results")
+)
+
+# Entries kept in the shared cache (oldest written are evicted first)
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", 512))
+
+
+class ResultCache:
+    """
+    Memoizes callback results per (callback, dataset version, inputs) in two
+    tiers: a small in-process LRU in front of an optional shared backend
+    that every worker process reads and writes, such as a Flask-Caching
+    FileSystemCache. A result computed by one worker is then served by all
+    of them, and a worker's own recent results do not even need unpickling.
+
+    Counters of hits per tier and of misses are kept per process.
+    """
+
+    def __init__(self, backend=None, max_entries=64):
+        """
+        Args:
+            backend (optional): Shared store with get(key) and set(key, value)
+                                methods, returning None on a miss. Only the
+                                in-process tier is used when omitted.
+            max_entries (int, optional): Results kept in the in-process tier.
+        """
+        self.backend = backend
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {"hits": 0, "shared_hits": 0, "misses": 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def _store_local(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached result for key, calling compute() on a miss.
+
+        Args:
+            key (str): Cache key; must identify the dataset and all inputs.
+            compute (callable): Produces the result; it must be picklable
+                                when a shared backend is used.
+
+        Returns:
+            The cached or freshly computed result.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._counts["hits"] += 1
+                return self._entries[key]
+
+        if self.backend is not None:
+            value = self.backend.get(key)
+            if value is not None:
+                self._count("shared_hits")
+                self._store_local(key, value)
+                return value
+
+        self._count("misses")
+        value = compute()
+        self._store_local(key, value)
+        if self.backend is not None:
+            self.backend.set(key, value)
+        return value
+
+    def memoize(self, name, version=None):
+        """
+        Decorator caching a function's results by its positional arguments.
+
+        Args:
+            name (str): Distinguishes the function's entries from others'.
+            version (str, optional): Dataset (or output layout) version, so
+                                     results of other datasets, or cached
+                                     by older code, are never served.
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args):
+                key = "|".join([name, str(version)] + [repr(arg) for arg in args])
+                return self.get_or_compute(key, lambda: func(*args))
+            return wrapper
+        return decorator
+
+    def stats(self):
+        """
+        Hit and miss counters of this process.
+
+        Returns:
+            dict: 'hits' (in-process tier), 'shared_hits' (shared backend),
+                  'misses' and 'entries' (size of the in-process tier).
+        """
+        with self._lock:
+            return dict(self._counts, entries=len(self._entries))
+
+    def clear(self):
+        """
+        Forget the in-process entries and reset the counters. The shared
+        backend is left alone, since other processes use it.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._counts = {"hits": 0, "shared_hits": 0, "misses": 0}
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+# Bumped whenever SCHEMA changes; part of every dataset version, so derived
+# artifacts and cached results built with older dtypes are not reused
+SCHEMA_VERSION = 1
+
+# Target dtype of every column of the processed vessel frame
+SCHEMA = {
+    "MMSI": "int32",  # 9-digit identifiers fit in 31 bits
+    "BaseDateTime": "datetime64[ns]",
+    "LAT": "float32",  # ~1 m resolution, plenty for AIS positions
+    "LON": "float32",
+    "SOG": "float32",
+    "VesselName": "category",
+    "Vessel Type Name": "category",
+    "Nearest Port": "category",
+    "Duration Anchored": "timedelta64[ns]",
+    "Hour": "int8",
+    "Date": "category",  # ordered 'YYYY-MM-DD' codes, see date_codes
+}
+
+
+def date_codes(timestamps):
+    """
+    Day of every timestamp as an ordered categorical of 'YYYY-MM-DD'
+    strings: one small code per row, while filters and labels still see
+    plain date strings. Only the distinct days are formatted.
+
+    Args:
+        timestamps (pd.Series): Datetime column.
+
+    Returns:
+        pd.Series: Ordered categorical aligned with timestamps.
+    """
+    days = timestamps.dt.normalize().astype("category")
+    return days.cat.rename_categories(days.cat.categories.strftime("%Y-%m-%d")).cat.as_ordered()
+
+
+def apply_schema(df):
+    """
+    Cast the columns of a vessel frame to SCHEMA. Columns not in SCHEMA are
+    left as they are; MMSI stays int64 if any value does not fit in int32.
+
+    Args:
+        df (pd.DataFrame): Vessel frame, modified in place.
+
+    Returns:
+        pd.DataFrame: The same frame.
+    """
+    for column, dtype in SCHEMA.items():
+        if column not in df or df[column].dtype == dtype:
+            continue
+        if column == "MMSI" and len(df) and df[column].abs().max() > np.iinfo(np.int32).max:
+            continue
+        if column == "Date":
+            df[column] = df[column].astype(str).astype("category").cat.as_ordered()
+        else:
+            df[column] = df[column].astype(dtype)
+    return df
+
+
+def memory_report(before, after):
+    """
+    Per-column memory of two representations of the same frame.
+
+    Args:
+        before (pd.DataFrame): Reference representation.
+        after (pd.DataFrame): Compact representation.
+
+    Returns:
+        pd.DataFrame: 'before dtype', 'after dtype', 'before MB', 'after MB'
+                      and 'ratio' per column, plus a 'total' row. Object
+                      columns are measured deeply, string objects included.
+    """
+    before_bytes = before.memory_usage(index=False, deep=True)
+    after_bytes = after.memory_usage(index=False, deep=True)
+    report = pd.DataFrame({
+        "before dtype": before.dtypes.astype(str),
+        "after dtype": after.dtypes.astype(str),
+        "before MB": before_bytes / 2 ** 20,
+        "after MB": after_bytes / 2 ** 20,
+    })
+    report.loc["total"] = ["", "", before_bytes.sum() / 2 ** 20, after_bytes.sum() / 2 ** 20]
+    report["ratio"] = report["before MB"] / report["after MB"]
+    return report
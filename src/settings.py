@@ -0,0 +1,32 @@
+import os
+
+# Settings read from the environment that both the app and the data modules
+# depend on. This module imports nothing heavy, so that app.py can read them
+# (e.g. to key cached results) before pandas is loaded (see FAST_START)
+
+# Inclusive range of days the dashboard loads; unset ends are open, so by
+# default every day in the store is loaded
+APP_DATES = (os.environ.get("APP_START_DATE") or None, os.environ.get("APP_END_DATE") or None)
+
+# Maximum number of markers sent to the browser for one map figure
+MAP_POINT_BUDGET = int(os.environ.get("MAP_POINT_BUDGET", 20000))
+
+# Windows longer than this many days are plotted per day instead of per hour
+TREND_HOURLY_MAX_DAYS = int(os.environ.get("TREND_HOURLY_MAX_DAYS", 7))
+
+# A ping within this distance of its nearest port is inside that port's area
+PORT_RADIUS_KM = float(os.environ.get("PORT_RADIUS_KM", 10))
+
+# A stay in a port area is a port call only if the vessel slowed to this speed (knots)
+PORT_CALL_MAX_SOG = float(os.environ.get("PORT_CALL_MAX_SOG", 1.0))
+
+# Pings in the same port area further apart than this belong to separate calls
+PORT_CALL_MAX_GAP_MINUTES = float(os.environ.get("PORT_CALL_MAX_GAP_MINUTES", 60))
+
+# Settings the detected port calls depend on; recorded with everything built
+# from them (the bundle's visits, cached tables), so changing one rebuilds those
+PORT_CALL_PARAMS = {
+    "radius_km": PORT_RADIUS_KM,
+    "max_sog": PORT_CALL_MAX_SOG,
+    "max_gap_minutes": PORT_CALL_MAX_GAP_MINUTES,
+}
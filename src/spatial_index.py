@@ -0,0 +1,121 @@
+import math
+import numpy as np
+
+# Assumed map size in pixels when the viewport has to be derived from center and zoom
+DEFAULT_VIEWPORT_PX = (1000, 600)
+
+
+class SpatialGrid:
+    """
+    Uniform lat/lon grid over the AIS pings, built once at startup.
+
+    Row positions are sorted by grid cell (row-major: latitude band, then
+    longitude), so the cells of one latitude band that overlap a viewport
+    are a single contiguous slice. A viewport query therefore touches one
+    slice per latitude band plus an exact bounds check on the gathered rows.
+    """
+
+    def __init__(self, lat, lon, cell_size=0.25):
+        """
+        Args:
+            lat (np.ndarray): Latitude of every row.
+            lon (np.ndarray): Longitude of every row.
+            cell_size (float, optional): Cell edge in degrees.
+        """
+        # Kept in their own float dtype, so float32 (or memory-mapped)
+        # columns are used as they are instead of copied
+        self.lat = np.asarray(lat)
+        self.lon = np.asarray(lon)
+        self.cell_size = cell_size
+
+        valid = np.isfinite(self.lat) & np.isfinite(self.lon)
+        if valid.any():
+            self.lat_origin = float(np.floor(self.lat[valid].min()))
+            self.lon_origin = float(np.floor(self.lon[valid].min()))
+            self.n_lat = int((self.lat[valid].max() - self.lat_origin) // cell_size) + 1
+            self.n_lon = int((self.lon[valid].max() - self.lon_origin) // cell_size) + 1
+        else:
+            self.lat_origin, self.lon_origin, self.n_lat, self.n_lon = 0.0, 0.0, 1, 1
+
+        positions = np.flatnonzero(valid)
+        cells = self._lat_bin(self.lat[positions]) * self.n_lon + self._lon_bin(self.lon[positions])
+        order = np.argsort(cells, kind="stable")
+
+        self._positions = positions[order]
+        counts = np.bincount(cells, minlength=self.n_lat * self.n_lon)
+        self._offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def _lat_bin(self, lat):
+        return np.clip(((lat - self.lat_origin) // self.cell_size).astype(np.int64), 0, self.n_lat - 1)
+
+    def _lon_bin(self, lon):
+        return np.clip(((lon - self.lon_origin) // self.cell_size).astype(np.int64), 0, self.n_lon - 1)
+
+    def query(self, lat_min, lat_max, lon_min, lon_max):
+        """
+        Row positions inside an inclusive lat/lon box.
+
+        Args:
+            lat_min, lat_max, lon_min, lon_max (float): Viewport bounds.
+
+        Returns:
+            np.ndarray: Sorted row positions.
+        """
+        row_start, row_stop = self._lat_bin(np.array([lat_min, lat_max]))
+        col_start, col_stop = self._lon_bin(np.array([lon_min, lon_max]))
+
+        slices = []
+        for row in range(row_start, row_stop + 1):
+            start = self._offsets[row * self.n_lon + col_start]
+            stop = self._offsets[row * self.n_lon + col_stop + 1]
+            if stop > start:
+                slices.append(self._positions[start:stop])
+
+        if not slices:
+            return np.array([], dtype=np.intp)
+
+        # Cells on the edge of the box also hold rows just outside it
+        candidates = np.concatenate(slices)
+        lat, lon = self.lat[candidates], self.lon[candidates]
+        inside = (lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max)
+        return np.sort(candidates[inside])
+
+
+def viewport_bounds(relayout_data, viewport_px=DEFAULT_VIEWPORT_PX):
+    """
+    Extract the visible lat/lon box from a mapbox figure's relayoutData.
+
+    Uses the corner coordinates plotly reports after a pan or zoom
+    ('mapbox._derived'); falls back to estimating the box from
+    'mapbox.center' and 'mapbox.zoom' with a Web Mercator approximation.
+
+    Args:
+        relayout_data (dict): relayoutData from the dcc.Graph.
+        viewport_px (tuple, optional): Assumed (width, height) of the map in
+                                       pixels for the center/zoom fallback.
+
+    Returns:
+        tuple or None: (lat_min, lat_max, lon_min, lon_max), or None when
+                       the event does not describe the viewport.
+    """
+    if not relayout_data:
+        return None
+
+    derived = relayout_data.get("mapbox._derived")
+    if derived and derived.get("coordinates"):
+        lons, lats = zip(*derived["coordinates"])
+        return min(lats), max(lats), min(lons), max(lons)
+
+    center = relayout_data.get("mapbox.center")
+    zoom = relayout_data.get("mapbox.zoom")
+    if center is None or zoom is None:
+        return None
+
+    # 512 px tiles cover 360 degrees of longitude at zoom 0 in mapbox-gl
+    degrees_per_px = 360 / (512 * 2 ** zoom)
+    half_width = viewport_px[0] / 2 * degrees_per_px
+    half_height = viewport_px[1] / 2 * degrees_per_px * math.cos(math.radians(center["lat"]))
+    return (
+        center["lat"] - half_height, center["lat"] + half_height,
+        center["lon"] - half_width, center["lon"] + half_width,
+    )
@@ -0,0 +1,208 @@
+import numpy as np
+import pandas as pd
+
+# Cube dimensions: vessel type x port x date x hour
+CUBE_KEYS = ("Vessel Type Name", "Nearest Port", "Date", "Hour")
+
+
+def _distinct_pairs(cells, vessels, n_vessels):
+    """
+    Deduplicate (cell, vessel) pairs and sort them by cell.
+
+    Returns:
+        tuple: (cell of each pair, vessel code of each pair)
+    """
+    keys = np.unique(cells.astype(np.int64) * n_vessels + vessels)
+    return keys // n_vessels, (keys % n_vessels).astype(np.int32)
+
+
+class SummaryCube:
+    """
+    Pre-aggregated KPIs for the vessel count cards, computed once at load
+    time (the longest anchoring card reads the anchoring episodes instead).
+
+    Every (vessel type, port, date, hour) cell keeps the distinct vessels
+    seen in it, split into all / moving (SOG > 0) / anchored (SOG == 0), as
+    integer MMSI codes. A
+    query marks the selected cells and unions their vessel codes in a
+    bitmap the size of the fleet, so its cost depends on the number of
+    distinct vessels per hour, not on the number of AIS pings.
+
+    The trend graph's series are precomputed too: distinct vessels and
+    pings per hour and per day, for each vessel type and port and for all
+    of them, so a trend query is a slice (see trend).
+    """
+
+    def __init__(self, df, keys=CUBE_KEYS):
+        """
+        Args:
+            df (pd.DataFrame): Vessel data with 'MMSI', 'SOG' and the key
+                               columns.
+            keys (tuple, optional): Cube dimensions, defaults to CUBE_KEYS.
+        """
+        self.keys = tuple(keys)
+
+        mmsi_codes, mmsi_values = pd.factorize(df["MMSI"])
+        self.n_vessels = max(len(mmsi_values), 1)
+
+        codes = []
+        self._lookup = []
+        self._uniques = []
+        for key in self.keys:
+            key_codes, uniques = pd.factorize(df[key], use_na_sentinel=False)
+            codes.append(key_codes)
+            self._lookup.append({value: code for code, value in enumerate(uniques) if pd.notna(value)})
+            self._uniques.append(uniques)
+
+        self._shape = tuple(int(c.max()) + 1 if len(c) else 1 for c in codes)
+        self.n_cells = int(np.prod(self._shape))
+        cells = np.ravel_multi_index(codes, self._shape) if len(df) else np.zeros(0, dtype=np.intp)
+
+        sog = df["SOG"].to_numpy()
+        self._pairs = {
+            "unique": _distinct_pairs(cells, mmsi_codes, self.n_vessels),
+            "moving": _distinct_pairs(cells[sog > 0], mmsi_codes[sog > 0], self.n_vessels),
+            "anchored": _distinct_pairs(cells[sog == 0], mmsi_codes[sog == 0], self.n_vessels),
+        }
+
+        self._trend_vessels = self._trend_pings = None
+        if self.keys == CUBE_KEYS:
+            self._build_trend(np.bincount(cells, minlength=self.n_cells))
+
+    def _build_trend(self, cell_pings):
+        """
+        Fill the trend tables, shaped (types + 1, ports + 1, dates, hours + 1):
+        the extra type and port index stands for all of them and the extra
+        hour for the whole day. A coarser cell's distinct vessels come from
+        its (cell, vessel) pairs deduplicated by sorting, since counts of
+        finer cells cannot be added up.
+        """
+        n_types, n_ports, n_dates, n_hours = self._shape
+        shape = (n_types + 1, n_ports + 1, n_dates, n_hours + 1)
+        size = int(np.prod(shape))
+        vessels = np.zeros(size, dtype=np.int64)
+        pings = np.zeros(size, dtype=np.int64)
+
+        pair_cells, pair_vessels = self._pairs["unique"]
+        pair_coords = np.unravel_index(pair_cells, self._shape)
+        cell_coords = np.unravel_index(np.arange(self.n_cells), self._shape)
+        for all_types in (False, True):
+            for all_ports in (False, True):
+                for whole_day in (False, True):
+                    # Each combination fills its own part of the tables
+                    collapse = lambda coords: np.ravel_multi_index((
+                        np.full_like(coords[0], n_types) if all_types else coords[0],
+                        np.full_like(coords[1], n_ports) if all_ports else coords[1],
+                        coords[2],
+                        np.full_like(coords[3], n_hours) if whole_day else coords[3],
+                    ), shape)
+                    keys = np.unique(collapse(pair_coords).astype(np.int64) * self.n_vessels + pair_vessels)
+                    vessels += np.bincount(keys // self.n_vessels, minlength=size)
+                    pings += np.bincount(collapse(cell_coords), weights=cell_pings, minlength=size).astype(np.int64)
+
+        self._trend_vessels = vessels.reshape(shape)
+        self._trend_pings = pings.reshape(shape)
+
+    def _cell_mask(self, values):
+        # Boolean mask over all cells matching the given key values
+        axes = []
+        for axis, value in enumerate(values):
+            if value is None:
+                axes.append(np.arange(self._shape[axis]))
+            else:
+                # A tuple or list selects every listed value (e.g. the days of a range)
+                values = value if isinstance(value, (list, tuple)) else [value]
+                codes = [self._lookup[axis].get(v) for v in values]
+                axes.append(np.array([code for code in codes if code is not None], dtype=np.intp))
+        mask = np.zeros(self._shape, dtype=bool)
+        mask[np.ix_(*axes)] = True
+        return mask.ravel()
+
+    def _count(self, name, cell_mask):
+        # Union the vessel codes of the selected cells in a fleet-sized bitmap
+        cells, vessels = self._pairs[name]
+        seen = np.zeros(self.n_vessels, dtype=bool)
+        seen[vessels[cell_mask[cells]]] = True
+        return int(seen.sum())
+
+    def query(self, vessel_type=None, port=None, date=None, hour=None):
+        """
+        Answer the three vessel count cards for a filter set.
+
+        Args:
+            vessel_type (str, optional): Vessel type, None for all.
+            port (str, optional): Nearest port, None for all.
+            date (optional): Date key value or tuple of values, None for all.
+            hour (int, optional): Hour of day, None for all.
+
+        Returns:
+            dict: 'unique', 'moving' and 'anchored' distinct vessel counts.
+        """
+        values = [vessel_type, port, date, hour][:len(self.keys)]
+        cell_mask = self._cell_mask(values)
+
+        return {
+            "unique": self._count("unique", cell_mask),
+            "moving": self._count("moving", cell_mask),
+            "anchored": self._count("anchored", cell_mask),
+        }
+
+    def trend(self, vessel_type=None, port=None, date=None, freq="h"):
+        """
+        Distinct vessels and pings per hour or per day, read off the
+        precomputed trend tables.
+
+        Args:
+            vessel_type (str, optional): Vessel type, None for all.
+            port (str, optional): Nearest port, None for all.
+            date (optional): Date key value or tuple of values, None for all.
+            freq (str, optional): 'h' for hourly buckets, 'D' for daily ones.
+
+        Returns:
+            pd.DataFrame: 'Timestamp' (start of the bucket), 'Unique Vessels'
+                          and 'Pings' columns, one row per bucket with pings,
+                          in time order, as figures.trend_series.
+        """
+        if self._trend_vessels is None:
+            raise ValueError("trend needs a cube over CUBE_KEYS")
+        empty = pd.DataFrame({
+            "Timestamp": pd.to_datetime([]), "Unique Vessels": pd.Series([], dtype="int64"),
+            "Pings": pd.Series([], dtype="int64")
+        })
+
+        # Index of the type and port, or the "all" slot when not filtered
+        index = []
+        for axis, value in enumerate((vessel_type, port)):
+            code = self._shape[axis] if value is None else self._lookup[axis].get(value)
+            if code is None:
+                return empty
+            index.append(code)
+
+        dates = self._uniques[2]
+        if date is None:
+            date_codes = np.array(sorted(self._lookup[2].values()), dtype=np.intp)
+        else:
+            values = date if isinstance(date, (list, tuple)) else [date]
+            date_codes = np.array([code for code in (self._lookup[2].get(v) for v in values) if code is not None],
+                                  dtype=np.intp)
+        if not len(date_codes):
+            return empty
+
+        vessels = self._trend_vessels[index[0], index[1], date_codes]
+        pings = self._trend_pings[index[0], index[1], date_codes]
+        days = pd.to_datetime(np.asarray(dates, dtype=object)[date_codes].astype(str))
+        if freq == "D":
+            timestamps = days
+            vessels, pings = vessels[:, -1], pings[:, -1]
+        else:
+            hours = pd.to_timedelta(np.asarray(self._uniques[3], dtype=np.int64), unit="h")
+            timestamps = (days.to_numpy()[:, None] + hours.to_numpy()[None, :]).ravel()
+            vessels, pings = vessels[:, :-1].ravel(), pings[:, :-1].ravel()
+
+        has_pings = pings > 0
+        trend = pd.DataFrame({
+            "Timestamp": pd.to_datetime(timestamps[has_pings]),
+            "Unique Vessels": vessels[has_pings],
+            "Pings": pings[has_pings],
+        })
+        return trend.sort_values("Timestamp", ignore_index=True)
@@ -0,0 +1,224 @@
+import os
+import numpy as np
+import pandas as pd
+
+# A vessel's pings further apart than this start a new track
+TRACK_GAP_MINUTES = float(os.environ.get("TRACK_GAP_MINUTES", 30))
+
+# Douglas-Peucker tolerance: dropped pings lie within this many km of the simplified line
+TRACK_TOLERANCE_KM = float(os.environ.get("TRACK_TOLERANCE_KM", 0.2))
+
+# Kilometres per degree of latitude (and of longitude at the equator)
+KM_PER_DEGREE = 111.32
+
+
+class TrackSet:
+    """
+    Vessel trajectories held as flat arrays: the points of every track are
+    stored one after the other, and track i is the slice
+    offsets[i]:offsets[i + 1] of the point arrays. Per-track attributes
+    (MMSI, vessel type) are arrays of one value per track.
+    """
+
+    def __init__(self, offsets, lat, lon, times, rows, mmsi, vessel_type):
+        """
+        Args:
+            offsets (np.ndarray): int64, one more than the number of tracks.
+            lat, lon (np.ndarray): Position of every point.
+            times (np.ndarray): datetime64[ns] time of every point.
+            rows (np.ndarray): Row position of every point in the source frame.
+            mmsi (np.ndarray): MMSI of every track.
+            vessel_type (np.ndarray): Vessel type name of every track.
+        """
+        self.offsets = offsets
+        self.lat = lat
+        self.lon = lon
+        self.times = times
+        self.rows = rows
+        self.mmsi = mmsi
+        self.vessel_type = vessel_type
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def n_points(self):
+        return int(self.offsets[-1])
+
+    def lengths(self):
+        """
+        Number of points of every track.
+        """
+        return np.diff(self.offsets)
+
+    def track_ids(self):
+        """
+        Track number of every point.
+        """
+        return np.repeat(np.arange(len(self)), self.lengths())
+
+    def track(self, i):
+        """
+        Points of one track.
+
+        Returns:
+            pd.DataFrame: 'BaseDateTime', 'LAT' and 'LON' of track i.
+        """
+        points = slice(self.offsets[i], self.offsets[i + 1])
+        return pd.DataFrame({"BaseDateTime": self.times[points], "LAT": self.lat[points], "LON": self.lon[points]})
+
+    def subset(self, keep):
+        """
+        A TrackSet with only the points where keep is True. Tracks keep
+        their order and attributes; those left without points are dropped.
+
+        Args:
+            keep (np.ndarray): Boolean mask over the points.
+
+        Returns:
+            TrackSet: The kept points.
+        """
+        counts = np.bincount(self.track_ids()[keep], minlength=len(self))
+        nonempty = counts > 0
+        offsets = np.concatenate([[0], np.cumsum(counts[nonempty])]).astype(np.int64)
+        return TrackSet(offsets, self.lat[keep], self.lon[keep], self.times[keep], self.rows[keep],
+                        self.mmsi[nonempty], self.vessel_type[nonempty])
+
+
+def build_tracks(df, gap_minutes=None):
+    """
+    Cut vessel pings into tracks: a track is a run of consecutive pings of
+    one vessel with no time gap longer than gap_minutes. The frame must be
+    sorted by MMSI and BaseDateTime, as returned by load_data (row subsets
+    of it keep that order), so tracks are found positionally.
+
+    Args:
+        df (pd.DataFrame): Vessel data with 'MMSI', 'BaseDateTime', 'LAT',
+                           'LON' and 'Vessel Type Name' columns.
+        gap_minutes (float, optional): Defaults to TRACK_GAP_MINUTES.
+
+    Returns:
+        TrackSet: One track per vessel and uninterrupted stretch of pings.
+    """
+    gap_minutes = TRACK_GAP_MINUTES if gap_minutes is None else gap_minutes
+    mmsi = df["MMSI"].to_numpy()
+    times = df["BaseDateTime"].to_numpy(dtype="datetime64[ns]")
+    lat = df["LAT"].to_numpy()
+    lon = df["LON"].to_numpy()
+
+    # Pings without a position cannot be drawn
+    valid = np.isfinite(lat) & np.isfinite(lon)
+    rows = np.flatnonzero(valid)
+    mmsi, times, lat, lon = mmsi[rows], times[rows], lat[rows], lon[rows]
+
+    starts = np.ones(len(rows), dtype=bool)
+    if len(rows) > 1:
+        gap = np.timedelta64(int(gap_minutes * 60 * 1e9), "ns")
+        starts[1:] = (mmsi[1:] != mmsi[:-1]) | (times[1:] - times[:-1] > gap)
+    first = np.flatnonzero(starts)
+    offsets = np.concatenate([first, [len(rows)]]).astype(np.int64)
+
+    vessel_type = np.asarray(df["Vessel Type Name"].to_numpy(), dtype=object)[rows[first]]
+    return TrackSet(offsets, lat, lon, times, rows, mmsi[first], vessel_type)
+
+
+def _project(tracks):
+    """
+    Local equirectangular projection of the points to km, scaled per track
+    by the cosine of its mean latitude.
+    """
+    lengths = tracks.lengths()
+    lat = tracks.lat.astype(np.float64)
+    lon = tracks.lon.astype(np.float64)
+    mean_lat = np.add.reduceat(lat, tracks.offsets[:-1]) / lengths
+    x = lon * KM_PER_DEGREE * np.repeat(np.cos(np.radians(mean_lat)), lengths)
+    y = lat * KM_PER_DEGREE
+    return x, y
+
+
+def track_importance(tracks, tolerance_km=None):
+    """
+    Douglas-Peucker importance of every point: the largest tolerance at
+    which the point is still kept (infinite for track ends, 0 for points
+    dropped at tolerance_km). Simplifying to any tolerance t >= tolerance_km
+    then keeps exactly the points whose importance is above t, so one run
+    serves every coarser level of detail.
+
+    All tracks are processed together: each pass splits every open segment
+    of every track at its farthest point at once, so the number of
+    Python-level steps grows with the depth of the recursion, not with the
+    number of tracks or points.
+
+    Args:
+        tracks (TrackSet): Tracks to simplify (no empty track).
+        tolerance_km (float, optional): Finest tolerance, defaults to
+                                        TRACK_TOLERANCE_KM.
+
+    Returns:
+        np.ndarray: float64 importance in km of every point.
+    """
+    tolerance_km = TRACK_TOLERANCE_KM if tolerance_km is None else tolerance_km
+    importance = np.zeros(tracks.n_points)
+    if tracks.n_points == 0:
+        return importance
+    x, y = _project(tracks)
+    importance[tracks.offsets[:-1]] = np.inf
+    importance[tracks.offsets[1:] - 1] = np.inf
+
+    # Open segments (first and last point) and the importance of the split
+    # that made them: a point is never kept longer than its parent segment
+    start = tracks.offsets[:-1]
+    end = tracks.offsets[1:] - 1
+    parent = np.full(len(start), np.inf)
+    while True:
+        open_ = end - start > 1
+        start, end, parent = start[open_], end[open_], parent[open_]
+        if not len(start):
+            break
+
+        # Every interior point of every open segment, with its segment number
+        inner = end - start - 1
+        first_inner = np.cumsum(inner) - inner
+        segment = np.repeat(np.arange(len(start)), inner)
+        points = np.arange(len(segment)) - first_inner[segment] + start[segment] + 1
+
+        # Squared distance to the segment, the projection clamped to its ends
+        # (a closed loop measures the distance to its end point)
+        dx, dy = x[end] - x[start], y[end] - y[start]
+        length2 = dx * dx + dy * dy
+        inverse = np.divide(1.0, length2, out=np.zeros_like(length2), where=length2 > 0)
+        px, py = x[points] - x[start][segment], y[points] - y[start][segment]
+        sdx, sdy = dx[segment], dy[segment]
+        t = np.clip((px * sdx + py * sdy) * inverse[segment], 0, 1)
+        distance2 = (px - t * sdx) ** 2 + (py - t * sdy) ** 2
+
+        # Farthest point of each segment: the first point holding the segment's maximum
+        farthest = np.maximum.reduceat(distance2, first_inner)
+        candidates = np.flatnonzero(distance2 == farthest[segment])
+        pivot_at = candidates[np.unique(segment[candidates], return_index=True)[1]]
+
+        split = farthest > tolerance_km ** 2
+        pivot = points[pivot_at][split]
+        weight = np.minimum(np.sqrt(farthest[split]), parent[split])
+        importance[pivot] = weight
+        start, end = np.concatenate([start[split], pivot]), np.concatenate([pivot, end[split]])
+        parent = np.concatenate([weight, weight])
+
+    return importance
+
+
+def simplify_tracks(tracks, tolerance_km=None):
+    """
+    Simplify every track with the Douglas-Peucker algorithm, keeping each
+    track's first and last point and every point needed to stay within
+    tolerance_km of the original line.
+
+    Args:
+        tracks (TrackSet): Tracks to simplify.
+        tolerance_km (float, optional): Defaults to TRACK_TOLERANCE_KM.
+
+    Returns:
+        TrackSet: The simplified tracks.
+    """
+    tolerance_km = TRACK_TOLERANCE_KM if tolerance_km is None else tolerance_km
+    return tracks.subset(track_importance(tracks, tolerance_km) > tolerance_km)
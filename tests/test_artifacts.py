@@ -0,0 +1,102 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import artifacts
+from artifacts import build_artifacts, get_artifacts, load_artifacts, save_artifacts
+from data_store import STORE_COLUMNS
+
+pytest.importorskip("pyarrow")
+
+PORTS = ["Port of Seattle", "Port of Tacoma"]
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    # Two days of pings of 20 vessels in data/split-data, and a private shared-memory folder
+    rng = np.random.default_rng(3)
+    n = 800
+    mmsi = rng.integers(0, 20, n)
+    split_dir = tmp_path / "data" / "split-data"
+    split_dir.mkdir(parents=True)
+    pd.DataFrame({
+        "MMSI": 366000000 + mmsi,
+        "BaseDateTime": (pd.Timestamp("2023-12-31") + pd.to_timedelta(rng.integers(0, 2 * 24 * 60, n), unit="min"))
+        .strftime("%Y-%m-%dT%H:%M:%S"),
+        "LAT": 47.4 + rng.normal(0, 0.1, n).round(5),
+        "LON": -122.4 + rng.normal(0, 0.1, n).round(5),
+        "SOG": np.where(rng.random(n) < 0.5, 0.0, rng.uniform(0.1, 15, n).round(1)),
+        "VesselName": [f"VESSEL {m}" for m in mmsi],
+        "Vessel Type Name": np.array(["Cargo", "Passenger", None], dtype=object)[mmsi % 3],
+        "Nearest Port": np.array(PORTS, dtype=object)[mmsi % 2],
+    })[STORE_COLUMNS].to_csv(split_dir / "ais_chunk_0.csv", index=False)
+
+    shared_dir = tmp_path / "shm"
+    shared_dir.mkdir()
+    monkeypatch.setattr(artifacts, "SHARED_MEMORY_DIR", str(shared_dir))
+    return str(tmp_path / "data")
+
+
+def missing_as_none(df):
+    # Parquet reads missing strings back as None where the built tables hold NaN
+    objects = df.select_dtypes("object").columns
+    return df.assign(**{column: df[column].where(df[column].notna(), None) for column in objects})
+
+
+def test_round_trip_preserves_frame_and_tables(data_dir):
+    built = build_artifacts(None, data_dir)
+    save_artifacts(built, None, data_dir)
+    loaded = load_artifacts(None, data_dir)
+
+    assert loaded is not None and loaded.version == built.version
+    pd.testing.assert_frame_equal(loaded.df, built.df)
+    for column in ("VesselName", "Vessel Type Name", "Nearest Port", "Date"):
+        assert list(loaded.df[column].cat.categories) == list(built.df[column].cat.categories)
+    assert loaded.df.attrs["dataset_version"] == built.df.attrs["dataset_version"]
+
+    pd.testing.assert_frame_equal(missing_as_none(loaded.visits), missing_as_none(built.visits))
+    pd.testing.assert_frame_equal(missing_as_none(loaded.episodes), missing_as_none(built.episodes))
+    pd.testing.assert_frame_equal(loaded.trend, built.trend)
+    assert loaded.figures == built.figures
+
+
+def test_numeric_columns_are_mapped_from_shared_memory(data_dir):
+    bundle = get_artifacts(None, data_dir)
+
+    shared = os.listdir(artifacts.SHARED_MEMORY_DIR)
+    assert len(shared) == 1 and shared[0].endswith(".arrow")
+    # Read-only views of the mapped file, not copies
+    for column in ("LAT", "LON", "SOG", "BaseDateTime", "Duration Anchored"):
+        assert not bundle.df[column].to_numpy().flags.writeable
+
+
+@pytest.mark.parametrize("setting, value", [
+    ("MAP_POINT_BUDGET", 123),
+    ("PORT_CALL_PARAMS", {"radius_km": 5.0, "max_sog": 1.0, "max_gap_minutes": 60.0}),
+    ("ARTIFACT_FORMAT", -1),
+])
+def test_changed_settings_make_the_bundle_stale(data_dir, monkeypatch, setting, value):
+    get_artifacts(None, data_dir)
+    monkeypatch.setattr(artifacts, setting, value)
+
+    assert load_artifacts(None, data_dir) is None
+    rebuilt = get_artifacts(None, data_dir)
+    assert rebuilt.path is not None
+    assert load_artifacts(None, data_dir) is not None
+
+
+def test_changed_source_rebuilds_and_replaces_the_bundle(data_dir):
+    old = get_artifacts(None, data_dir)
+
+    csv_path = os.path.join(data_dir, "split-data", "ais_chunk_0.csv")
+    source = pd.read_csv(csv_path)
+    source.iloc[:-1].to_csv(csv_path, index=False)
+    assert load_artifacts(None, data_dir) is None
+
+    new = get_artifacts(None, data_dir)
+    assert new.version != old.version
+    assert len(new.df) == len(old.df) - 1
+    assert os.listdir(artifacts.artifact_root(data_dir)) == [os.path.basename(new.path)]
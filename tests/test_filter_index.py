@@ -0,0 +1,67 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from filter_index import FilterIndex
+
+DATES = ["2023-12-31", "2024-01-01", "2024-01-02"]
+PORTS = ["Port of Seattle", "Port of Tacoma", "Port of Oakland"]
+
+
+@pytest.fixture(scope="module")
+def df():
+    # Filter columns as load_data returns them, in MMSI and time order
+    rng = np.random.default_rng(1)
+    n = 2000
+    return pd.DataFrame({
+        "MMSI": np.sort(rng.integers(0, 50, n)).astype(np.int32),
+        "Vessel Type Name": pd.Categorical(rng.choice(["Cargo", "Passenger", None], n)),
+        "Nearest Port": pd.Categorical(rng.choice(PORTS, n)),
+        "Date": pd.Categorical(rng.choice(DATES, n)),
+    })
+
+
+def mask(df, vessel_type=None, port=None, date=None):
+    selected = np.ones(len(df), dtype=bool)
+    for column, value in (("Vessel Type Name", vessel_type), ("Nearest Port", port), ("Date", date)):
+        if value is not None:
+            selected &= df[column].isin(value if isinstance(value, (list, tuple)) else [value]).to_numpy()
+    return selected
+
+
+FILTER_SETS = [
+    ("Cargo",),
+    (None, "Port of Tacoma"),
+    (None, None, "2024-01-01"),
+    ("Passenger", "Port of Seattle", ("2023-12-31", "2024-01-01")),
+    (None, ["Port of Seattle", "Port of Oakland"], ("2024-01-01", "2024-01-02")),
+    ("Cargo", None, tuple(DATES)),
+]
+
+
+@pytest.mark.parametrize("filters", FILTER_SETS)
+def test_positions_and_take_match_boolean_masks(df, filters):
+    index = FilterIndex(df)
+    expected = mask(df, *filters)
+
+    np.testing.assert_array_equal(index.positions(*filters), np.flatnonzero(expected))
+    pd.testing.assert_frame_equal(index.take(*filters), df[expected])
+
+
+def test_nothing_filtered_returns_every_row(df):
+    index = FilterIndex(df)
+    assert index.positions() is None
+    assert index.positions(None, None, None) is None
+    assert index.take() is df
+
+
+def test_unknown_values_match_nothing(df):
+    index = FilterIndex(df)
+    assert len(index.positions("Tanker")) == 0
+    assert index.take(None, None, "2030-01-01").empty
+    # Unknown values in a list are ignored, known ones still match
+    np.testing.assert_array_equal(index.positions(None, None, ("2030-01-01", "2024-01-02")),
+                                  np.flatnonzero(mask(df, date="2024-01-02")))
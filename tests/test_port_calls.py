@@ -0,0 +1,153 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from port_calls import DWELL_TABLE_COLUMNS, detect_port_calls, port_call_table, port_dwell_table
+from ports import PORTS
+
+START = pd.Timestamp("2024-01-01 00:00")
+COORDINATES = {port["port"]: (port["lat"], port["lon"]) for port in PORTS}
+
+
+def vessel(mmsi, pings, vessel_type="Cargo"):
+    """
+    Pings of one vessel, given as (minute, port, inside, sog) tuples: the
+    ping is labelled with port and lies on it (inside) or 50 km away.
+    """
+    minutes, ports, inside, sog = zip(*pings)
+    lat = np.array([COORDINATES[port][0] for port in ports]) + np.where(inside, 0.0, 0.45)
+    lon = np.array([COORDINATES[port][1] for port in ports])
+    return pd.DataFrame({
+        "MMSI": mmsi,
+        "BaseDateTime": START + pd.to_timedelta(minutes, unit="min"),
+        "LAT": lat,
+        "LON": lon,
+        "SOG": np.array(sog, dtype=float),
+        "Nearest Port": list(ports),
+        "Vessel Type Name": vessel_type,
+    })
+
+
+def frame(*vessels):
+    # Sorted by MMSI and time, as returned by load_data
+    return pd.concat(vessels, ignore_index=True).sort_values(["MMSI", "BaseDateTime"], ignore_index=True)
+
+
+def test_gap_in_a_stay_is_neither_an_arrival_nor_a_departure():
+    # Moored in Seattle from the first to the last ping, with a 3 hour AIS gap
+    pings = [(m, "Port of Seattle", True, 0) for m in (0, 10, 20, 200, 210, 220)]
+    visits = detect_port_calls(frame(vessel(1, pings)))
+
+    assert len(visits) == 2
+    assert not visits["Arrived"].any() and not visits["Departed"].any()
+    table = port_call_table(visits)
+    assert table[["ARRIVALS", "DEPARTURES"]].to_numpy().sum() == 0
+
+
+def test_gap_between_arrival_and_departure_counts_once():
+    pings = (
+        [(0, "Port of Seattle", False, 12)]
+        + [(m, "Port of Seattle", True, 0) for m in (10, 20, 200, 210)]
+        + [(220, "Port of Seattle", False, 12)]
+    )
+    visits = detect_port_calls(frame(vessel(1, pings)))
+
+    assert visits["Arrived"].tolist() == [True, False]
+    assert visits["Departed"].tolist() == [False, True]
+    table = port_call_table(visits)
+    assert table[["PORT NAME", "ARRIVALS", "DEPARTURES"]].values.tolist() == [["Port of Seattle", 1, 1]]
+
+
+def test_vessel_entering_from_outside():
+    pings = [
+        (0, "Port of Tacoma", False, 14),
+        (10, "Port of Tacoma", True, 3),
+        (20, "Port of Tacoma", True, 0),
+        (50, "Port of Tacoma", True, 0),
+        (60, "Port of Tacoma", True, 4),
+        (70, "Port of Tacoma", False, 14),
+    ]
+    visits = detect_port_calls(frame(vessel(1, pings)))
+
+    assert len(visits) == 1
+    visit = visits.iloc[0]
+    assert visit["Port"] == "Port of Tacoma"
+    assert visit["Arrived"] and visit["Departed"]
+    assert visit["Arrival"] == START + pd.Timedelta(minutes=10)
+    assert visit["Departure"] == START + pd.Timedelta(minutes=60)
+    assert visit["Pings"] == 4
+
+
+def test_vessel_moving_to_another_port_departs_and_arrives():
+    pings = [
+        (0, "Port of Seattle", True, 0),
+        (10, "Port of Seattle", True, 0),
+        (20, "Port of Tacoma", True, 0),
+        (30, "Port of Tacoma", True, 0),
+    ]
+    visits = detect_port_calls(frame(vessel(1, pings)))
+
+    assert visits[["Port", "Arrived", "Departed"]].values.tolist() == [
+        ["Port of Seattle", False, True],
+        ["Port of Tacoma", True, False],
+    ]
+
+
+def test_first_and_last_pings_in_port():
+    # Already in port when the data starts, still there when it ends
+    visits = detect_port_calls(frame(
+        vessel(1, [(0, "Port of Seattle", True, 0), (10, "Port of Seattle", True, 0), (20, "Port of Seattle", False, 12)]),
+        vessel(2, [(0, "Port of Seattle", False, 12), (10, "Port of Seattle", True, 0), (20, "Port of Seattle", True, 0)]),
+    ))
+
+    assert visits[["MMSI", "Arrived", "Departed"]].values.tolist() == [[1, False, True], [2, True, False]]
+    table = port_call_table(visits)
+    assert table[["ARRIVALS", "DEPARTURES"]].values.tolist() == [[1, 1]]
+
+    # Neither visit is complete, so neither has a median dwell
+    dwell = port_dwell_table(visits)
+    assert dwell["VISITS"].tolist() == [2]
+    assert dwell["MEDIAN DWELL (h)"].isna().all()
+
+
+def test_passing_through_without_slowing_is_not_a_visit():
+    pings = [(0, "Port of Seattle", False, 12)] + [(m, "Port of Seattle", True, 12) for m in (10, 20)] + [
+        (30, "Port of Seattle", False, 12)
+    ]
+    assert detect_port_calls(frame(vessel(1, pings))).empty
+
+
+def test_anchored_and_dwell_sums():
+    # Anchored (SOG 0) from minute 10 to 40 and 50 to 70, slowed but moving from 40 to 50
+    pings = [
+        (0, "Port of Seattle", False, 12),
+        (10, "Port of Seattle", True, 0),
+        (40, "Port of Seattle", True, 0.5),
+        (50, "Port of Seattle", True, 0),
+        (70, "Port of Seattle", True, 0),
+        (80, "Port of Seattle", False, 12),
+    ]
+    visits = detect_port_calls(frame(vessel(1, pings), vessel(2, pings, "Passenger")))
+
+    assert (visits["Dwell"] == pd.Timedelta(minutes=60)).all()
+    assert (visits["Anchored"] == pd.Timedelta(minutes=50)).all()
+
+    dwell = port_dwell_table(visits, "2024-01-01", "2024-01-01")
+    assert list(dwell.columns) == DWELL_TABLE_COLUMNS
+    assert dwell.iloc[0].tolist() == ["Port of Seattle", 2, 1.0, round(50 / 60, 2), round(2 / 24, 2)]
+
+    cargo = port_dwell_table(visits, "2024-01-01", "2024-01-01", vessel_type="Cargo")
+    assert cargo["VISITS"].tolist() == [1]
+
+
+def test_tables_select_by_window_and_port():
+    pings = [(0, "Port of Seattle", False, 12), (10, "Port of Seattle", True, 0), (20, "Port of Seattle", False, 12)]
+    late = [(m + 24 * 60, port, inside, sog) for m, port, inside, sog in pings]
+    visits = detect_port_calls(frame(vessel(1, pings + late)))
+
+    assert port_call_table(visits, "2024-01-01", "2024-01-01")["ARRIVALS"].tolist() == [1]
+    assert port_call_table(visits, "2024-01-01", "2024-01-02")["ARRIVALS"].tolist() == [2]
+    assert port_call_table(visits, port="Port of Tacoma").empty
+    assert port_dwell_table(visits, "2024-01-03", "2024-01-03").empty
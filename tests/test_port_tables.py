@@ -0,0 +1,131 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from calculate_arrivals_departures import PORT_FLAGS, compute_port_tables
+
+
+def reference_port_stats(filtered_df):
+    """
+    The row-by-row implementation compute_port_tables replaced, kept as
+    the reference its output must match.
+    """
+    filtered_df = filtered_df.sort_values(by=["MMSI", "BaseDateTime"])
+    port_stats = {}
+    prev_port = None
+    prev_mmsi = None
+
+    for _, row in filtered_df.iterrows():
+        current_port = row["Nearest Port"]
+        mmsi = row["MMSI"]
+
+        if mmsi != prev_mmsi:
+            prev_mmsi = mmsi
+            prev_port = current_port
+            continue
+
+        if current_port != prev_port:
+            # departure from old port +1
+            if prev_port in port_stats:
+                port_stats[prev_port]["departures"] += 1
+            else:
+                port_stats[prev_port] = {"arrivals": 0, "departures": 1}
+
+            # arrival in new port +1
+            if current_port in port_stats:
+                port_stats[current_port]["arrivals"] += 1
+            else:
+                port_stats[current_port] = {"arrivals": 1, "departures": 0}
+
+        prev_port = current_port
+
+    if not port_stats:
+        return pd.DataFrame(columns=["FLAG", "PORT NAME", "ARRIVALS", "DEPARTURES"])
+
+    result_df = pd.DataFrame([
+        {
+            "FLAG": PORT_FLAGS.get(port, "\U0001F3F3"),
+            "PORT NAME": port,
+            "ARRIVALS": stats["arrivals"],
+            "DEPARTURES": stats["departures"],
+        }
+        for port, stats in port_stats.items()
+    ])
+
+    return result_df.sort_values(by="ARRIVALS", ascending=False)
+
+
+def make_pings(seed=0, rows=2000):
+    """
+    Random pings of a few vessels hopping between ports, some of them with
+    no nearest port, plus vessels with known NaN transitions.
+    """
+    rng = np.random.default_rng(seed)
+    # Missing ports are NaN, as read from the split CSV files
+    ports = np.array(list(PORT_FLAGS) + [np.nan], dtype=object)
+    n_vessels = 40
+    vessel_types = rng.choice(np.array(["Cargo", "Passenger", None], dtype=object), n_vessels)
+    vessels = rng.integers(0, n_vessels, rows)
+    df = pd.DataFrame({
+        "MMSI": 200_000_000 + vessels,
+        "BaseDateTime": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 86400, rows), unit="s"),
+        "Nearest Port": rng.choice(ports, rows, p=[0.1] * 9 + [0.1]),
+        "Vessel Type Name": vessel_types[vessels],
+    })
+
+    # NaN -> NaN, NaN -> port and port -> NaN, for a Cargo and a Passenger vessel
+    start = pd.Timestamp("2024-01-01 12:00")
+    for mmsi, vessel_type in ((100_000_001, "Cargo"), (100_000_002, "Passenger")):
+        df = pd.concat([df, pd.DataFrame({
+            "MMSI": mmsi,
+            "BaseDateTime": start + pd.to_timedelta(np.arange(5), unit="min"),
+            "Nearest Port": [np.nan, np.nan, "Port of Seattle", np.nan, "Port of Tacoma"],
+            "Vessel Type Name": vessel_type,
+        })], ignore_index=True)
+    return df
+
+
+def load_data_dtypes(df):
+    # The categorical columns load_data returns
+    return df.astype({"Nearest Port": "category", "Vessel Type Name": "category"})
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("categorical", [False, True])
+def test_matches_loop_for_all_vessels_cargo_and_passenger(seed, categorical):
+    df = make_pings(seed)
+    if categorical:
+        df = load_data_dtypes(df)
+    tables = compute_port_tables(df)
+
+    expected = {
+        None: reference_port_stats(df),
+        "Cargo": reference_port_stats(df[df["Vessel Type Name"] == "Cargo"]),
+        "Passenger": reference_port_stats(df[df["Vessel Type Name"] == "Passenger"]),
+    }
+    for vessel_type, table in expected.items():
+        pd.testing.assert_frame_equal(tables[vessel_type], table, check_dtype=False)
+
+
+def test_nan_transitions_are_counted_like_the_loop():
+    df = make_pings(rows=0)
+    tables = compute_port_tables(df)
+
+    for vessel_type in ("Cargo", "Passenger"):
+        table = tables[vessel_type].set_index("PORT NAME")
+        pd.testing.assert_frame_equal(
+            tables[vessel_type], reference_port_stats(df[df["Vessel Type Name"] == vessel_type]), check_dtype=False
+        )
+        # NaN -> NaN, NaN -> Seattle, Seattle -> NaN, NaN -> Tacoma
+        missing = table[table.index.isna()]
+        assert missing[["ARRIVALS", "DEPARTURES"]].to_numpy().tolist() == [[2, 3]]
+        assert table.loc["Port of Seattle", "ARRIVALS"] == 1
+        assert table.loc["Port of Tacoma", "ARRIVALS"] == 1
+
+
+def test_empty_frame():
+    df = make_pings(rows=0).iloc[:0]
+    assert compute_port_tables(df)[None].empty
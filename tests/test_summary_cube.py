@@ -0,0 +1,87 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from figures import trend_series
+from summary_cube import SummaryCube
+
+DATES = ["2023-12-31", "2024-01-01", "2024-01-02"]
+PORTS = ["Port of Seattle", "Port of Tacoma", "Port of Oakland"]
+
+
+@pytest.fixture(scope="module")
+def df():
+    # A few thousand pings of 60 vessels, with the columns and dtypes load_data returns
+    rng = np.random.default_rng(0)
+    n = 3000
+    date = rng.choice(DATES, n)
+    hour = rng.integers(0, 24, n)
+    timestamps = pd.to_datetime(date) + pd.to_timedelta(hour, unit="h") + pd.to_timedelta(rng.integers(0, 60, n), unit="min")
+    return pd.DataFrame({
+        "MMSI": rng.integers(0, 60, n).astype(np.int32),
+        "BaseDateTime": timestamps,
+        "SOG": np.where(rng.random(n) < 0.4, 0, rng.uniform(0.1, 15, n)).astype(np.float32),
+        "Vessel Type Name": pd.Categorical(rng.choice(["Cargo", "Passenger", None], n)),
+        "Nearest Port": pd.Categorical(rng.choice(PORTS, n)),
+        "Hour": hour.astype(np.int8),
+        "Date": pd.Categorical(date),
+    }).sort_values(["MMSI", "BaseDateTime"], ignore_index=True)
+
+
+def select(df, vessel_type=None, port=None, date=None, hour=None):
+    mask = np.ones(len(df), dtype=bool)
+    if vessel_type is not None:
+        mask &= df["Vessel Type Name"] == vessel_type
+    if port is not None:
+        mask &= df["Nearest Port"] == port
+    if date is not None:
+        mask &= df["Date"].isin(date if isinstance(date, tuple) else [date])
+    if hour is not None:
+        mask &= df["Hour"] == hour
+    return df[mask]
+
+
+FILTER_SETS = [
+    (None, None, None, None),
+    ("Cargo", None, None, None),
+    (None, "Port of Tacoma", None, None),
+    ("Passenger", "Port of Seattle", "2024-01-01", None),
+    (None, None, ("2023-12-31", "2024-01-01"), None),
+    ("Cargo", "Port of Oakland", ("2024-01-01", "2024-01-02"), 7),
+    (None, None, None, 23),
+]
+
+
+@pytest.mark.parametrize("filters", FILTER_SETS)
+def test_query_matches_pandas(df, filters):
+    rows = select(df, *filters)
+    expected = {
+        "unique": rows["MMSI"].nunique(),
+        "moving": rows.loc[rows["SOG"] > 0, "MMSI"].nunique(),
+        "anchored": rows.loc[rows["SOG"] == 0, "MMSI"].nunique(),
+    }
+    assert SummaryCube(df).query(*filters) == expected
+
+
+def test_query_of_unknown_values_is_empty(df):
+    cube = SummaryCube(df)
+    assert cube.query("Tanker") == {"unique": 0, "moving": 0, "anchored": 0}
+    assert cube.query(date="2030-01-01") == {"unique": 0, "moving": 0, "anchored": 0}
+
+
+@pytest.mark.parametrize("freq", ["h", "D"])
+@pytest.mark.parametrize("filters", [filters[:3] for filters in FILTER_SETS if filters[3] is None])
+def test_trend_matches_trend_series(df, filters, freq):
+    expected = trend_series(select(df, *filters), freq)
+    trend = SummaryCube(df).trend(*filters, freq=freq)
+    pd.testing.assert_frame_equal(trend, expected, check_dtype=False)
+
+
+def test_trend_of_unknown_values_is_empty(df):
+    cube = SummaryCube(df)
+    assert cube.trend("Tanker").empty
+    assert cube.trend(date=("2030-01-01",)).empty
+    assert list(cube.trend("Tanker").columns) == ["Timestamp", "Unique Vessels", "Pings"]
@@ -0,0 +1,111 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from figures import create_map
+from tracks import KM_PER_DEGREE, build_tracks, simplify_tracks, track_importance
+
+START = pd.Timestamp("2024-01-01 00:00")
+
+
+@pytest.fixture(scope="module")
+def df():
+    # 30 vessels on random walks off Seattle, one ping a minute, some with an AIS gap
+    rng = np.random.default_rng(2)
+    frames = []
+    for mmsi in range(30):
+        n = int(rng.integers(2, 120))
+        minutes = np.arange(n) + np.where(np.arange(n) >= n // 2, 45 * (mmsi % 3 == 0), 0)
+        frames.append(pd.DataFrame({
+            "MMSI": mmsi,
+            "BaseDateTime": START + pd.to_timedelta(minutes, unit="min"),
+            "LAT": (47.6 + np.cumsum(rng.normal(0, 0.005, n))).astype(np.float32),
+            "LON": (-122.4 + np.cumsum(rng.normal(0, 0.005, n))).astype(np.float32),
+            "SOG": np.float32(10),
+            "Vessel Type Name": rng.choice(["Cargo", "Passenger", None]),
+            "VesselName": f"VESSEL {mmsi}",
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def reference_simplify(x, y, tolerance):
+    """
+    Recursive Douglas-Peucker over one track, returning the kept indices.
+    """
+    def distance(i, first, last):
+        dx, dy = x[last] - x[first], y[last] - y[first]
+        length2 = dx * dx + dy * dy
+        t = 0.0 if length2 == 0 else min(max(((x[i] - x[first]) * dx + (y[i] - y[first]) * dy) / length2, 0), 1)
+        return np.hypot(x[i] - x[first] - t * dx, y[i] - y[first] - t * dy)
+
+    def split(first, last):
+        if last - first < 2:
+            return []
+        distances = [distance(i, first, last) for i in range(first + 1, last)]
+        farthest = int(np.argmax(distances))
+        if distances[farthest] <= tolerance:
+            return []
+        pivot = first + 1 + farthest
+        return split(first, pivot) + [pivot] + split(pivot, last)
+
+    return [0] + split(0, len(x) - 1) + [len(x) - 1]
+
+
+def test_tracks_are_cut_at_vessel_changes_and_gaps(df):
+    tracks = build_tracks(df, gap_minutes=30)
+    gapped = df.loc[df["MMSI"] % 3 == 0, "MMSI"].value_counts() > 1
+
+    assert len(tracks) == df["MMSI"].nunique() + int(gapped.sum())
+    assert tracks.n_points == len(df)
+    np.testing.assert_array_equal(tracks.rows, np.arange(len(df)))
+
+
+def test_pings_without_position_are_left_out(df):
+    missing = df.assign(LAT=df["LAT"].where(df.index % 10 != 0))
+    tracks = build_tracks(missing)
+    assert tracks.n_points == int(missing["LAT"].notna().sum())
+    assert np.isfinite(tracks.lat).all()
+
+
+@pytest.mark.parametrize("tolerance", [0.2, 0.5, 2.0])
+def test_simplification_matches_recursive_douglas_peucker(df, tolerance):
+    tracks = build_tracks(df)
+    # Coarser tolerances are read off the importances of the finest one
+    importance = track_importance(tracks, 0.2)
+    simplified = simplify_tracks(tracks, tolerance)
+
+    kept = []
+    for i in range(len(tracks)):
+        track = tracks.track(i)
+        lat = track["LAT"].to_numpy(dtype=np.float64)
+        lon = track["LON"].to_numpy(dtype=np.float64)
+        x = lon * KM_PER_DEGREE * np.cos(np.radians(lat.mean()))
+        y = lat * KM_PER_DEGREE
+        kept += [tracks.offsets[i] + j for j in reference_simplify(x, y, tolerance)]
+
+    kept = np.unique(kept)
+    np.testing.assert_array_equal(simplified.rows, tracks.rows[kept])
+    np.testing.assert_array_equal(np.flatnonzero(importance > tolerance), kept)
+
+
+def test_track_ends_are_always_kept(df):
+    tracks = build_tracks(df)
+    simplified = simplify_tracks(tracks, 1000)
+    assert len(simplified) == len(tracks)
+    assert (simplified.lengths() == np.minimum(tracks.lengths(), 2)).all()
+
+
+@pytest.mark.parametrize("budget", [5000, 500, 120, 20])
+def test_track_map_stays_within_point_budget(df, budget):
+    fig = create_map(df, point_budget=budget, mode="tracks")
+    vertices = sum(len(trace.lat) for trace in fig.data)
+    assert 0 < vertices <= budget
+
+    note = fig.layout.annotations[0].text
+    if budget >= len(df) + df["MMSI"].nunique() * 2:
+        assert "simplified" not in note
+    if budget == 20:
+        assert "longest" in note